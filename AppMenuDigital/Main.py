@@ -1,22 +1,95 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, g
 from functools import wraps
 try:
     from .config import Config
+    from .db import crear_db
+    from . import repositorio
+    from . import migrations
+    from . import planes
+    from .catalogo import Catalogo, CATEGORIAS, CAMPOS_EXPORTADOS
+    from .pedidos import armar_tablero, listar_pedidos, cambiar_estado, crear_pedido, items_del_carrito, transicion_valida, datos_pedido, eliminar_pedido, contar_por_estado, ESTADOS, ESTADOS_ACTIVOS, TRANSICIONES, CLIENTE_ADMIN
+    from .eventos import EventBus, publicar, formatear_sse, leer_eventos, ultimo_evento, purgar_eventos
+    from .sesiones import ServerSessionInterface, MySQLSessionStore, FileSessionStore, CacheLocal, rotar_sid
+    from .carrito import cantidad_total, cotizar
+    from .imagenes import Variantes, guardar_subida, recolectar
+    from .estaticos import Estaticos
+    from .compresion import Compresion
+    from .registro import configurar_logging
+    from .metricas import Metricas
+    from .consultas import GuardiaConsultas, presupuesto_consultas
+    from .busqueda import IndiceBusqueda
 except ImportError:
     from config import Config
+    from db import crear_db
+    import repositorio
+    import migrations
+    import planes
+    from catalogo import Catalogo, CATEGORIAS, CAMPOS_EXPORTADOS
+    from pedidos import armar_tablero, listar_pedidos, cambiar_estado, crear_pedido, items_del_carrito, transicion_valida, datos_pedido, eliminar_pedido, contar_por_estado, ESTADOS, ESTADOS_ACTIVOS, TRANSICIONES, CLIENTE_ADMIN
+    from eventos import EventBus, publicar, formatear_sse, leer_eventos, ultimo_evento, purgar_eventos
+    from sesiones import ServerSessionInterface, MySQLSessionStore, FileSessionStore, CacheLocal, rotar_sid
+    from carrito import cantidad_total, cotizar
+    from imagenes import Variantes, guardar_subida, recolectar
+    from estaticos import Estaticos
+    from compresion import Compresion
+    from registro import configurar_logging
+    from metricas import Metricas
+    from consultas import GuardiaConsultas, presupuesto_consultas
+    from busqueda import IndiceBusqueda
+import click
+import datetime
+import hashlib
+import hmac
+import logging
 import os
-import pymysql
+import sys
 
-app = Flask(__name__)
+app = Flask(__name__, template_folder=Config.TEMPLATE_FOLDER)
 
 # Configuración de la aplicación
 app.config['SECRET_KEY'] = Config.SECRET_KEY
+app.config['DB_DRIVER'] = Config.DB_DRIVER
+app.config['SQLITE_PATH'] = Config.SQLITE_PATH
+app.config['SQLITE_TIMEOUT'] = Config.SQLITE_TIMEOUT
 app.config['MYSQL_PORT'] = Config.MYSQL_PORT
 app.config['MYSQL_HOST'] = Config.MYSQL_HOST
 app.config['MYSQL_USER'] = Config.MYSQL_USER
 app.config['MYSQL_PASSWORD'] = Config.MYSQL_PASSWORD
 app.config['MYSQL_DB'] = Config.MYSQL_DB
-print(f"[startup] DB host={app.config['MYSQL_HOST']} port={app.config['MYSQL_PORT']} user={app.config['MYSQL_USER']} db={app.config['MYSQL_DB']}")
+app.config['MYSQL_POOL_SIZE'] = Config.MYSQL_POOL_SIZE
+app.config['MYSQL_POOL_TIMEOUT'] = Config.MYSQL_POOL_TIMEOUT
+app.config['MYSQL_POOL_MAX_IDLE'] = Config.MYSQL_POOL_MAX_IDLE
+app.config['MYSQL_POOL_MAX_LIFETIME'] = Config.MYSQL_POOL_MAX_LIFETIME
+app.config['CATALOGO_TTL'] = Config.CATALOGO_TTL
+app.config['CATALOGO_CAMBIOS_MAXIMO'] = Config.CATALOGO_CAMBIOS_MAXIMO
+app.config['PEDIDOS_POR_PAGINA'] = Config.PEDIDOS_POR_PAGINA
+app.config['EVENTOS_INTERVALO'] = Config.EVENTOS_INTERVALO
+app.config['EVENTOS_ESPERA_HUECOS'] = Config.EVENTOS_ESPERA_HUECOS
+app.config['SESSION_BACKEND'] = Config.SESSION_BACKEND
+app.config['SESSION_TTL'] = Config.SESSION_TTL
+app.config['SESSION_LRU_SIZE'] = Config.SESSION_LRU_SIZE
+app.config['SESSION_POOL_SIZE'] = Config.SESSION_POOL_SIZE
+app.config['SESSION_DIR'] = Config.SESSION_DIR
+app.config['SESSION_SWEEP_INTERVAL'] = Config.SESSION_SWEEP_INTERVAL
+app.config['IMAGENES_WORKERS'] = Config.IMAGENES_WORKERS
+app.config['ESTATICOS_CONSTRUIR'] = Config.ESTATICOS_CONSTRUIR
+app.config['COMPRESION_ACTIVA'] = Config.COMPRESION_ACTIVA
+app.config['COMPRESION_MINIMO'] = Config.COMPRESION_MINIMO
+app.config['COMPRESION_MINIFICAR'] = Config.COMPRESION_MINIFICAR
+app.config['CONSULTAS_LENTA'] = Config.CONSULTAS_LENTA
+app.config['CONSULTAS_ESTRICTO'] = Config.CONSULTAS_ESTRICTO
+app.config['METRICAS_TOKEN'] = Config.METRICAS_TOKEN
+app.config['METRICAS_IPS'] = Config.METRICAS_IPS
+app.config['LOG_LEVEL'] = Config.LOG_LEVEL
+app.config['LOG_FORMATO'] = Config.LOG_FORMATO
+app.config['LOG_ARCHIVO'] = Config.LOG_ARCHIVO
+configurar_logging(
+    app.config['LOG_LEVEL'],
+    formato=app.config['LOG_FORMATO'],
+    archivo=app.config['LOG_ARCHIVO'],
+    niveles=Config.LOG_NIVELES,
+)
+log = logging.getLogger(__name__)
 app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static', 'images')
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10 MB
 _ALLOWED_IMAGE_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif'}
@@ -25,145 +98,189 @@ _ALLOWED_IMAGE_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif'}
 try:
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 except Exception as e:
-    print(f"[startup] No se pudo crear carpeta de imágenes: {e}")
+    log.warning("No se pudo crear la carpeta de imágenes: %s", e)
 
-# Clase MySQL personalizada usando pymysql
-class MySQL:
-    def __init__(self, app=None):
-        self.app = app
-    
-    @property
-    def connection(self):
-        return pymysql.connect(
-            host=self.app.config['MYSQL_HOST'],
-            port=self.app.config['MYSQL_PORT'],
-            user=self.app.config['MYSQL_USER'],
-            password=self.app.config['MYSQL_PASSWORD'],
-            database=self.app.config['MYSQL_DB'],
-            autocommit=False,
-            charset='utf8mb4',
-            connect_timeout=5
-        )
-mysql = MySQL(app)
+# Base de datos: MySQL (servidor) o SQLite (archivo local), según DB_DRIVER
+db = crear_db(app)
+if db.dialecto == 'sqlite':
+    log.info("Base de datos SQLite en %s", db.ruta)
+else:
+    log.info("Base de datos %s en %s:%s (usuario %s)", app.config['MYSQL_DB'], app.config['MYSQL_HOST'], app.config['MYSQL_PORT'], app.config['MYSQL_USER'])
 
-def _log_db_info(tag: str):
-    """Log de información de base de datos (solo para debug)"""
+# Métricas de requests y consultas para /metrics
+metricas = Metricas(app, db)
+metricas.describir('checkouts_total', 'counter', 'Pedidos creados desde el carrito')
+metricas.describir('checkout_items_total', 'counter', 'Items de los pedidos creados desde el carrito')
+metricas.gauge(
+    'db_pool', 'Estado del pool de conexiones (in_use, idle, checkouts, waits, ...)',
+    lambda: [({'stat': k}, v) for k, v in sorted(db.pool.stats().items()) if isinstance(v, (int, float))]
+)
+
+def _pedidos_por_estado():
+    cur = db.connection.cursor()
+    try:
+        conteos = contar_por_estado(cur)
+    finally:
+        cur.close()
+    return [({'estado': estado}, conteos.get(estado, 0)) for estado in ESTADOS]
+
+metricas.gauge('pedidos', 'Pedidos por estado', _pedidos_por_estado)
+
+# Log de consultas lentas y presupuesto de consultas por vista (@presupuesto_consultas)
+GuardiaConsultas(app, db, lenta=app.config['CONSULTAS_LENTA'], estricto=app.config['CONSULTAS_ESTRICTO'])
+
+# Estáticos con huella (?v=<hash>), caché inmutable y versiones .gz/.br
+estaticos = Estaticos(app)
+if app.config['ESTATICOS_CONSTRUIR']:
+    try:
+        log.info("%d archivos estáticos preparados en %s", len(estaticos.construir()), estaticos.build_dir)
+    except Exception:
+        log.exception("No se pudieron preparar los archivos estáticos")
+
+# Compresión gzip/br y minificado del HTML/JSON generado (opcional)
+compresion = None
+if app.config['COMPRESION_ACTIVA']:
+    compresion = Compresion(
+        app,
+        minimo=app.config['COMPRESION_MINIMO'],
+        minificar=app.config['COMPRESION_MINIFICAR'],
+    )
+
+# Miniaturas WebP/JPEG de las imágenes subidas, generadas fuera del request
+variantes = Variantes(
+    app.static_folder,
+    resolver_url=lambda ruta: url_for('static', filename=ruta),
+    max_workers=app.config['IMAGENES_WORKERS'],
+)
+app.jinja_env.globals['imagen_responsive'] = variantes.html
+
+def _recolectar_imagenes(cur, candidatas):
+    """Borra del disco las imágenes que quedaron sin productos que las usen (después del commit)"""
+    try:
+        for imagen in recolectar(cur, app.static_folder, candidatas, variantes):
+            log.info("Imagen sin referencias eliminada: %s", imagen)
+    except Exception:
+        log.exception("Error recolectando imágenes")
+
+def _cargar_catalogo():
+    cur = db.connection.cursor()
+    try:
+        # La versión primero: si algo cambia mientras tanto, el cliente lo vuelve a recibir
+        version = repositorio.version_catalogo(cur)
+        filas = repositorio.listar_productos(cur)
+    finally:
+        cur.close()
+    return filas, version
+
+# Catálogo de productos en memoria; las rutas que modifican productos lo invalidan
+catalogo = Catalogo(
+    _cargar_catalogo,
+    resolver_imagen=lambda imagen: url_for('static', filename=imagen),
+    ttl=app.config['CATALOGO_TTL'],
+)
+
+# Índice de búsqueda de /api/buscar: se pone al día con cada recarga del catálogo
+# reindexando solo los productos creados, editados o borrados
+indice_busqueda = IndiceBusqueda()
+catalogo.suscribir(lambda snap: indice_busqueda.sincronizar(snap.productos))
+
+# Sesiones del lado del servidor: la cookie solo guarda un id opaco. El backend
+# mysql usa un pool propio: save_session corre cuando el request todavía tiene
+# su conexión de db.pool
+if app.config['SESSION_BACKEND'] == 'mysql':
+    _sesiones_store = CacheLocal(
+        MySQLSessionStore(db.pool_aparte(app.config['SESSION_POOL_SIZE']), db.dialecto),
+        app.config['SESSION_LRU_SIZE'],
+    )
+elif app.config['SESSION_BACKEND'] == 'filesystem':
+    _sesiones_store = FileSessionStore(app.config['SESSION_DIR'] or os.path.join(app.instance_path, 'sesiones'))
+else:
+    _sesiones_store = None
+if _sesiones_store is not None:
+    app.session_interface = ServerSessionInterface(
+        _sesiones_store,
+        ttl=app.config['SESSION_TTL'],
+        barrido_cada=app.config['SESSION_SWEEP_INTERVAL'],
+    )
+
+# Los eventos se leen desde un hilo propio, fuera de cualquier request,
+# por eso toman la conexión directamente del pool
+def _cargar_eventos(desde_id, limite=200):
+    conn = db.pool.acquire()
+    try:
+        cur = conn.cursor()
+        filas = leer_eventos(cur, desde_id, limite)
+        cur.close()
+        return filas
+    finally:
+        db.pool.release(conn)
+
+def _ultimo_evento():
+    conn = db.pool.acquire()
     try:
-        conn = mysql.connection
         cur = conn.cursor()
-        cur.execute("SELECT DATABASE()")
-        dbn = cur.fetchone()[0]
-        cur.execute("SELECT VERSION()")
-        ver = cur.fetchone()[0]
-        cur.execute("SELECT CURRENT_USER()")
-        usr = cur.fetchone()[0]
-        print(f"[db-info:{tag}] database={dbn} version={ver} current_user={usr}")
+        ultimo = ultimo_evento(cur)
         cur.close()
+        return ultimo
+    finally:
+        db.pool.release(conn)
+
+def _purgar_eventos():
+    conn = db.pool.acquire()
+    try:
+        cur = conn.cursor()
+        purgar_eventos(cur, datetime.datetime.now() - datetime.timedelta(days=1))
+        conn.commit()
+        cur.close()
+    finally:
+        db.pool.release(conn)
+
+# Feed de pedidos para los paneles conectados a este proceso
+eventos_bus = EventBus(
+    _cargar_eventos,
+    _ultimo_evento,
+    purgar=_purgar_eventos,
+    intervalo=app.config['EVENTOS_INTERVALO'],
+    espera_huecos=app.config['EVENTOS_ESPERA_HUECOS'],
+)
+
+def _log_db_info(tag: str):
+    """Log de información de base de datos (solo para debug)"""
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    try:
+        log.debug("[%s] Base de datos", tag, extra=db.descripcion())
     except Exception as e:
-        print(f"[db-info:{tag}] error: {e}")
+        log.debug("[%s] No se pudo leer la información de la base: %s", tag, e)
+
+def _cotizar_carrito():
+    """(lineas, total) del carrito de la sesión, calculado una vez por request"""
+    if '_carrito_cotizado' not in g:
+        g._carrito_cotizado = cotizar(session.get('cart', {}), catalogo.producto, catalogo.buscar_por_nombre)
+    return g._carrito_cotizado
 
 @app.context_processor
 def inject_cart_count():
     try:
         cart = session.get('cart', {})
-        total_qty = 0
-        for entry in cart.values():
-            try:
-                total_qty += int(entry.get('qty', 1))
-            except Exception:
-                total_qty += 1
-        return {'cart_count': total_qty}
+        if not cart:
+            return {'cart_count': 0, 'cart_total': 0.0}
+        _, total = _cotizar_carrito()
+        return {'cart_count': cantidad_total(cart), 'cart_total': total}
     except Exception:
-        return {'cart_count': 0}
+        return {'cart_count': 0, 'cart_total': 0.0}
 
 
 # Rutas de la aplicación
 @app.route('/')
+@presupuesto_consultas(3)  # Solo al recargar el catálogo
 def index():
-    # Cargar dinámicamente productos por categoría para el Index
-    categorias = ['desayunos', 'almuerzos', 'cenas', 'meriendas', 'postres', 'bebidas', 'comida_sin_tac', 'promociones', 'veggie']
-    productos_por_categoria = {c: [] for c in categorias}
-    
-    cur = None
+    # Productos por categoría desde el catálogo en memoria
     try:
-        # Intentar obtener cursor
-        try:
-            cur = mysql.connection.cursor()
-        except Exception as conn_error:
-            print(f"[index] Error de conexión a BD: {conn_error}")
-            # Si no hay conexión, continuar con productos vacíos
-            cur = None
-        
-        if cur:
-            try:
-                # Crear tabla si no existe
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS productos (
-                        id INT AUTO_INCREMENT PRIMARY KEY,
-                        nombre VARCHAR(150) NOT NULL,
-                        descripcion TEXT NULL,
-                        precio DECIMAL(10,2) NOT NULL,
-                        imagen VARCHAR(255) NULL,
-                        categoria VARCHAR(50) NULL
-                    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-                """)
-                mysql.connection.commit()
-                
-                # Leer y procesar productos
-                try:
-                    cur.execute("SELECT id, nombre, precio, categoria, imagen, descripcion FROM productos ORDER BY id DESC")
-                    filas_raw = cur.fetchall()
-                    
-                    # Procesar y convertir categorías a minúsculas
-                    filas = []
-                    for row in filas_raw:
-                        if row and len(row) >= 4:
-                            cat_lower = (row[3] or '').lower().strip() if len(row) > 3 else ''
-                            fila = (
-                                row[0],
-                                row[1],
-                                float(row[2]) if row[2] else 0.0,
-                                cat_lower,
-                                row[4] if len(row) > 4 and row[4] else '',
-                                row[5] if len(row) > 5 and row[5] else ''
-                            )
-                            filas.append(fila)
-                except Exception as select_error:
-                    print(f"[index] ERROR en SELECT: {select_error}")
-                    import traceback
-                    traceback.print_exc()
-                    filas = []
-                
-                # Procesar productos por categoría
-                for f in filas:
-                    try:
-                        if f and len(f) >= 4:
-                            producto_id = f[0]
-                            producto_nombre = f[1] if len(f) > 1 else 'Sin nombre'
-                            producto_precio = float(f[2]) if len(f) > 2 and f[2] else 0.0
-                            cat = (f[3] or '').lower().strip() if len(f) > 3 else ''
-                            producto_imagen = (f[4] or '') if len(f) > 4 else ''
-                            producto_descripcion = (f[5] or '') if len(f) > 5 else ''
-                            
-                            if cat and cat in categorias:
-                                producto_completo = (producto_id, producto_nombre, producto_precio, cat, producto_imagen, producto_descripcion)
-                                productos_por_categoria[cat].append(producto_completo)
-                    except Exception as e:
-                        print(f"[index] Error procesando producto: {e}")
-                        continue
-            except Exception as db_error:
-                print(f"[index] Error en consulta BD: {db_error}")
-            finally:
-                if cur:
-                    try:
-                        cur.close()
-                    except:
-                        pass
-        
-    except Exception as e:
-        print(f"[index] ERROR general: {e}")
-        import traceback
-        traceback.print_exc()
+        productos_por_categoria = catalogo.productos_por_categoria()
+    except Exception:
+        log.exception("Error cargando catálogo")
+        productos_por_categoria = {c: [] for c in CATEGORIAS}
     
     ctx = {'productos_por_categoria': productos_por_categoria}
     if 'user_id' in session:
@@ -174,15 +291,12 @@ def index():
 @app.route('/menu')
 def menu():
     try:
-        ensure_menu_table_exists()
-        ensure_menu_table_upgrade()
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT id, Nombre_Menu, Precio, COALESCE(Categoria, ''), COALESCE(Imagen, '') FROM menu ORDER BY id DESC")
-        productos = cur.fetchall()
+        cur = db.connection.cursor()
+        productos = repositorio.listar_productos(cur)
         cur.close()
         return render_template('menu.html', productos=productos)
-    except Exception as e:
-        print(f"Error al cargar productos (menu): {e}")
+    except Exception:
+        log.exception("Error al cargar productos (menu)")
         return render_template('menu.html', productos=[])
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -192,12 +306,9 @@ def login():
         password = request.form['password']
         
         try:
-            conn = mysql.connection
+            conn = db.connection
             cur = conn.cursor()
-            # Selecciona columnas explícitas para evitar dependencia de orden
-            cur.execute("SELECT id, nombre, email, password FROM usuarios WHERE email = %s LIMIT 1", (email,))
-            user = cur.fetchone()
-            print(f"[login] fetched user for {email}: {bool(user)}")
+            user = repositorio.usuario_por_email(cur, email)
 
             password_ok = False
             if user:
@@ -206,6 +317,8 @@ def login():
                 password_ok = (stored_pwd == password)
 
             if user and password_ok:
+                # Sid nuevo: el que tenía el navegador antes del login pudo venir de otro
+                rotar_sid(session)
                 session['user_id'] = user[0]
                 session['nombre'] = user[1]
                 # Guardar email en sesión
@@ -221,9 +334,8 @@ def login():
                 session['is_admin'] = is_admin
                 # Determinar rol mozo si el email pertenece a mozos activos
                 try:
-                    cur2 = mysql.connection.cursor()
-                    cur2.execute("SELECT id, activo FROM mozos WHERE email=%s", (session['email'],))
-                    mozo_row = cur2.fetchone()
+                    cur2 = db.connection.cursor()
+                    mozo_row = repositorio.mozo_por_email(cur2, session['email'])
                     cur2.close()
                     if mozo_row and (mozo_row[1] == 1 or mozo_row[1] is True):
                         session['rol'] = 'mozo'
@@ -239,10 +351,10 @@ def login():
                 return redirect(url_for('index'))
             else:
                 flash('Email o contraseña incorrectos', 'error')
-                print(f"[login] invalid credentials for {email}")
+                log.info("Login fallido para %s", email)
                 
-        except Exception as e:
-            print(f"Error en login: {e}")
+        except Exception:
+            log.exception("Error en login")
             flash('Error al iniciar sesión', 'error')
     
     return render_template('Login.html')
@@ -260,66 +372,42 @@ def registro():
             return render_template('Registro.html')
         
         try:
-            ensure_core_tables()
-            conn = mysql.connection
+            conn = db.connection
             cur = conn.cursor()
             
             # Verificar si el email ya existe
-            cur.execute("SELECT * FROM usuarios WHERE email = %s", (email,))
-            if cur.fetchone():
+            if repositorio.usuario_por_email(cur, email):
                 flash('El email ya está registrado', 'error')
                 cur.close()
                 return render_template('Registro.html')
             
             # Crear nuevo usuario (contraseña en texto plano - NO RECOMENDADO por seguridad)
-            cur.execute("""
-                INSERT INTO usuarios (nombre, email, password)
-                VALUES (%s, %s, %s)
-            """, (nombre, email, password))
+            new_id = repositorio.crear_usuario(cur, nombre, email, password)
             # Registrar también como mozo activo por defecto
             try:
-                cur.execute("INSERT INTO mozos (nombre, email, activo) VALUES (%s, %s, %s)", (nombre, email, 1))
+                repositorio.crear_mozo(cur, nombre, email, activo=1)
             except Exception:
                 # Si ya existe en mozos por UNIQUE email, ignoramos
                 pass
 
             conn.commit()
-            new_id = cur.lastrowid
-            print(f"[registro] usuario creado id={new_id} email={email}")
+            log.info("Usuario creado id=%s email=%s", new_id, email)
             cur.close()
             _log_db_info('registro')
             
             flash('¡Registro exitoso! Ahora puedes iniciar sesión', 'success')
             return redirect(url_for('login'))
             
-        except Exception as e:
-            print(f"Error en registro: {e}")
+        except Exception:
+            log.exception("Error en registro")
             flash('Error al registrar usuario', 'error')
     
     return render_template('Registro.html')
 
-def ensure_core_tables():
-    try:
-        cur = mysql.connection.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                email VARCHAR(100) UNIQUE NOT NULL,
-                password VARCHAR(255) NOT NULL,
-                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            """
-        )
-        mysql.connection.commit()
-        cur.close()
-    except Exception as e:
-        print(f"Error asegurando tabla usuarios: {e}")
-
 @app.route('/logout')
 def logout():
     session.clear()
+    rotar_sid(session)
     flash('Has cerrado sesión', 'info')
     return redirect(url_for('index'))
 
@@ -350,108 +438,16 @@ def mozo_required(view_func):
         return view_func(*args, **kwargs)
     return wrapped
 
-def ensure_mozos_table_exists():
-    try:
-        cur = mysql.connection.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS mozos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                email VARCHAR(120) UNIQUE,
-                telefono VARCHAR(30),
-                activo TINYINT(1) DEFAULT 1
-            )
-            """
-        )
-        mysql.connection.commit()
-        cur.close()
-    except Exception as e:
-        print(f"Error asegurando tabla mozos: {e}")
-
-
-def ensure_menu_table_upgrade():
-    try:
-        cur = mysql.connection.cursor()
-        cur.execute("DESCRIBE menu")
-        cols = [row[0].lower() for row in cur.fetchall()]
-        if 'imagen' not in cols:
-            try:
-                cur.execute("ALTER TABLE menu ADD COLUMN Imagen VARCHAR(255) NULL")
-            except Exception:
-                pass
-        if 'categoria' not in cols:
-            try:
-                cur.execute("ALTER TABLE menu ADD COLUMN Categoria VARCHAR(50) NULL")
-            except Exception:
-                pass
-        if 'descripcion' not in cols:
-            try:
-                cur.execute("ALTER TABLE menu ADD COLUMN Descripcion TEXT NULL")
-            except Exception:
-                pass
-        mysql.connection.commit()
-        cur.close()
-    except Exception as e:
-        print(f"No se pudo verificar/actualizar columnas de menu: {e}")
-
-def ensure_menu_table_exists():
-    try:
-        cur = mysql.connection.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS menu (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                Nombre_Menu VARCHAR(150) NOT NULL,
-                Precio DECIMAL(10,2) NOT NULL,
-                Categoria VARCHAR(50) NULL,
-                Imagen VARCHAR(255) NULL,
-                Descripcion TEXT NULL
-            )
-            """
-        )
-        mysql.connection.commit()
-        cur.close()
-    except Exception as e:
-        print(f"Error creando tabla menu si no existe: {e}")
-
-def ensure_productos_table_exists():
-    try:
-        cur = mysql.connection.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS productos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                nombre VARCHAR(150) NOT NULL,
-                descripcion TEXT NULL,
-                precio DECIMAL(10,2) NOT NULL,
-                imagen VARCHAR(255) NULL,
-                categoria VARCHAR(50) NULL
-            )
-            """
-        )
-        mysql.connection.commit()
-        cur.close()
-    except Exception as e:
-        print(f"Error creando tabla productos si no existe: {e}")
-
 # ===== Panel de Control (Admin) =====
 @app.route('/admin')
 @admin_required
 def admin_dashboard():
     try:
-        # Asegurar tablas necesarias para métricas
-        try:
-            ensure_client_orders_tables()
-        except Exception:
-            pass
-        ensure_menu_table_upgrade()
-        cur = mysql.connection.cursor()
+        cur = db.connection.cursor()
         
         # Obtener productos
         try:
-            cur.execute("SELECT id, Nombre_Menu, Precio, COALESCE(Categoria, ''), COALESCE(Imagen, ''), COALESCE(Descripcion, '') FROM menu ORDER BY id DESC")
-            productos = cur.fetchall()
+            productos = repositorio.listar_productos(cur)
         except Exception:
             productos = []
         
@@ -459,37 +455,81 @@ def admin_dashboard():
         stats = {}
         try:
             # Total de productos
-            cur.execute("SELECT COUNT(*) FROM menu")
-            stats['total_productos'] = cur.fetchone()[0] or 0
+            stats['total_productos'] = repositorio.contar_productos(cur)
         except Exception:
             stats['total_productos'] = 0
         
         try:
-            # Pedidos pendientes
-            cur.execute("SELECT COUNT(*) FROM pedidos WHERE estado = 'pendiente'")
-            stats['pedidos_pendientes'] = cur.fetchone()[0] or 0
+            # Pedidos pendientes y total, en una sola consulta
+            por_estado = contar_por_estado(cur)
+            stats['pedidos_pendientes'] = por_estado.get('pendiente', 0)
+            stats['total_pedidos'] = sum(por_estado.values())
         except Exception:
             stats['pedidos_pendientes'] = 0
-        
-        try:
-            # Total de pedidos
-            cur.execute("SELECT COUNT(*) FROM pedidos")
-            stats['total_pedidos'] = cur.fetchone()[0] or 0
-        except Exception:
             stats['total_pedidos'] = 0
         
         cur.close()
         return render_template('admin.html', categorias=[], productos=productos, stats=stats)
     except Exception as e:
-        print(f"Error al cargar dashboard admin: {e}")
+        log.exception("Error al cargar dashboard admin")
         flash('Error al cargar el panel de administración', 'error')
         return render_template('admin.html', categorias=[], productos=[], stats={})
 
+@app.route('/admin/db/pool')
+@admin_required
+def admin_db_pool():
+    """Estadísticas del pool de conexiones de este proceso"""
+    return jsonify(db.pool.stats())
+
+def _metricas_autorizadas():
+    token = app.config['METRICAS_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return True
+    # Sin loopback implícito: detrás de un proxy local todos los requests vienen de 127.0.0.1
+    if request.remote_addr in app.config['METRICAS_IPS']:
+        return True
+    return 'user_id' in session and (session.get('is_admin', False) or session.get('user_id') == 1)
+
+@app.route('/metrics')
+def metrics():
+    """Métricas de este proceso en formato Prometheus (admin, METRICAS_TOKEN o METRICAS_IPS)"""
+    if not _metricas_autorizadas():
+        return Response('Forbidden\n', status=403, mimetype='text/plain')
+    return Response(metricas.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/compresion')
+@admin_required
+def admin_compresion():
+    """Bytes sin comprimir y enviados por ruta en este proceso"""
+    return jsonify(compresion.estadisticas() if compresion else {})
+
+def _filtros_pedidos():
+    """Filtros de los tableros de pedidos a partir de la query string"""
+    estados = request.args.getlist('estado')
+    if 'todos' in estados:
+        estados = list(ESTADOS)
+    estados = [e for e in estados if e in ESTADOS] or list(ESTADOS_ACTIVOS)
+
+    def _fecha(nombre):
+        try:
+            return datetime.date.fromisoformat(request.args.get(nombre, ''))
+        except ValueError:
+            return None
+
+    antes_de = request.args.get('antes', type=int)
+    return {
+        'estados': estados,
+        'desde': _fecha('desde'),
+        'hasta': _fecha('hasta'),
+        'antes_de': antes_de,
+        'limite': app.config['PEDIDOS_POR_PAGINA'],
+    }
+
 # ===== Panel de Mozo =====
 @app.route('/mozo')
 @mozo_required
+@presupuesto_consultas(4)  # Pedidos e items, más la recarga del catálogo
 def mozo_dashboard():
-    ensure_client_orders_tables()
     productos_lista = []
     pedidos = []
     
@@ -497,158 +537,82 @@ def mozo_dashboard():
     cur = None
     try:
         # Usar la misma conexión para todo
-        conn = mysql.connection
+        conn = db.connection
         cur = conn.cursor()
         
-        print(f"\n[mozo_dashboard] ===== CARGANDO PANEL DE MOZO =====")
-        print(f"[mozo_dashboard] Conexión obtenida: {type(conn)}")
-        
-        # Verificar base de datos
-        try:
-            cur.execute("SELECT DATABASE()")
-            db_result = cur.fetchone()
-            db_name = db_result[0] if db_result else "DESCONOCIDA"
-            print(f"[mozo_dashboard] Usando base de datos: {db_name}")
-        except Exception as db_error:
-            print(f"[mozo_dashboard] Error verificando BD: {db_error}")
+        # Diagnóstico de la base: consultas extra, solo con logging DEBUG
+        if log.isEnabledFor(logging.DEBUG):
+            try:
+                log.debug("Panel de mozo: base %s, %s pedidos en total",
+                          db.descripcion()['base'], sum(contar_por_estado(cur).values()))
+            except Exception as db_error:
+                log.debug("Panel de mozo: error verificando la base: %s", db_error)
         
-        # Cargar productos de la tabla productos
+        # Productos del catálogo en memoria
         try:
-            cur.execute("""
-                SELECT id, nombre, precio, categoria, imagen, descripcion 
-                FROM productos 
-                ORDER BY id DESC
-            """)
-            productos_lista = cur.fetchall()
-            print(f"[mozo_dashboard] Productos cargados: {len(productos_lista)}")
-        except Exception as prod_error:
-            print(f"[mozo_dashboard] Error cargando productos: {prod_error}")
-            import traceback
-            traceback.print_exc()
+            productos_lista = catalogo.listado()
+        except Exception:
+            log.exception("Error cargando productos")
             productos_lista = []
-        
-        # Asegurar que la columna mesa y nombre_cliente existen
-        try:
-            cur.execute("DESCRIBE pedidos")
-            cols = [row[0].lower() for row in cur.fetchall()]
-            print(f"[mozo_dashboard] Columnas en tabla pedidos: {cols}")
-            
-            if 'mesa' not in cols:
-                print(f"[mozo_dashboard] Agregando columna 'mesa'...")
-                cur.execute("ALTER TABLE pedidos ADD COLUMN mesa VARCHAR(50) NULL")
-                conn.commit()
-            
-            if 'nombre_cliente' not in cols:
-                print(f"[mozo_dashboard] Agregando columna 'nombre_cliente'...")
-                cur.execute("ALTER TABLE pedidos ADD COLUMN nombre_cliente VARCHAR(100) NULL")
-                conn.commit()
-        except Exception as alter_error:
-            print(f"[mozo_dashboard] Error verificando/agregando columnas: {alter_error}")
-            import traceback
-            traceback.print_exc()
-
-        # Verificar que la tabla pedidos existe y tiene datos
-        try:
-            cur.execute("SELECT COUNT(*) FROM pedidos")
-            total_pedidos = cur.fetchone()[0]
-            print(f"[mozo_dashboard] Total pedidos en BD: {total_pedidos}")
-        except Exception as count_error:
-            print(f"[mozo_dashboard] Error contando pedidos: {count_error}")
-            total_pedidos = 0
-
-        # Obtener pedidos de clientes
+
+        # Obtener pedidos de clientes (filtrados y paginados)
+        filtros = _filtros_pedidos()
+        siguiente = None
         try:
-            cur.execute(
-                """
-                SELECT p.id, COALESCE(p.mesa, '') AS mesa, 
-                       COALESCE(p.nombre_cliente, u.nombre, 'Cliente') AS cliente,
-                       p.estado, p.creado_en
-                FROM pedidos p
-                LEFT JOIN usuarios u ON p.usuario_id = u.id
-                ORDER BY p.id DESC
-                """
-            )
-            base_rows = cur.fetchall()
-            print(f"[mozo_dashboard] Consulta ejecutada - Encontrados {len(base_rows)} pedidos en BD")
-            
-            if len(base_rows) == 0:
-                print(f"[mozo_dashboard] ⚠ No hay pedidos en la tabla 'pedidos'")
-            else:
-                print(f"[mozo_dashboard] Primeros pedidos: IDs {[r[0] for r in base_rows[:5]]}")
-        except Exception as query_error:
-            print(f"[mozo_dashboard] ✗ ERROR en consulta de pedidos: {query_error}")
-            import traceback
-            traceback.print_exc()
+            base_rows, siguiente = listar_pedidos(cur, **filtros)
+        except Exception:
+            log.exception("Error en la consulta de pedidos")
             base_rows = []
 
-        # Procesar cada pedido y obtener sus items
-        for row in base_rows:
-            pedido_id = row[0]
-            try:
-                # Intentar obtener items desde productos primero, luego desde menu
-                cur.execute(
-                    """
-                    SELECT pi.cantidad, pi.precio_unitario, 
-                           COALESCE(pr.nombre, m.Nombre_Menu, CONCAT('Producto ID:', pi.menu_id)) AS nombre_producto,
-                           COALESCE(pi.notas, '') AS notas
-                    FROM pedido_items pi
-                    LEFT JOIN productos pr ON pi.menu_id = pr.id
-                    LEFT JOIN menu m ON pi.menu_id = m.id
-                    WHERE pi.pedido_id = %s
-                    ORDER BY pi.id
-                    """,
-                    (pedido_id,)
-                )
-                items = cur.fetchall()
-                total = sum(float(it[0]) * float(it[1]) for it in items) if items else 0.0
-                
-                if len(items) > 0:
-                    print(f"  ✓ Pedido {pedido_id}: {len(items)} items encontrados - Total: ${total:.2f}")
-                    # Debug: mostrar notas de cada item
-                    for idx, it in enumerate(items):
-                        if len(it) > 3:
-                            notas_debug = it[3] if it[3] else '(vacío)'
-                            print(f"    Item {idx+1}: {it[2]} - Comentario: '{notas_debug}'")
-                        else:
-                            print(f"    Item {idx+1}: {it[2]} - Sin comentario (longitud: {len(it)})")
-                else:
-                    print(f"  ⚠ Pedido {pedido_id}: SIN ITEMS")
-                    # Verificar si hay items en la tabla
-                    cur.execute("SELECT COUNT(*) FROM pedido_items WHERE pedido_id = %s", (pedido_id,))
-                    count = cur.fetchone()[0]
-                    print(f"    Items en BD para pedido {pedido_id}: {count}")
-                
-                pedidos.append((row[0], row[1], row[2], row[3], row[4], items, total))
-            except Exception as e:
-                print(f"[mozo_dashboard] ✗ Error obteniendo items del pedido {pedido_id}: {e}")
-                import traceback
-                traceback.print_exc()
-                items = []
-                total = 0.0
-                pedidos.append((row[0], row[1], row[2], row[3], row[4], items, total))
-
-        print(f"[mozo_dashboard] Total pedidos procesados: {len(pedidos)}")
-        print(f"[mozo_dashboard] ================================\n")
+        # Items de todos los pedidos en una sola consulta
+        try:
+            pedidos = armar_tablero(cur, base_rows)
+        except Exception:
+            log.exception("Error obteniendo items de los pedidos")
+            pedidos = [(row[0], row[1], row[2], row[3], row[4], [], 0.0) for row in base_rows]
+
+        log.debug("Panel de mozo: %d productos, %d pedidos", len(productos_lista), len(pedidos))
         
         cur.close()
-        conn.close()
-        return render_template('mozo.html', pedidos=pedidos, productos=productos_lista)
-    except Exception as e:
-        print(f"[mozo_dashboard] ✗ ERROR general: {e}")
-        import traceback
-        traceback.print_exc()
+        return render_template('mozo.html', pedidos=pedidos, productos=productos_lista,
+                               filtros=filtros, siguiente=siguiente, estados=ESTADOS, transiciones=TRANSICIONES)
+    except Exception:
+        log.exception("Error cargando el panel de mozo")
         flash('Error al cargar panel de mozo', 'error')
         if cur:
             try:
                 cur.close()
             except:
                 pass
-        if conn:
-            try:
-                conn.close()
-            except:
-                pass
-        return render_template('mozo.html', pedidos=[], productos=[])
+        return render_template('mozo.html', pedidos=[], productos=[],
+                               filtros=_filtros_pedidos(), siguiente=None, estados=ESTADOS, transiciones=TRANSICIONES)
+
+@app.route('/mozo/stream')
+@mozo_required
+def mozo_stream():
+    """Feed SSE de pedidos creados, actualizados y eliminados"""
+    # Al reconectar, EventSource envía el id del último evento que recibió
+    ultimo_visto = request.headers.get('Last-Event-ID', type=int)
+
+    def generar():
+        actual = eventos_bus.suscribir()
+        desde = ultimo_visto if ultimo_visto is not None else actual
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                eventos = eventos_bus.esperar(desde, 15)
+                if not eventos:
+                    # Mantiene viva la conexión a través de proxies
+                    yield ": ping\n\n"
+                    continue
+                for evento in eventos:
+                    yield formatear_sse(evento)
+                    desde = evento[0]
+        finally:
+            eventos_bus.desuscribir()
+
+    return Response(generar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/mozo/productos/crear', methods=['POST'])
 @mozo_required
@@ -679,31 +643,9 @@ def mozo_productos_crear():
     cur = None
     try:
         # Obtener conexión y cursor - USAR LA MISMA CONEXIÓN para todo
-        conn = mysql.connection
+        conn = db.connection
         cur = conn.cursor()
-        
-        # Crear tabla si no existe
-        try:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS productos (
-                    id INT AUTO_INCREMENT PRIMARY KEY,
-                    nombre VARCHAR(150) NOT NULL,
-                    descripcion TEXT NULL,
-                    precio DECIMAL(10,2) NOT NULL,
-                    imagen VARCHAR(255) NULL,
-                    categoria VARCHAR(50) NULL,
-                    INDEX idx_categoria (categoria)
-                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-            """)
-            conn.commit()
-        except Exception as table_error:
-            print(f"[mozo_productos_crear] ERROR creando tabla: {table_error}")
-            import traceback
-            traceback.print_exc()
-            cur.close()
-            flash(f'Error al crear tabla: {str(table_error)}', 'error')
-            return redirect(url_for('mozo_dashboard'))
-        
+
         # Manejo de subida de archivo
         imagen_url = request.form.get('imagen', '').strip()  # URL de imagen si se proporciona
         imagen = imagen_url  # Inicializar con la URL si existe
@@ -711,8 +653,6 @@ def mozo_productos_crear():
         f = request.files.get('imagen_file')
         if f and getattr(f, 'filename', ''):
             from werkzeug.utils import secure_filename
-            import time
-            import hashlib
             
             filename = secure_filename(f.filename)
             _, ext = os.path.splitext(filename)
@@ -722,27 +662,12 @@ def mozo_productos_crear():
                 cur.close()
                 return redirect(url_for('mozo_dashboard'))
             
-            # Generar nombre único para evitar sobrescrituras
-            timestamp = int(time.time())
-            hash_part = hashlib.md5(f"{nombre}_{timestamp}".encode()).hexdigest()[:8]
-            unique_filename = f"{timestamp}_{hash_part}{ext}"
-            
-            dest = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-            
+            # Nombre = hash del contenido: la misma foto subida dos veces es un solo archivo
             try:
-                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-                f.save(dest)
-                
-                if os.path.exists(dest):
-                    imagen = f"images/{unique_filename}"
-                else:
-                    flash('No se pudo guardar la imagen', 'error')
-                    cur.close()
-                    return redirect(url_for('mozo_dashboard'))
+                imagen, _ = guardar_subida(f, app.config['UPLOAD_FOLDER'], ext)
+                variantes.encolar(imagen)
             except Exception as e:
-                print(f"[mozo_productos_crear] ERROR guardando imagen: {e}")
-                import traceback
-                traceback.print_exc()
+                log.exception("Error guardando imagen")
                 flash(f'Error al guardar la imagen: {str(e)}', 'error')
                 cur.close()
                 return redirect(url_for('mozo_dashboard'))
@@ -750,9 +675,7 @@ def mozo_productos_crear():
             imagen = ''
         
         # Verificar que no exista un producto con el mismo nombre
-        cur.execute("SELECT id FROM productos WHERE nombre = %s", (nombre,))
-        existing = cur.fetchone()
-        if existing:
+        if repositorio.producto_por_nombre(cur, nombre):
             flash(f'Ya existe un producto con el nombre "{nombre}"', 'warning')
         
         # Asegurar que la categoría esté en minúsculas antes de insertar
@@ -764,15 +687,9 @@ def mozo_productos_crear():
         
         # Insertar producto
         try:
-            cur.execute(
-                "INSERT INTO productos (nombre, descripcion, precio, imagen, categoria) VALUES (%s, %s, %s, %s, %s)",
-                (nombre, descripcion, precio_val, imagen, categoria_final)
-            )
-            product_id = cur.lastrowid
+            repositorio.crear_producto(cur, nombre, descripcion, precio_val, imagen, categoria_final)
         except Exception as insert_error:
-            print(f"[mozo_productos_crear] ERROR en INSERT: {insert_error}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error insertando producto")
             conn.rollback()
             cur.close()
             flash(f'Error al insertar producto: {str(insert_error)}', 'error')
@@ -781,10 +698,9 @@ def mozo_productos_crear():
         # Hacer commit
         try:
             conn.commit()
+            catalogo.invalidate()
         except Exception as commit_error:
-            print(f"[mozo_productos_crear] ERROR en commit: {commit_error}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Error en commit del producto nuevo")
             conn.rollback()
             cur.close()
             flash(f'Error al guardar producto: {str(commit_error)}', 'error')
@@ -794,9 +710,7 @@ def mozo_productos_crear():
         flash(f'Producto "{nombre}" agregado al menú correctamente', 'success')
         
     except Exception as e:
-        print(f"[mozo_productos_crear] ERROR general: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error creando producto")
         try:
             if conn:
                 conn.rollback()
@@ -819,71 +733,56 @@ def mozo_productos_eliminar(producto_id: int):
     cur = None
     try:
         # Usar la misma conexión para todo
-        conn = mysql.connection
+        conn = db.connection
         cur = conn.cursor()
         
-        # Obtener nombre del producto antes de eliminarlo
-        cur.execute("SELECT nombre FROM productos WHERE id = %s", (producto_id,))
-        producto = cur.fetchone()
+        # Obtener nombre e imagen del producto antes de eliminarlo
+        producto = repositorio.producto(cur, producto_id)
         
         if not producto:
             flash('Producto no encontrado', 'error')
             cur.close()
-            conn.close()
             return redirect(url_for('mozo_dashboard'))
         
-        nombre_producto = producto[0]
+        nombre_producto = producto[1]
         
         # Eliminar el producto
-        print(f"[mozo_productos_eliminar] Eliminando producto {producto_id}: {nombre_producto}")
-        cur.execute("DELETE FROM productos WHERE id = %s", (producto_id,))
-        rows_affected = cur.rowcount
-        print(f"[mozo_productos_eliminar] Filas afectadas por DELETE: {rows_affected}")
+        rows_affected = repositorio.eliminar_producto(cur, producto_id)
+        log.debug("DELETE producto %s (%s): %s filas", producto_id, nombre_producto, rows_affected)
         
         if rows_affected == 0:
             flash('No se pudo eliminar el producto. Verifica que el producto existe.', 'error')
             cur.close()
-            conn.close()
             return redirect(url_for('mozo_dashboard'))
         
         # Hacer commit usando la misma conexión
         conn.commit()
-        print(f"[mozo_productos_eliminar] ✓ Commit realizado")
+        catalogo.invalidate()
+        _recolectar_imagenes(cur, [producto[4]])
         
         # Verificar que se eliminó correctamente
-        cur.execute("SELECT id FROM productos WHERE id = %s", (producto_id,))
-        producto_verificado = cur.fetchone()
-        if producto_verificado:
-            print(f"[mozo_productos_eliminar] ⚠ ADVERTENCIA: El producto todavía existe después del DELETE")
+        if repositorio.producto(cur, producto_id):
+            log.warning("El producto %s todavía existe después del DELETE", producto_id)
             flash('Error: El producto no se eliminó correctamente', 'error')
         else:
-            print(f"[mozo_productos_eliminar] ✓ Producto eliminado correctamente")
+            log.info("Producto %s eliminado: %s", producto_id, nombre_producto)
             flash(f'Producto "{nombre_producto}" eliminado correctamente', 'success')
         
         cur.close()
-        conn.close()
         
     except Exception as e:
-        print(f"[mozo_productos_eliminar] Error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error eliminando producto %s", producto_id)
         try:
             if conn:
                 conn.rollback()
-                print(f"[mozo_productos_eliminar] Rollback realizado")
-        except Exception as rollback_error:
-            print(f"[mozo_productos_eliminar] Error en rollback: {rollback_error}")
+        except Exception:
+            log.exception("Error en rollback")
         flash(f'Error al eliminar producto: {str(e)}', 'error')
         if cur:
             try:
                 cur.close()
             except:
                 pass
-        if conn:
-            try:
-                conn.close()
-            except:
-                pass
     
     return redirect(url_for('mozo_dashboard'))
 
@@ -897,12 +796,9 @@ def mozo_productos_editar(producto_id: int):
     descripcion = request.form.get('descripcion', '').strip()
     imagen = request.form.get('imagen', '').strip()
     
-    print(f"[mozo_productos_editar] Datos recibidos del formulario:")
-    print(f"  - nombre: '{nombre}'")
-    print(f"  - precio: '{precio}'")
-    print(f"  - categoria: '{categoria}'")
-    print(f"  - descripcion: '{descripcion}'")
-    print(f"  - imagen: '{imagen}'")
+    log.debug("Editar producto %s", producto_id,
+              extra={'formulario': {'nombre': nombre, 'precio': precio, 'categoria': categoria,
+                                    'descripcion': descripcion, 'imagen': imagen}})
     
     categorias_validas = ['desayunos', 'almuerzos', 'cenas', 'meriendas', 'postres', 'bebidas', 'comida_sin_tac', 'promociones', 'veggie']
     
@@ -927,21 +823,16 @@ def mozo_productos_editar(producto_id: int):
     cur = None
     try:
         # Usar la misma conexión para todo
-        conn = mysql.connection
+        conn = db.connection
         cur = conn.cursor()
         
-        # Verificar que el producto existe
-        cur.execute("SELECT id FROM productos WHERE id = %s", (producto_id,))
-        if not cur.fetchone():
+        # Verificar que el producto existe (y guardar la imagen actual)
+        producto_actual = repositorio.producto(cur, producto_id)
+        if not producto_actual:
             flash('Producto no encontrado', 'error')
             cur.close()
-            conn.close()
             return redirect(url_for('mozo_dashboard'))
-        
-        # Obtener la imagen actual del producto antes de actualizar
-        cur.execute("SELECT imagen FROM productos WHERE id = %s", (producto_id,))
-        producto_actual = cur.fetchone()
-        imagen_actual = producto_actual[0] if producto_actual and producto_actual[0] else ''
+        imagen_actual = producto_actual[4] or ''
         
         # Manejo de subida de archivo
         imagen_nueva_subida = False
@@ -954,23 +845,17 @@ def mozo_productos_editar(producto_id: int):
                 if ext.lower() not in _ALLOWED_IMAGE_EXTS:
                     flash('Formato de imagen no permitido', 'error')
                     cur.close()
-                    conn.close()
                     return redirect(url_for('mozo_dashboard'))
                 
-                # Generar nombre único
-                import time
-                unique_filename = f"{int(time.time())}_{filename}"
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
                 try:
-                    f.save(filepath)
-                    imagen = f"images/{unique_filename}"
+                    imagen, _ = guardar_subida(f, app.config['UPLOAD_FOLDER'], ext)
                     imagen_nueva_subida = True
-                    print(f"[mozo_productos_editar] Imagen guardada: {imagen}")
-                except Exception as save_error:
-                    print(f"[mozo_productos_editar] Error guardando imagen: {save_error}")
+                    variantes.encolar(imagen)
+                    log.debug("Imagen guardada: %s", imagen)
+                except Exception:
+                    log.exception("Error guardando imagen")
                     flash('Error al guardar la imagen', 'error')
                     cur.close()
-                    conn.close()
                     return redirect(url_for('mozo_dashboard'))
         
         # Determinar qué imagen usar: URL proporcionada > archivo subido > imagen actual
@@ -984,172 +869,86 @@ def mozo_productos_editar(producto_id: int):
             # Si no hay nueva imagen ni URL, mantener la actual
             imagen_final = imagen_actual
         
-        # Obtener datos actuales antes de actualizar para comparar
-        cur.execute("SELECT nombre, precio, categoria, descripcion, imagen FROM productos WHERE id = %s", (producto_id,))
-        datos_antes = cur.fetchone()
-        if datos_antes:
-            print(f"[mozo_productos_editar] Datos ANTES del UPDATE:")
-            print(f"  - Nombre: '{datos_antes[0]}' -> '{nombre}'")
-            print(f"  - Precio: {datos_antes[1]} -> {precio_val}")
-            print(f"  - Categoría: '{datos_antes[2]}' -> '{categoria}'")
-            print(f"  - Descripción: '{datos_antes[3]}' -> '{descripcion}'")
-            print(f"  - Imagen: '{datos_antes[4]}' -> '{imagen_final}'")
-        
         # Actualizar producto
-        print(f"[mozo_productos_editar] Ejecutando UPDATE para producto {producto_id}")
-        cur.execute("""
-            UPDATE productos 
-            SET nombre = %s, descripcion = %s, precio = %s, imagen = %s, categoria = %s
-            WHERE id = %s
-        """, (nombre, descripcion, precio_val, imagen_final, categoria, producto_id))
-        
-        rows_affected = cur.rowcount
-        print(f"[mozo_productos_editar] Filas afectadas por UPDATE: {rows_affected}")
+        rows_affected = repositorio.actualizar_producto(cur, producto_id, nombre, descripcion, precio_val, imagen_final, categoria)
+        log.debug("UPDATE producto %s: %s filas", producto_id, rows_affected,
+                  extra={'antes': producto_actual[1:],
+                         'despues': (nombre, precio_val, categoria, descripcion, imagen_final)})
         
         if rows_affected == 0:
             flash('No se pudo actualizar el producto. Verifica que el producto existe.', 'error')
             cur.close()
-            conn.close()
             return redirect(url_for('mozo_dashboard'))
         
         # Hacer commit usando la misma conexión
         conn.commit()
-        print(f"[mozo_productos_editar] ✓ Commit realizado")
+        catalogo.invalidate()
         
-        # Verificar que se actualizó correctamente
-        cur.execute("SELECT nombre, precio, categoria, descripcion, imagen FROM productos WHERE id = %s", (producto_id,))
-        producto_verificado = cur.fetchone()
-        if producto_verificado:
-            print(f"[mozo_productos_editar] Producto verificado después del UPDATE:")
-            print(f"  - Nombre: {producto_verificado[0]}")
-            print(f"  - Precio: {producto_verificado[1]}")
-            print(f"  - Categoría: {producto_verificado[2]}")
-            print(f"  - Descripción: {producto_verificado[3]}")
-            print(f"  - Imagen: {producto_verificado[4]}")
+        # Si cambió la imagen, borrar la anterior cuando ya nadie la usa
+        if imagen_actual and imagen_actual != imagen_final:
+            _recolectar_imagenes(cur, [imagen_actual])
         
         cur.close()
-        conn.close()
         
         flash(f'Producto "{nombre}" actualizado correctamente', 'success')
-        print(f"[mozo_productos_editar] Producto {producto_id} actualizado exitosamente: {nombre}")
+        log.info("Producto %s actualizado: %s", producto_id, nombre)
     except Exception as e:
-        print(f"[mozo_productos_editar] Error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error actualizando producto %s", producto_id)
         try:
             if conn:
                 conn.rollback()
-                print(f"[mozo_productos_editar] Rollback realizado")
-        except Exception as rollback_error:
-            print(f"[mozo_productos_editar] Error en rollback: {rollback_error}")
+        except Exception:
+            log.exception("Error en rollback")
         flash(f'Error al actualizar producto: {str(e)}', 'error')
         if cur:
             try:
                 cur.close()
             except:
                 pass
-        if conn:
-            try:
-                conn.close()
-            except:
-                pass
     
     return redirect(url_for('mozo_dashboard'))
 
+def _cambiar_estado_formulario(pedido_id):
+    """Cambio de estado desde los formularios de mozo y admin, con las mismas
+    reglas que PATCH /api/pedidos/<id>/estado: solo transiciones de TRANSICIONES
+    y solo si el pedido sigue en el estado leído. Devuelve (mensaje, categoria) para flash().
+    """
+    nuevo = request.form.get('estado', '').strip()
+    if nuevo not in ESTADOS:
+        return (f'Estado "{nuevo}" no es válido' if nuevo else 'Debes seleccionar un estado válido'), 'error'
+    conn = db.connection
+    cur = conn.cursor()
+    try:
+        pedido = datos_pedido(cur, pedido_id)
+        if not pedido:
+            return 'Pedido no encontrado', 'error'
+        anterior = pedido[0]
+        if nuevo == anterior:
+            return f'El pedido ya estaba en "{nuevo}"', 'info'
+        if not transicion_valida(anterior, nuevo):
+            return f'No se puede pasar de "{anterior}" a "{nuevo}"', 'error'
+        actual = cambiar_estado(cur, pedido_id, anterior, nuevo)
+        if actual == '':
+            return 'Pedido no encontrado', 'error'
+        if actual is not None:
+            return f'Otro usuario ya cambió el pedido a "{actual}"', 'error'
+        publicar(cur, 'estado', pedido_id, {'pedido_id': pedido_id, 'estado': nuevo, 'anterior': anterior})
+        conn.commit()
+    except Exception:
+        log.exception("Error actualizando estado del pedido %s", pedido_id)
+        conn.rollback()
+        return 'Error al actualizar el estado del pedido', 'error'
+    finally:
+        cur.close()
+    log.debug("Pedido %s: %s -> %s", pedido_id, anterior, nuevo)
+    return f'Estado del pedido actualizado a "{nuevo}"', 'success'
+
 @app.route('/mozo/pedidos-cliente/<int:pedido_id>/estado', methods=['POST'])
 @mozo_required
 def mozo_pedido_cliente_estado(pedido_id: int):
     """Permite a los mozos actualizar el estado de pedidos de clientes"""
-    nuevo_estado = request.form.get('estado', '').strip()
-    
-    print(f"\n[mozo_pedido_cliente_estado] ===== ACTUALIZANDO ESTADO =====")
-    print(f"[mozo_pedido_cliente_estado] Pedido ID: {pedido_id}")
-    print(f"[mozo_pedido_cliente_estado] Nuevo estado recibido: '{nuevo_estado}'")
-    print(f"[mozo_pedido_cliente_estado] Form data completo: {request.form}")
-    
-    if not nuevo_estado:
-        flash('Debes seleccionar un estado válido', 'error')
-        print(f"[mozo_pedido_cliente_estado] ✗ Error: No se recibió estado")
-        return redirect(url_for('mozo_dashboard'))
-    
-    estados_validos = ['pendiente', 'en_preparacion', 'listo', 'entregado', 'cancelado']
-    if nuevo_estado not in estados_validos:
-        flash(f'Estado "{nuevo_estado}" no es válido', 'error')
-        print(f"[mozo_pedido_cliente_estado] ✗ Error: Estado '{nuevo_estado}' no válido")
-        return redirect(url_for('mozo_dashboard'))
-    
-    conn = None
-    cur = None
-    try:
-        ensure_client_orders_tables()
-        conn = mysql.connection
-        cur = conn.cursor()
-        
-        # Verificar estado actual del pedido
-        cur.execute("SELECT estado, nombre_cliente, mesa FROM pedidos WHERE id = %s", (pedido_id,))
-        pedido_actual = cur.fetchone()
-        
-        if not pedido_actual:
-            flash('Pedido no encontrado', 'error')
-            print(f"[mozo_pedido_cliente_estado] ✗ Error: Pedido {pedido_id} no encontrado")
-            cur.close()
-            return redirect(url_for('mozo_dashboard'))
-        
-        estado_anterior = pedido_actual[0]
-        print(f"[mozo_pedido_cliente_estado] Estado anterior: '{estado_anterior}'")
-        print(f"[mozo_pedido_cliente_estado] Estado nuevo: '{nuevo_estado}'")
-        
-        # Actualizar el estado
-        cur.execute("UPDATE pedidos SET estado=%s WHERE id=%s", (nuevo_estado, pedido_id))
-        rows_affected = cur.rowcount
-        print(f"[mozo_pedido_cliente_estado] Filas afectadas por UPDATE: {rows_affected}")
-        
-        if rows_affected == 0:
-            print(f"[mozo_pedido_cliente_estado] ⚠ ADVERTENCIA: No se actualizó ninguna fila")
-            flash('No se pudo actualizar el estado del pedido', 'error')
-            cur.close()
-            return redirect(url_for('mozo_dashboard'))
-        
-        # Hacer commit
-        conn.commit()
-        print(f"[mozo_pedido_cliente_estado] ✓ Commit realizado")
-        
-        # Verificar que se actualizó correctamente
-        cur.execute("SELECT estado FROM pedidos WHERE id = %s", (pedido_id,))
-        estado_verificado = cur.fetchone()
-        if estado_verificado:
-            estado_final = estado_verificado[0]
-            print(f"[mozo_pedido_cliente_estado] Estado verificado después del commit: '{estado_final}'")
-            if estado_final != nuevo_estado:
-                print(f"[mozo_pedido_cliente_estado] ✗ ERROR: El estado no se actualizó correctamente!")
-                print(f"[mozo_pedido_cliente_estado]   Esperado: '{nuevo_estado}', Obtenido: '{estado_final}'")
-                flash(f'Error: El estado no se actualizó correctamente', 'error')
-            else:
-                print(f"[mozo_pedido_cliente_estado] ✓ Estado actualizado correctamente")
-                flash(f'Estado del pedido actualizado a "{nuevo_estado}"', 'success')
-        else:
-            print(f"[mozo_pedido_cliente_estado] ✗ ERROR: No se pudo verificar el estado")
-            flash('Error al verificar el estado actualizado', 'error')
-        
-        cur.close()
-        print(f"[mozo_pedido_cliente_estado] ================================\n")
-        
-    except Exception as e:
-        print(f"[mozo_pedido_cliente_estado] ✗ ERROR: {e}")
-        import traceback
-        traceback.print_exc()
-        try:
-            if conn:
-                conn.rollback()
-        except:
-            pass
-        flash(f'Error al actualizar estado: {str(e)}', 'error')
-        if cur:
-            try:
-                cur.close()
-            except:
-                pass
-    
+    mensaje, categoria = _cambiar_estado_formulario(pedido_id)
+    flash(mensaje, categoria)
     return redirect(url_for('mozo_dashboard'))
 
 @app.route('/mozo/pedidos-cliente/<int:pedido_id>/eliminar', methods=['POST'])
@@ -1159,20 +958,14 @@ def mozo_pedido_cliente_eliminar(pedido_id: int):
     conn = None
     cur = None
     try:
-        ensure_client_orders_tables()
-        conn = mysql.connection
+        conn = db.connection
         cur = conn.cursor()
         
-        print(f"\n[mozo_pedido_cliente_eliminar] ===== ELIMINANDO PEDIDO =====")
-        print(f"[mozo_pedido_cliente_eliminar] Pedido ID: {pedido_id}")
-        
         # Verificar el estado del pedido antes de eliminar
-        cur.execute("SELECT estado, nombre_cliente, mesa FROM pedidos WHERE id = %s", (pedido_id,))
-        pedido = cur.fetchone()
+        pedido = datos_pedido(cur, pedido_id)
         
         if not pedido:
             flash('Pedido no encontrado', 'error')
-            print(f"[mozo_pedido_cliente_eliminar] ✗ Error: Pedido {pedido_id} no encontrado")
             cur.close()
             return redirect(url_for('mozo_dashboard'))
         
@@ -1180,55 +973,37 @@ def mozo_pedido_cliente_eliminar(pedido_id: int):
         nombre_cliente = pedido[1] or 'Cliente'
         mesa = pedido[2] or 'N/A'
         
-        print(f"[mozo_pedido_cliente_eliminar] Estado: {estado}, Cliente: {nombre_cliente}, Mesa: {mesa}")
-        
         # Solo permitir eliminar pedidos entregados o cancelados
         if estado not in ['entregado', 'cancelado']:
             flash(f'No se puede eliminar un pedido con estado "{estado}". Solo se pueden eliminar pedidos entregados o cancelados.', 'warning')
-            print(f"[mozo_pedido_cliente_eliminar] ✗ Error: Estado '{estado}' no permite eliminación")
             cur.close()
             return redirect(url_for('mozo_dashboard'))
         
-        # Primero eliminar los items del pedido (por si CASCADE no funciona)
-        try:
-            cur.execute("DELETE FROM pedido_items WHERE pedido_id = %s", (pedido_id,))
-            items_eliminados = cur.rowcount
-            print(f"[mozo_pedido_cliente_eliminar] Items eliminados: {items_eliminados}")
-        except Exception as items_error:
-            print(f"[mozo_pedido_cliente_eliminar] ⚠ Advertencia al eliminar items: {items_error}")
-            # Continuar de todas formas, puede que CASCADE lo haga automáticamente
-        
-        # Eliminar el pedido
-        cur.execute("DELETE FROM pedidos WHERE id = %s", (pedido_id,))
-        rows_affected = cur.rowcount
-        print(f"[mozo_pedido_cliente_eliminar] Filas afectadas por DELETE: {rows_affected}")
+        # Eliminar el pedido y sus items
+        rows_affected = eliminar_pedido(cur, pedido_id)
         
         if rows_affected == 0:
             flash('No se pudo eliminar el pedido', 'error')
-            print(f"[mozo_pedido_cliente_eliminar] ✗ Error: No se eliminó ninguna fila")
             cur.close()
             return redirect(url_for('mozo_dashboard'))
         
+        publicar(cur, 'eliminado', pedido_id, {'pedido_id': pedido_id})
+        
         # Hacer commit
         conn.commit()
-        print(f"[mozo_pedido_cliente_eliminar] ✓ Commit realizado")
         
         flash(f'Pedido #{pedido_id} eliminado correctamente (Cliente: {nombre_cliente}, Mesa: {mesa})', 'success')
-        print(f"[mozo_pedido_cliente_eliminar] ✓ Pedido {pedido_id} eliminado exitosamente")
-        print(f"[mozo_pedido_cliente_eliminar] ================================\n")
+        log.info("Pedido %s eliminado (cliente %s, mesa %s)", pedido_id, nombre_cliente, mesa)
         
         cur.close()
         
     except Exception as e:
-        print(f"[mozo_pedido_cliente_eliminar] ✗ ERROR: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error eliminando pedido %s", pedido_id)
         try:
             if conn:
                 conn.rollback()
-                print(f"[mozo_pedido_cliente_eliminar] Rollback realizado")
-        except Exception as rollback_error:
-            print(f"[mozo_pedido_cliente_eliminar] Error en rollback: {rollback_error}")
+        except Exception:
+            log.exception("Error en rollback")
         flash(f'Error al eliminar pedido: {str(e)}', 'error')
         if cur:
             try:
@@ -1248,14 +1023,13 @@ def admin_categorias_crear():
         flash('El nombre de la categoría es obligatorio', 'error')
         return redirect(url_for('admin_dashboard'))
     try:
-        cur = mysql.connection.cursor()
-        # Esquema actual: columnas `Nombre`, `orden`
-        cur.execute("INSERT INTO categorias (Nombre, orden) VALUES (%s, %s)", (nombre, orden or ''))
-        mysql.connection.commit()
+        cur = db.connection.cursor()
+        repositorio.crear_categoria(cur, nombre, orden)
+        db.connection.commit()
         cur.close()
         flash('Categoría creada', 'success')
     except Exception as e:
-        print(f"Error creando categoría: {e}")
+        log.exception("Error creando categoría")
         flash('Error al crear categoría', 'error')
     return redirect(url_for('admin_dashboard'))
 
@@ -1265,13 +1039,13 @@ def admin_categorias_actualizar(categoria_id: int):
     nombre = request.form.get('nombre')
     orden = request.form.get('orden')
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("UPDATE categorias SET Nombre=%s, orden=%s WHERE id=%s", (nombre, orden or '', categoria_id))
-        mysql.connection.commit()
+        cur = db.connection.cursor()
+        repositorio.actualizar_categoria(cur, categoria_id, nombre, orden)
+        db.connection.commit()
         cur.close()
         flash('Categoría actualizada', 'success')
     except Exception as e:
-        print(f"Error actualizando categoría: {e}")
+        log.exception("Error actualizando categoría")
         flash('Error al actualizar categoría', 'error')
     return redirect(url_for('admin_dashboard'))
 
@@ -1279,17 +1053,17 @@ def admin_categorias_actualizar(categoria_id: int):
 @admin_required
 def admin_categorias_eliminar(categoria_id: int):
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("DELETE FROM categorias WHERE id=%s", (categoria_id,))
-        mysql.connection.commit()
+        cur = db.connection.cursor()
+        repositorio.eliminar_categoria(cur, categoria_id)
+        db.connection.commit()
         cur.close()
         flash('Categoría eliminada', 'success')
     except Exception as e:
-        print(f"Error eliminando categoría: {e}")
+        log.exception("Error eliminando categoría")
         flash('Error al eliminar categoría', 'error')
     return redirect(url_for('admin_dashboard'))
 
-# ===== CRUD Productos (tabla `menu`) =====
+# ===== CRUD Productos (panel de admin) =====
 @app.route('/admin/productos/crear', methods=['POST'])
 @admin_required
 def admin_productos_crear():
@@ -1302,17 +1076,14 @@ def admin_productos_crear():
         flash('Nombre y precio son obligatorios', 'error')
         return redirect(url_for('admin_dashboard'))
     try:
-        ensure_menu_table_upgrade()
-        cur = mysql.connection.cursor()
-        cur.execute(
-            "INSERT INTO menu (Nombre_Menu, Precio, Categoria, Imagen, Descripcion) VALUES (%s, %s, %s, %s, %s)",
-            (nombre, precio, categoria, imagen, descripcion)
-        )
-        mysql.connection.commit()
+        cur = db.connection.cursor()
+        repositorio.crear_producto(cur, nombre, descripcion, precio, imagen, categoria)
+        db.connection.commit()
+        catalogo.invalidate()
         cur.close()
         flash('Producto creado', 'success')
     except Exception as e:
-        print(f"Error creando producto: {e}")
+        log.exception("Error creando producto")
         flash('Error al crear producto', 'error')
     return redirect(url_for('admin_dashboard'))
 
@@ -1325,17 +1096,17 @@ def admin_productos_actualizar(producto_id: int):
     imagen = request.form.get('imagen')
     descripcion = request.form.get('descripcion', '')
     try:
-        ensure_menu_table_upgrade()
-        cur = mysql.connection.cursor()
-        cur.execute(
-            "UPDATE menu SET Nombre_Menu=%s, Precio=%s, Categoria=%s, Imagen=%s, Descripcion=%s WHERE id=%s",
-            (nombre, precio, categoria, imagen, descripcion, producto_id)
-        )
-        mysql.connection.commit()
+        cur = db.connection.cursor()
+        anterior = repositorio.imagen_producto(cur, producto_id)
+        repositorio.actualizar_producto(cur, producto_id, nombre, descripcion, precio, imagen, categoria)
+        db.connection.commit()
+        catalogo.invalidate()
+        if anterior and anterior != imagen:
+            _recolectar_imagenes(cur, [anterior])
         cur.close()
         flash('Producto actualizado', 'success')
     except Exception as e:
-        print(f"Error actualizando producto: {e}")
+        log.exception("Error actualizando producto")
         flash('Error al actualizar producto', 'error')
     return redirect(url_for('admin_dashboard'))
 
@@ -1343,152 +1114,68 @@ def admin_productos_actualizar(producto_id: int):
 @admin_required
 def admin_productos_eliminar(producto_id: int):
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("DELETE FROM menu WHERE id=%s", (producto_id,))
-        mysql.connection.commit()
+        cur = db.connection.cursor()
+        anterior = repositorio.imagen_producto(cur, producto_id)
+        repositorio.eliminar_producto(cur, producto_id)
+        db.connection.commit()
+        catalogo.invalidate()
+        if anterior:
+            _recolectar_imagenes(cur, [anterior])
         cur.close()
         flash('Producto eliminado', 'success')
     except Exception as e:
-        print(f"Error eliminando producto: {e}")
+        log.exception("Error eliminando producto")
         flash('Error al eliminar producto', 'error')
     return redirect(url_for('admin_dashboard'))
 
 # ===== Carrito de compras (cliente) =====
-def ensure_client_orders_tables():
-    try:
-        cur = mysql.connection.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS pedidos (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                usuario_id INT NULL,
-                estado VARCHAR(20) DEFAULT 'pendiente',
-                mesa VARCHAR(50) NULL,
-                nombre_cliente VARCHAR(100) NULL,
-                creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-            )
-            """
-        )
-        # Asegurar que las columnas existan (por si la tabla ya existía sin ellas)
-        try:
-            cur.execute("DESCRIBE pedidos")
-            cols = [row[0].lower() for row in cur.fetchall()]
-            if 'mesa' not in cols:
-                cur.execute("ALTER TABLE pedidos ADD COLUMN mesa VARCHAR(50) NULL")
-            if 'nombre_cliente' not in cols:
-                cur.execute("ALTER TABLE pedidos ADD COLUMN nombre_cliente VARCHAR(100) NULL")
-            mysql.connection.commit()
-        except Exception as e:
-            print(f"Error verificando columnas de pedidos: {e}")
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS pedido_items (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                pedido_id INT NOT NULL,
-                menu_id INT NOT NULL,
-                cantidad INT NOT NULL DEFAULT 1,
-                precio_unitario DECIMAL(10,2) NOT NULL,
-                notas TEXT NULL,
-                FOREIGN KEY (pedido_id) REFERENCES pedidos(id) ON DELETE CASCADE
-            )
-            """
-        )
-        # Asegurar que la columna notas existe (por si la tabla ya existía sin ella)
-        try:
-            cur.execute("DESCRIBE pedido_items")
-            cols = [row[0].lower() for row in cur.fetchall()]
-            if 'notas' not in cols:
-                cur.execute("ALTER TABLE pedido_items ADD COLUMN notas TEXT NULL")
-                mysql.connection.commit()
-        except Exception as e:
-            print(f"Error verificando columna notas en pedido_items: {e}")
-        # Intentar eliminar la foreign key restrictiva a menu si existe
-        try:
-            cur.execute("""
-                SELECT CONSTRAINT_NAME 
-                FROM information_schema.KEY_COLUMN_USAGE 
-                WHERE TABLE_NAME = 'pedido_items' 
-                AND TABLE_SCHEMA = DATABASE()
-                AND REFERENCED_TABLE_NAME = 'menu'
-            """)
-            fk_result = cur.fetchone()
-            if fk_result:
-                fk_name = fk_result[0]
-                cur.execute(f"ALTER TABLE pedido_items DROP FOREIGN KEY {fk_name}")
-                mysql.connection.commit()
-                print(f"[ensure_client_orders_tables] Foreign key {fk_name} eliminada de pedido_items")
-        except Exception as e:
-            print(f"[ensure_client_orders_tables] No se pudo eliminar foreign key (puede que no exista): {e}")
-        mysql.connection.commit()
-        cur.close()
-    except Exception as e:
-        print(f"Error asegurando tablas de pedidos cliente: {e}")
-
 def _get_cart():
     return session.setdefault('cart', {})
 
+def _quiere_json():
+    """True si el cliente pidió JSON (fetch con Accept: application/json)"""
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+def _guardar_carrito(cart):
+    session['cart'] = cart
+    # El carrito cambió: la cotización de este request ya no vale
+    g.pop('_carrito_cotizado', None)
+
+def _linea_carrito(clave):
+    """Línea cotizada del carrito para la clave dada, o None"""
+    lineas, _ = _cotizar_carrito()
+    return next((linea for linea in lineas if linea['id'] == clave), None)
+
+def _respuesta_carrito(cart, mensaje, **extra):
+    """Respuesta JSON de los endpoints del carrito"""
+    _, total = _cotizar_carrito()
+    data = {'ok': True, 'mensaje': mensaje, 'cart_count': cantidad_total(cart), 'total': total}
+    data.update(extra)
+    return jsonify(data)
+
 @app.route('/cart')
+@presupuesto_consultas(3)  # Solo al recargar el catálogo
 def cart_view():
-    cart = _get_cart()
-    items = []
-    total = 0.0
+    # Solo lectura: no crear una sesión para quien solo mira el carrito vacío
+    cart = session.get('cart', {})
     nombre_cliente = session.get('nombre_cliente', '')
     mesa_carrito = session.get('mesa_carrito', '')
-    
     try:
-        cur = mysql.connection.cursor()
-        for pid, entry in cart.items():
-            try:
-                # Si es un producto temporal
-                if entry.get('temp', False):
-                    cantidad = int(entry.get('qty', 1))
-                    precio = float(entry.get('precio', 0))
-                    subtotal = cantidad * precio
-                    total += subtotal
-                    items.append({
-                        'id': pid,
-                        'nombre': entry.get('nombre', 'Producto'),
-                        'precio': precio,
-                        'cantidad': cantidad,
-                        'subtotal': subtotal,
-                        'notas': entry.get('notas', ''),
-                    })
-                else:
-                    # Producto de la base de datos - usar tabla productos
-                    try:
-                        cur.execute("SELECT id, nombre, precio FROM productos WHERE id=%s", (pid,))
-                        row = cur.fetchone()
-                    except:
-                        # Si no existe en productos, intentar en menu
-                        cur.execute("SELECT id, Nombre_Menu, Precio FROM menu WHERE id=%s", (pid,))
-                        row = cur.fetchone()
-                    
-                    if not row:
-                        continue
-                    cantidad = int(entry.get('qty', 1))
-                    precio = float(row[2])
-                    subtotal = cantidad * precio
-                    total += subtotal
-                    items.append({
-                        'id': row[0],
-                        'nombre': row[1],
-                        'precio': precio,
-                        'cantidad': cantidad,
-                        'subtotal': subtotal,
-                        'notas': entry.get('notas', ''),
-                    })
-            except Exception as e:
-                print(f"Error cargando item {pid}: {e}")
-                continue
-        cur.close()
+        items, total = _cotizar_carrito()
     except Exception as e:
-        print(f"Error cargando carrito: {e}")
+        log.exception("Error cargando carrito")
+        items, total = [], 0.0
+    if _quiere_json():
+        # Contador del menú cuando no se pudo confirmar un agregado
+        return jsonify({'cart_count': cantidad_total(cart), 'total': total})
     return render_template('cart.html', items=items, total=total, nombre_cliente=nombre_cliente, mesa_carrito=mesa_carrito)
 
 @app.route('/cart/add/<int:producto_id>', methods=['POST'])
 def cart_add(producto_id: int):
-    qty = int(request.form.get('qty', '1'))
+    try:
+        qty = int(request.form.get('qty', '1'))
+    except ValueError:
+        qty = 1
     mesa = request.form.get('mesa', '').strip()
     nombre_cliente = request.form.get('nombre_cliente', '').strip()
     notas = request.form.get('notas', '').strip()
@@ -1502,20 +1189,9 @@ def cart_add(producto_id: int):
     if mesa:
         session['mesa_carrito'] = mesa
     
-    # Obtener nombre del producto para el mensaje
-    try:
-        cur = mysql.connection.cursor()
-        # Intentar obtener de productos primero
-        cur.execute("SELECT nombre FROM productos WHERE id = %s", (producto_id,))
-        row = cur.fetchone()
-        if not row:
-            # Si no está en productos, buscar en menu
-            cur.execute("SELECT Nombre_Menu FROM menu WHERE id = %s", (producto_id,))
-            row = cur.fetchone()
-        nombre_producto = row[0] if row else 'Producto'
-        cur.close()
-    except:
-        nombre_producto = 'Producto'
+    # Nombre del producto para el mensaje (desde el catálogo en memoria)
+    producto = catalogo.producto(producto_id)
+    nombre_producto = producto['nombre'] if producto else 'Producto'
     
     # Si el producto ya está en el carrito, incrementar cantidad
     if key in cart:
@@ -1527,12 +1203,12 @@ def cart_add(producto_id: int):
                 cart[key]['notas'] = f"{notas_existentes}; {notas}"
             else:
                 cart[key]['notas'] = notas
-        flash(f'Cantidad actualizada: {nombre_producto} x{qty} agregado al carrito', 'success')
+        mensaje = f'Cantidad actualizada: {nombre_producto} x{qty} agregado al carrito'
     else:
         cart[key] = {'qty': qty}
         if notas:
             cart[key]['notas'] = notas
-        flash(f'{nombre_producto} agregado al carrito (Cantidad: {qty})', 'success')
+        mensaje = f'{nombre_producto} agregado al carrito (Cantidad: {qty})'
     
     # Guardar nombre del cliente y mesa en cada item del carrito
     if nombre_cliente:
@@ -1540,18 +1216,31 @@ def cart_add(producto_id: int):
     if mesa:
         cart[key]['mesa'] = mesa
     
-    session['cart'] = cart
+    _guardar_carrito(cart)
+    if _quiere_json():
+        return _respuesta_carrito(cart, mensaje, item=_linea_carrito(key))
+    flash(mensaje, 'success')
     return redirect(url_for('index'))
 
 @app.route('/cart/add/temp', methods=['POST'])
 def cart_add_temp():
     nombre = request.form.get('nombre')
-    precio = float(request.form.get('precio', 0))
-    qty = int(request.form.get('qty', '1'))
+    if not nombre:
+        if _quiere_json():
+            return jsonify({'ok': False, 'error': 'Falta el nombre del producto'}), 400
+        flash('Falta el nombre del producto', 'error')
+        return redirect(request.referrer or url_for('index'))
+    try:
+        precio = float(request.form.get('precio', 0))
+        qty = int(request.form.get('qty', '1'))
+    except ValueError:
+        if _quiere_json():
+            return jsonify({'ok': False, 'error': 'Precio o cantidad inválidos'}), 400
+        flash('Precio o cantidad inválidos', 'error')
+        return redirect(request.referrer or url_for('index'))
     categoria = request.form.get('categoria', '')
     
     # Crear un ID único para el producto temporal usando hash del nombre
-    import hashlib
     temp_id = 'temp_' + hashlib.md5(nombre.encode()).hexdigest()[:10]
     
     cart = _get_cart()
@@ -1565,13 +1254,18 @@ def cart_add_temp():
             'categoria': categoria,
             'temp': True
         }
-    session['cart'] = cart
-    flash(f'{nombre} agregado al carrito', 'success')
+    _guardar_carrito(cart)
+    mensaje = f'{nombre} agregado al carrito'
+    if _quiere_json():
+        return _respuesta_carrito(cart, mensaje, item=_linea_carrito(temp_id))
+    flash(mensaje, 'success')
     return redirect(request.referrer or url_for('index'))
 
 @app.route('/cart/update', methods=['POST'])
 def cart_update():
     cart = _get_cart()
+    actualizados = []
+    eliminados = []
     for key, value in request.form.items():
         if key.startswith('qty_'):
             pid = key.split('qty_')[-1]
@@ -1582,23 +1276,32 @@ def cart_update():
             if pid in cart:
                 if qty <= 0:
                     del cart[pid]
+                    eliminados.append(pid)
                 else:
                     cart[pid]['qty'] = qty
-    session['cart'] = cart
+                    actualizados.append(pid)
+    _guardar_carrito(cart)
+    if _quiere_json():
+        items = [_linea_carrito(pid) for pid in actualizados]
+        return _respuesta_carrito(cart, 'Carrito actualizado', items=[it for it in items if it], eliminados=eliminados)
     flash('Carrito actualizado', 'success')
     return redirect(url_for('cart_view'))
 
-@app.route('/cart/remove/<int:producto_id>', methods=['POST'])
-def cart_remove(producto_id: int):
+@app.route('/cart/remove/<producto_id>', methods=['POST'])
+def cart_remove(producto_id):
+    # Acepta ids numéricos y de productos temporales (temp_...)
     cart = _get_cart()
     key = str(producto_id)
     if key in cart:
         del cart[key]
-        session['cart'] = cart
+        _guardar_carrito(cart)
+    if _quiere_json():
+        return _respuesta_carrito(cart, 'Producto eliminado del carrito', eliminados=[key])
     flash('Producto eliminado del carrito', 'info')
     return redirect(url_for('cart_view'))
 
 @app.route('/cart/checkout', methods=['POST'])
+@presupuesto_consultas(4)  # Precios, pedido, items y evento: no depende del tamaño del carrito
 def cart_checkout():
     cart = _get_cart()
     if not cart:
@@ -1617,336 +1320,274 @@ def cart_checkout():
         flash('Debes indicar el número de mesa', 'error')
         return redirect(url_for('cart_view'))
     
-    ensure_client_orders_tables()
     conn = None
     cur = None
     try:
-        # Usar la misma conexión para todo
-        conn = mysql.connection
+        conn = db.connection
         cur = conn.cursor()
-        
-        print(f"\n[CHECKOUT] ===== PROCESANDO PEDIDO DESDE CARRITO =====")
-        print(f"[CHECKOUT] Cliente: {nombre_cliente}, Mesa: {mesa}, Items en carrito: {len(cart)}")
-        
-        # Verificar base de datos
-        try:
-            cur.execute("SELECT DATABASE()")
-            db_result = cur.fetchone()
-            db_name = db_result[0] if db_result else "DESCONOCIDA"
-            print(f"[CHECKOUT] Usando base de datos: {db_name}")
-        except Exception as db_error:
-            print(f"[CHECKOUT] Error verificando BD: {db_error}")
-        
-        # Verificar si las columnas existen
-        try:
-            cur.execute("DESCRIBE pedidos")
-            cols = [row[0].lower() for row in cur.fetchall()]
-            print(f"[CHECKOUT] Columnas en tabla pedidos: {cols}")
-            
-            if 'mesa' not in cols:
-                print(f"[CHECKOUT] Agregando columna 'mesa'...")
-                cur.execute("ALTER TABLE pedidos ADD COLUMN mesa VARCHAR(50) NULL")
-                conn.commit()
-            
-            if 'nombre_cliente' not in cols:
-                print(f"[CHECKOUT] Agregando columna 'nombre_cliente'...")
-                cur.execute("ALTER TABLE pedidos ADD COLUMN nombre_cliente VARCHAR(100) NULL")
-                conn.commit()
-        except Exception as alter_error:
-            print(f"[CHECKOUT] Error verificando/agregando columnas: {alter_error}")
-            import traceback
-            traceback.print_exc()
-        
-        # Obtener usuario_id si está logueado
-        usuario_id = session.get('user_id') if 'user_id' in session else None
-        
-        # Crear el pedido
-        print(f"[CHECKOUT] Creando pedido en BD...")
-        cur.execute(
-            "INSERT INTO pedidos (usuario_id, estado, mesa, nombre_cliente) VALUES (%s, %s, %s, %s)",
-            (usuario_id, 'pendiente', mesa, nombre_cliente)
-        )
-        pedido_id = cur.lastrowid
-        print(f"[CHECKOUT] ✓ Pedido creado con ID: {pedido_id}")
-        
-        # Hacer commit del pedido antes de agregar items
-        conn.commit()
-        print(f"[CHECKOUT] ✓ Commit del pedido realizado")
-        
-        # Agregar items del carrito
-        items_agregados = 0
-        for pid, entry in cart.items():
-            try:
-                cantidad = int(entry.get('qty', 1))
-                print(f"[CHECKOUT] Procesando item: {pid}, cantidad: {cantidad}")
-                menu_id = None
-                precio = 0.0
-                nombre_producto = 'Producto'
-                
-                # Si es un producto temporal, usar los datos guardados
-                if entry.get('temp') and 'precio' in entry:
-                    precio = float(entry.get('precio', 0))
-                    nombre_producto = entry.get('nombre', 'Producto')
-                    # Para productos temporales, buscar si existe en productos o menu
-                    try:
-                        cur.execute("SELECT id, precio FROM productos WHERE nombre=%s LIMIT 1", (nombre_producto,))
-                        row = cur.fetchone()
-                        if row:
-                            menu_id = row[0]
-                            precio = float(row[1])
-                        else:
-                            cur.execute("SELECT id, Precio FROM menu WHERE Nombre_Menu=%s LIMIT 1", (nombre_producto,))
-                            row = cur.fetchone()
-                            if row:
-                                menu_id = row[0]
-                                precio = float(row[1])
-                    except Exception as e:
-                        print(f"Error buscando producto temporal {nombre_producto}: {e}")
-                else:
-                    # Buscar precio en productos primero
-                    try:
-                        cur.execute("SELECT id, precio, nombre FROM productos WHERE id=%s", (pid,))
-                        row = cur.fetchone()
-                        if row:
-                            precio = float(row[1])
-                            nombre_producto = row[2] if len(row) > 2 else 'Producto'
-                            # Verificar si existe en menu con el mismo ID, si no, usar el ID de productos directamente
-                            cur.execute("SELECT id FROM menu WHERE id=%s", (pid,))
-                            menu_row = cur.fetchone()
-                            if menu_row:
-                                menu_id = menu_row[0]
-                            else:
-                                # Si no existe en menu, usar el ID de productos directamente
-                                # (la foreign key ya no es restrictiva)
-                                menu_id = row[0]
-                                print(f"[CHECKOUT] Producto {nombre_producto} (ID: {pid}) no está en menu, usando ID de productos")
-                        else:
-                            # Si no está en productos, buscar en menu
-                            cur.execute("SELECT id, Precio, Nombre_Menu FROM menu WHERE id=%s", (pid,))
-                            row = cur.fetchone()
-                            if not row:
-                                print(f"[CHECKOUT] Producto con ID {pid} no encontrado en productos ni menu - SKIP")
-                                continue
-                            precio = float(row[1])
-                            menu_id = row[0]
-                            nombre_producto = row[2] if len(row) > 2 else 'Producto'
-                    except Exception as e:
-                        print(f"[CHECKOUT] Error obteniendo precio para producto {pid}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        continue
-                
-                if not menu_id:
-                    print(f"No se pudo encontrar menu_id para producto {pid}")
-                    continue
-                
-                # Obtener notas del item del carrito
-                notas_item = entry.get('notas', '') or ''
-                if notas_item:
-                    notas_item = str(notas_item).strip()
-                
-                # Insertar item del pedido
-                cur.execute(
-                    "INSERT INTO pedido_items (pedido_id, menu_id, cantidad, precio_unitario, notas) VALUES (%s, %s, %s, %s, %s)",
-                    (pedido_id, menu_id, cantidad, precio, notas_item)
-                )
-                items_agregados += 1
-                notas_msg = f" (Notas: {notas_item})" if notas_item else ""
-                print(f"[CHECKOUT] ✓ Item agregado: {nombre_producto} x{cantidad} = ${precio * cantidad}{notas_msg}")
-                if notas_item:
-                    print(f"[CHECKOUT]   → Notas guardadas en BD: '{notas_item}'")
-            except Exception as e:
-                print(f"[CHECKOUT] ✗ Error agregando item {pid} al pedido: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
-        
-        # Hacer commit final de todos los items usando la MISMA conexión
+        # Todo el pedido en una transacción: la cocina nunca ve pedidos sin items
+        items = items_del_carrito(cur, cart)
+        if not items:
+            flash('Ninguno de los productos del carrito está disponible', 'error')
+            return redirect(url_for('cart_view'))
+
+        usuario_id = session.get('user_id')
+        pedido_id = crear_pedido(cur, usuario_id, mesa, nombre_cliente, items)
+
+        # Avisar a los paneles de mozo conectados (mismo commit que el pedido)
+        publicar(cur, 'creado', pedido_id, {
+            'pedido_id': pedido_id,
+            'mesa': mesa,
+            'cliente': nombre_cliente,
+            'estado': 'pendiente',
+            'items': [{k: it[k] for k in ('nombre', 'cantidad', 'precio', 'notas')} for it in items],
+            'total': sum(it['precio'] * it['cantidad'] for it in items),
+        })
         conn.commit()
-        print(f"[CHECKOUT] ✓ Commit final realizado - {items_agregados} items agregados al pedido {pedido_id}")
-        
-        # Verificar que se guardaron items
-        try:
-            cur.execute("SELECT COUNT(*) FROM pedido_items WHERE pedido_id = %s", (pedido_id,))
-            items_count = cur.fetchone()[0]
-            print(f"[CHECKOUT] Verificación: {items_count} items en pedido {pedido_id}")
-        except Exception as verify_error:
-            print(f"[CHECKOUT] Error verificando items: {verify_error}")
-        
-        cur.close()
-        conn.close()
-        
-        print(f"\n{'='*60}")
-        print(f"[CHECKOUT] Pedido creado exitosamente:")
-        print(f"  - Pedido ID: {pedido_id}")
-        print(f"  - Cliente: {nombre_cliente}")
-        print(f"  - Mesa: {mesa}")
-        print(f"  - Estado: pendiente")
-        print(f"{'='*60}\n")
-        
-        # Vaciar carrito y datos de sesión
-        session['cart'] = {}
-        session.pop('mesa_carrito', None)
-        session.pop('nombre_cliente', None)
-        
-        print(f"[CHECKOUT] ===== PEDIDO COMPLETADO EXITOSAMENTE =====")
-        print(f"[CHECKOUT] Pedido #{pedido_id} - Cliente: {nombre_cliente} - Mesa: {mesa} - Items: {items_agregados}")
-        flash(f'Pedido enviado correctamente. Pedido #{pedido_id} - Cliente: {nombre_cliente} - Mesa: {mesa}', 'success')
-        return redirect(url_for('index'))
-    except Exception as e:
-        print(f"[CHECKOUT] ✗ ERROR en checkout: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        log.exception("Error en checkout")
         try:
             if conn:
                 conn.rollback()
-        except:
+        except Exception:
             pass
         flash('Error al procesar el pedido', 'error')
-        if cur:
-            try:
-                cur.close()
-            except:
-                pass
-        if conn:
-            try:
-                conn.close()
-            except:
-                pass
         return redirect(url_for('cart_view'))
+    finally:
+        if cur:
+            cur.close()
+
+    log.info("Pedido %s creado", pedido_id, extra={'cliente': nombre_cliente, 'mesa': mesa, 'items': len(items)})
+    metricas.incrementar('checkouts_total')
+    metricas.incrementar('checkout_items_total', sum(it['cantidad'] for it in items))
+
+    # Vaciar carrito y datos de sesión
+    session['cart'] = {}
+    session.pop('mesa_carrito', None)
+    session.pop('nombre_cliente', None)
+
+    flash(f'Pedido enviado correctamente. Pedido #{pedido_id} - Cliente: {nombre_cliente} - Mesa: {mesa}', 'success')
+    return redirect(url_for('index'))
+
+def _producto_json(producto):
+    return {
+        'id': producto['id'],
+        'nombre': producto['nombre'],
+        'precio': producto['precio'],
+        'categoria': producto['categoria'],
+        'imagen': producto['imagen_url'],
+        'descripcion': producto['descripcion'] or 'Sin descripción disponible'
+    }
+
+def _condicional(etag, generar):
+    """Respuesta con ETag fuerte, o 304 si el cliente ya tiene esa versión.
+
+    Acepta también los ETag que agrega Compresion a las versiones comprimidas.
+    """
+    coincidencia = next((e for e in (etag, f"{etag}-gzip", f"{etag}-br")
+                         if request.if_none_match.contains(e)), None)
+    if coincidencia:
+        response = Response(status=304)
+        response.set_etag(coincidencia)
+    else:
+        response = generar()
+        response.set_etag(etag)
+    # Guardar, pero revalidar siempre: el 304 no trae cuerpo
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/producto/<int:producto_id>')
 def api_producto(producto_id):
     try:
-        ensure_productos_table_exists()
-        cur = mysql.connection.cursor()
-        cur.execute("""
-            SELECT id, nombre, precio, COALESCE(categoria, ''), COALESCE(imagen, ''), COALESCE(descripcion, '')
-            FROM productos WHERE id = %s
-        """, (producto_id,))
-        row = cur.fetchone()
-        cur.close()
-        
-        if row:
-            imagen_url = row[4]
-            # Si la imagen es una ruta relativa (images/...), convertirla a URL completa
-            if imagen_url and not imagen_url.startswith('http://') and not imagen_url.startswith('https://'):
-                imagen_url = url_for('static', filename=imagen_url)
-            
-            return jsonify({
-                'id': row[0],
-                'nombre': row[1],
-                'precio': float(row[2]),
-                'categoria': row[3],
-                'imagen': imagen_url,
-                'descripcion': row[5] or 'Sin descripción disponible'
-            })
+        producto = catalogo.producto(producto_id)
+        if producto:
+            return jsonify(_producto_json(producto))
         else:
             return jsonify({'error': 'Producto no encontrado'}), 404
     except Exception as e:
-        print(f"Error al obtener producto: {e}")
+        log.exception("Error al obtener producto")
         return jsonify({'error': 'Error al obtener producto'}), 500
 
-# ===== Vista de pedidos para administrador =====
-@app.route('/admin/pedidos-nuevo')
-@admin_required
-def admin_pedidos_nuevo():
-    ensure_client_orders_tables()
+@app.route('/api/productos')
+@presupuesto_consultas(3)  # Solo al recargar el catálogo
+def api_productos():
+    """Varios productos en una respuesta: /api/productos?ids=1,2,3 (hasta 100)"""
+    try:
+        ids = sorted({int(i) for i in request.args.get('ids', '').split(',') if i.strip()})
+    except ValueError:
+        return jsonify({'error': 'ids debe ser una lista de números separados por coma'}), 400
+    if len(ids) > 100:
+        return jsonify({'error': 'Se pueden pedir hasta 100 productos por vez'}), 400
+    snap = catalogo.snapshot()
+    etag, _ = snap.exportar()
+    clave = hashlib.sha256(','.join(map(str, ids)).encode()).hexdigest()[:12]
+
+    def generar():
+        productos = [_producto_json(snap.productos[i]) for i in ids if i in snap.productos]
+        return jsonify({'version': snap.version, 'productos': productos,
+                        'faltantes': [i for i in ids if i not in snap.productos]})
+
+    return _condicional(f"{etag}-{clave}", generar)
+
+@app.route('/api/menu')
+@presupuesto_consultas(3)  # Solo al recargar el catálogo
+def api_menu():
+    """Carta completa en un JSON compacto: {"version", "campos", "productos": [[...], ...]}"""
+    etag, datos = catalogo.snapshot().exportar()
+    return _condicional(etag, lambda: Response(datos, mimetype='application/json'))
+
+@app.route('/api/menu/cambios')
+@presupuesto_consultas(3)
+def api_menu_cambios():
+    """Productos creados, editados o borrados después de ?desde=<version> de /api/menu.
+
+    Lee el registro catalogo_cambios directamente (no el catálogo del proceso,
+    que puede estar atrasado hasta CATALOGO_TTL). Si el registro ya no cubre
+    esa versión, o cambiaron demasiados productos, responde resync=true y el
+    cliente vuelve a pedir /api/menu.
+    """
+    desde = request.args.get('desde', type=int)
+    if desde is None or desde < 0:
+        return jsonify({'error': 'desde debe ser la versión recibida en /api/menu'}), 400
     try:
-        cur = mysql.connection.cursor()
+        cur = db.connection.cursor()
         try:
-            cur.execute("DESCRIBE pedidos")
-            cols = [row[0].lower() for row in cur.fetchall()]
-            if 'mesa' not in cols:
-                cur.execute("ALTER TABLE pedidos ADD COLUMN mesa VARCHAR(50) NULL")
-                mysql.connection.commit()
-        except Exception:
-            pass
+            version, completo, cambios = repositorio.cambios_desde(cur, desde)
+            # Los cambios de categorías no afectan a /api/menu: solo avanzan la versión.
+            # ('catalogo', 0) lo anota una migración que cambió los ids (0008).
+            ultimos = {entidad_id: op for (entidad, entidad_id), op in cambios.items() if entidad == 'producto'}
+            if not completo or ('catalogo', 0) in cambios or len(ultimos) > app.config['CATALOGO_CAMBIOS_MAXIMO']:
+                return jsonify({'version': version, 'resync': True})
+            filas = repositorio.productos_por_id(cur, sorted(i for i, op in ultimos.items() if op == 'upsert'))
+        finally:
+            cur.close()
+    except Exception:
+        log.exception("Error leyendo cambios del catálogo")
+        return jsonify({'error': 'Error leyendo cambios del catálogo'}), 500
+    productos = catalogo.exportar_filas(filas)
+    # Un producto borrado después de registrar su upsert tampoco está en la tabla
+    presentes = {fila[0] for fila in productos}
+    return jsonify({
+        'version': version,
+        'resync': False,
+        'campos': CAMPOS_EXPORTADOS,
+        'productos': productos,
+        'borrados': sorted(i for i in ultimos if i not in presentes),
+    })
 
-        cur.execute(
-            """
-            SELECT p.id, COALESCE(p.mesa, '') AS mesa, COALESCE(u.nombre, '') AS cliente,
-                   p.estado, p.creado_en
-            FROM pedidos p
-            LEFT JOIN usuarios u ON p.usuario_id = u.id
-            ORDER BY p.id DESC
-            """
-        )
-        base_rows = cur.fetchall()
+@app.route('/api/buscar')
+@presupuesto_consultas(3)  # Solo al recargar el catálogo
+def api_buscar():
+    """Productos que coinciden con ?q= (sin distinguir tildes ni mayúsculas), mejores primero"""
+    q = request.args.get('q', '').strip()
+    limite = max(1, min(request.args.get('limite', 20, type=int), 50))
+    try:
+        snap = catalogo.snapshot()
+        resultados = []
+        for producto_id, puntaje in indice_busqueda.buscar(q, limite):
+            producto = snap.productos.get(producto_id)
+            if producto:
+                resultados.append({
+                    'id': producto['id'],
+                    'nombre': producto['nombre'],
+                    'precio': producto['precio'],
+                    'categoria': producto['categoria'],
+                    'imagen': producto['imagen_url'],
+                    'puntaje': round(puntaje, 2),
+                })
+    except Exception:
+        log.exception("Error en la búsqueda")
+        return jsonify({'error': 'Error en la búsqueda'}), 500
+    return jsonify({'q': q, 'resultados': resultados})
 
-        pedidos = []
-        for row in base_rows:
-            pedido_id = row[0]
-            try:
-                cur.execute(
-                    """
-                    SELECT pi.cantidad, pi.precio_unitario, 
-                           COALESCE(pr.nombre, m.Nombre_Menu, CONCAT('Producto ID:', pi.menu_id)) AS nombre_producto,
-                           COALESCE(pi.notas, '') AS notas
-                    FROM pedido_items pi
-                    LEFT JOIN productos pr ON pi.menu_id = pr.id
-                    LEFT JOIN menu m ON pi.menu_id = m.id
-                    WHERE pi.pedido_id = %s
-                    ORDER BY pi.id
-                    """,
-                    (pedido_id,)
-                )
-                items = cur.fetchall()
-                total = sum(float(it[0]) * float(it[1]) for it in items)
-            except Exception:
-                items = []
-                total = 0.0
+@app.route('/api/pedidos/<int:pedido_id>/estado', methods=['PATCH'])
+def api_pedido_estado(pedido_id: int):
+    """Cambia el estado de un pedido. Body JSON: {"estado": nuevo, "anterior": esperado}"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Debes iniciar sesión'}), 401
+    es_mozo = session.get('rol') == 'mozo' and session.get('mozo_id')
+    es_admin = session.get('is_admin', False) or session.get('user_id') == 1
+    if not (es_mozo or es_admin):
+        return jsonify({'error': 'No tienes permisos para cambiar pedidos'}), 403
 
-            pedidos.append((row[0], row[1], row[2], row[3], row[4], items, total))
+    data = request.get_json(silent=True) or {}
+    nuevo = data.get('estado')
+    anterior = data.get('anterior')
+    if nuevo not in ESTADOS or anterior not in ESTADOS:
+        return jsonify({'error': 'Se requieren "estado" y "anterior" válidos'}), 400
+    if not transicion_valida(anterior, nuevo):
+        return jsonify({'error': f'No se puede pasar de "{anterior}" a "{nuevo}"'}), 400
+
+    conn = db.connection
+    cur = conn.cursor()
+    try:
+        actual = cambiar_estado(cur, pedido_id, anterior, nuevo)
+        if actual == '':
+            return jsonify({'error': 'Pedido no encontrado'}), 404
+        if actual is not None:
+            # Otro mozo lo cambió antes: devolver el estado vigente para refrescar la vista
+            return jsonify({'error': 'El pedido cambió de estado', 'pedido_id': pedido_id, 'estado': actual}), 409
+        publicar(cur, 'estado', pedido_id, {'pedido_id': pedido_id, 'estado': nuevo, 'anterior': anterior})
+        conn.commit()
+    except Exception as e:
+        log.exception("Error actualizando pedido %s", pedido_id)
+        conn.rollback()
+        return jsonify({'error': 'Error al actualizar estado del pedido'}), 500
+    finally:
+        cur.close()
+    return jsonify({'pedido_id': pedido_id, 'estado': nuevo, 'anterior': anterior})
+
+# ===== Vista de pedidos para administrador =====
+@app.route('/admin/pedidos-nuevo')
+@admin_required
+@presupuesto_consultas(2)
+def admin_pedidos_nuevo():
+    filtros = _filtros_pedidos()
+    siguiente = None
+    try:
+        cur = db.connection.cursor()
+        base_rows, siguiente = listar_pedidos(cur, cliente_sql=CLIENTE_ADMIN, **filtros)
+        pedidos = armar_tablero(cur, base_rows)
 
         cur.close()
     except Exception as e:
-        print(f"Error listando pedidos nuevo: {e}")
+        log.exception("Error listando pedidos nuevo")
         pedidos = []
-    return render_template('admin_pedidos_nuevo.html', pedidos=pedidos)
+    return render_template('admin_pedidos_nuevo.html', pedidos=pedidos,
+                           filtros=filtros, siguiente=siguiente, estados=ESTADOS, transiciones=TRANSICIONES)
 
 @app.route('/admin/pedidos/<int:pedido_id>/estado', methods=['POST'])
 @admin_required
 def admin_pedido_cambiar_estado(pedido_id: int):
-    nuevo_estado = request.form.get('estado', 'pendiente')
-    try:
-        cur = mysql.connection.cursor()
-        cur.execute("UPDATE pedidos SET estado=%s WHERE id=%s", (nuevo_estado, pedido_id))
-        mysql.connection.commit()
-        cur.close()
-        flash('Estado del pedido actualizado', 'success')
-    except Exception as e:
-        print(f"Error actualizando estado de pedido: {e}")
-        flash('Error al actualizar estado del pedido', 'error')
+    mensaje, categoria = _cambiar_estado_formulario(pedido_id)
+    flash(mensaje, categoria)
     return redirect(url_for('admin_pedidos_nuevo'))
 
-# Eliminar pedido (solo si ya fue entregado)
+# Eliminar pedido (solo si ya fue entregado o cancelado)
 @app.route('/admin/pedidos/<int:pedido_id>/eliminar', methods=['POST'])
 @admin_required
 def admin_pedido_eliminar(pedido_id: int):
     try:
-        cur = mysql.connection.cursor()
+        cur = db.connection.cursor()
         # Verificar estado del pedido
-        cur.execute("SELECT estado FROM pedidos WHERE id=%s", (pedido_id,))
-        row = cur.fetchone()
+        row = datos_pedido(cur, pedido_id)
         if not row:
             cur.close()
             flash('Pedido no encontrado', 'error')
             return redirect(url_for('admin_pedidos_nuevo'))
         estado = (row[0] or '').lower()
-        if estado != 'entregado':
+        if estado not in ('entregado', 'cancelado'):
             cur.close()
-            flash('Solo se pueden eliminar pedidos entregados', 'error')
+            flash('Solo se pueden eliminar pedidos entregados o cancelados', 'error')
             return redirect(url_for('admin_pedidos_nuevo'))
 
-        # Borrar primero items, luego pedido
-        cur.execute("DELETE FROM pedido_items WHERE pedido_id=%s", (pedido_id,))
-        cur.execute("DELETE FROM pedidos WHERE id=%s", (pedido_id,))
-        mysql.connection.commit()
+        eliminar_pedido(cur, pedido_id)
+        publicar(cur, 'eliminado', pedido_id, {'pedido_id': pedido_id})
+        db.connection.commit()
         cur.close()
         flash('Pedido eliminado', 'success')
     except Exception as e:
-        print(f"Error eliminando pedido {pedido_id}: {e}")
+        log.exception("Error eliminando pedido %s", pedido_id)
         flash('Error al eliminar pedido', 'error')
     return redirect(url_for('admin_pedidos_nuevo'))
 
@@ -1962,13 +1603,13 @@ def admin_mozos_crear():
         flash('El nombre del mozo es obligatorio', 'error')
         return redirect(url_for('admin_dashboard'))
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("INSERT INTO mozos (nombre, email, telefono, activo) VALUES (%s, %s, %s, %s)", (nombre, email, telefono, activo))
-        mysql.connection.commit()
+        cur = db.connection.cursor()
+        repositorio.crear_mozo(cur, nombre, email, telefono, activo)
+        db.connection.commit()
         cur.close()
         flash('Mozo creado', 'success')
     except Exception as e:
-        print(f"Error creando mozo: {e}")
+        log.exception("Error creando mozo")
         flash('Error al crear mozo', 'error')
     return redirect(url_for('admin_dashboard'))
 
@@ -1980,16 +1621,13 @@ def admin_mozos_actualizar(mozo_id: int):
     telefono = request.form.get('telefono')
     activo = 1 if request.form.get('activo') == 'on' else 0
     try:
-        cur = mysql.connection.cursor()
-        cur.execute(
-            "UPDATE mozos SET nombre=%s, email=%s, telefono=%s, activo=%s WHERE id=%s",
-            (nombre, email, telefono, activo, mozo_id)
-        )
-        mysql.connection.commit()
+        cur = db.connection.cursor()
+        repositorio.actualizar_mozo(cur, mozo_id, nombre, email, telefono, activo)
+        db.connection.commit()
         cur.close()
         flash('Mozo actualizado', 'success')
     except Exception as e:
-        print(f"Error actualizando mozo: {e}")
+        log.exception("Error actualizando mozo")
         flash('Error al actualizar mozo', 'error')
     return redirect(url_for('admin_dashboard'))
 
@@ -1997,13 +1635,13 @@ def admin_mozos_actualizar(mozo_id: int):
 @admin_required
 def admin_mozos_eliminar(mozo_id: int):
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("DELETE FROM mozos WHERE id=%s", (mozo_id,))
-        mysql.connection.commit()
+        cur = db.connection.cursor()
+        repositorio.eliminar_mozo(cur, mozo_id)
+        db.connection.commit()
         cur.close()
         flash('Mozo eliminado', 'success')
     except Exception as e:
-        print(f"Error eliminando mozo: {e}")
+        log.exception("Error eliminando mozo")
         flash('Error al eliminar mozo', 'error')
     return redirect(url_for('admin_dashboard'))
 
@@ -2013,17 +1651,76 @@ def perfil():
         return redirect(url_for('login'))
     
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT * FROM usuarios WHERE id = %s", (session['user_id'],))
-        usuario = cur.fetchone()
+        cur = db.connection.cursor()
+        usuario = repositorio.usuario_por_id(cur, session['user_id'])
         cur.close()
         
         return render_template('perfil.html', usuario=usuario)
     except Exception as e:
-        print(f"Error al cargar perfil: {e}")
+        log.exception("Error al cargar perfil")
         flash('Error al cargar el perfil', 'error')
         return redirect(url_for('index'))
 
+# ===== Migraciones de esquema =====
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Aplica las migraciones de esquema pendientes (ejecutar en cada deploy)"""
+    conn = db.connection
+    aplicadas = migrations.upgrade(conn)
+    if aplicadas:
+        print(f"[db-upgrade] {len(aplicadas)} migraciones aplicadas, esquema en versión {aplicadas[-1]}")
+    else:
+        print("[db-upgrade] El esquema ya está actualizado")
+
+@app.cli.command('db-explain')
+@click.option('--verbose', '-v', is_flag=True, help='Mostrar el plan de cada consulta')
+def db_explain_command(verbose):
+    """Revisa con EXPLAIN que ninguna consulta de los requests recorra una tabla completa"""
+    resultados = planes.revisar(db.connection, db.dialecto)
+    fallas = 0
+    for nombre, sql, plan, tablas in resultados:
+        if tablas:
+            fallas += 1
+            print(f"[db-explain] FALLA {nombre}: recorre {', '.join(tablas)}\n    {sql}")
+        elif verbose:
+            print(f"[db-explain] ok    {nombre}\n    {sql}")
+        if verbose or tablas:
+            for fila in plan:
+                print(f"      {fila}")
+    print(f"[db-explain] {len(resultados)} consultas revisadas, {fallas} con recorrido completo")
+    if fallas:
+        sys.exit(1)
+
+@app.cli.command('imagenes-variantes')
+def imagenes_variantes_command():
+    """Genera las variantes responsive de las imágenes ya subidas"""
+    if not variantes.disponible:
+        print("[imagenes] Pillow no está instalado: pip install Pillow")
+        return
+    carpeta = app.config['UPLOAD_FOLDER']
+    for nombre in sorted(os.listdir(carpeta)):
+        imagen = f"images/{nombre}"
+        if os.path.isfile(os.path.join(carpeta, nombre)) and variantes.procesable(imagen):
+            print(f"[imagenes] {imagen}: {'ok' if variantes.generar(imagen) else 'error'}")
+
+@app.cli.command('imagenes-gc')
+def imagenes_gc_command():
+    """Borra las imágenes subidas que ya no usa ningún producto"""
+    carpeta = app.config['UPLOAD_FOLDER']
+    candidatas = [f"images/{nombre}" for nombre in os.listdir(carpeta)]
+    cur = db.connection.cursor()
+    try:
+        borradas = recolectar(cur, app.static_folder, candidatas, variantes)
+    finally:
+        cur.close()
+    print(f"[imagenes] {len(borradas)} imágenes sin referencias eliminadas")
+
+@app.cli.command('estaticos')
+def estaticos_command():
+    """Calcula las huellas y comprime los archivos estáticos (paso de build)"""
+    for filename, version in estaticos.construir():
+        print(f"[estaticos] {filename} v={version}")
+
 if __name__ == '__main__':
     debug = getattr(Config, 'DEBUG', True)
     host = getattr(Config, 'HOST', '0.0.0.0')
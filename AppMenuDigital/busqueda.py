@@ -0,0 +1,147 @@
+import bisect
+import re
+import threading
+import unicodedata
+
+# Búsqueda de productos con un índice invertido en memoria: término normalizado
+# -> {id de producto: peso}. Se mantiene sincronizado con el catálogo aplicando
+# solo los productos que cambiaron en cada recarga.
+
+# Peso de cada campo en el ranking
+PESOS = {'nombre': 3.0, 'categoria': 2.0, 'descripcion': 1.0}
+# Una coincidencia por prefijo (búsqueda mientras se escribe) vale menos que una palabra completa
+FACTOR_PREFIJO = 0.6
+
+STOPWORDS = frozenset({'a', 'al', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'o', 'un', 'una', 'y'})
+
+_PALABRA = re.compile(r'[a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes ni diéresis: 'Ñoquis' -> 'noquis', 'Pingüino' -> 'pinguino'"""
+    descompuesto = unicodedata.normalize('NFKD', (texto or '').casefold())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    """Palabras normalizadas, sin stopwords ('comida_sin_tac' -> ['comida', 'sin', 'tac'])"""
+    return [t for t in _PALABRA.findall(normalizar(texto)) if t not in STOPWORDS]
+
+
+def _campos(producto):
+    return (producto['nombre'], producto.get('categoria', ''), producto.get('descripcion', ''))
+
+
+class IndiceBusqueda:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        # Términos ordenados, para resolver prefijos con bisect
+        self._terminos = []
+        # id -> {término: peso}, para poder quitar un producto del índice
+        self._docs = {}
+        # id -> (nombre, categoria, descripcion) indexados
+        self._campos_indexados = {}
+        self._nombres = {}
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _quitar(self, doc_id):
+        for termino in self._docs.pop(doc_id, {}):
+            docs = self._postings[termino]
+            del docs[doc_id]
+            if not docs:
+                del self._postings[termino]
+                del self._terminos[bisect.bisect_left(self._terminos, termino)]
+        self._campos_indexados.pop(doc_id, None)
+        self._nombres.pop(doc_id, None)
+
+    def _agregar(self, doc_id, nombre, categoria, descripcion):
+        pesos = {}
+        for campo, texto in (('nombre', nombre), ('categoria', categoria), ('descripcion', descripcion)):
+            for termino in tokenizar(texto):
+                # Cada término cuenta una vez por producto, con el peso de su mejor campo
+                pesos[termino] = max(pesos.get(termino, 0.0), PESOS[campo])
+        for termino, peso in pesos.items():
+            docs = self._postings.get(termino)
+            if docs is None:
+                docs = self._postings[termino] = {}
+                bisect.insort(self._terminos, termino)
+            docs[doc_id] = peso
+        self._docs[doc_id] = pesos
+        self._campos_indexados[doc_id] = (nombre, categoria, descripcion)
+        self._nombres[doc_id] = normalizar(nombre)
+
+    def actualizar(self, doc_id, nombre, categoria='', descripcion=''):
+        """Agrega o reemplaza un producto"""
+        with self._lock:
+            self._quitar(doc_id)
+            self._agregar(doc_id, nombre, categoria, descripcion)
+
+    def quitar(self, doc_id):
+        with self._lock:
+            self._quitar(doc_id)
+
+    def sincronizar(self, productos):
+        """Deja el índice igual a `productos` ({id: producto del catálogo}).
+
+        Solo reindexa los productos nuevos o con nombre, categoría o
+        descripción distintos, y quita los que ya no están.
+        Devuelve (agregados_o_cambiados, quitados).
+        """
+        with self._lock:
+            quitados = [doc_id for doc_id in self._docs if doc_id not in productos]
+            for doc_id in quitados:
+                self._quitar(doc_id)
+            cambiados = 0
+            for doc_id, producto in productos.items():
+                campos = _campos(producto)
+                if self._campos_indexados.get(doc_id) != campos:
+                    self._quitar(doc_id)
+                    self._agregar(doc_id, *campos)
+                    cambiados += 1
+        return cambiados, len(quitados)
+
+    def _coincidencias(self, token, ultimo):
+        """{id: puntaje} para un token de la consulta"""
+        puntajes = {}
+        for doc_id, peso in self._postings.get(token, {}).items():
+            puntajes[doc_id] = peso
+        # El último token puede estar a medio escribir: también vale como prefijo
+        if ultimo:
+            i = bisect.bisect_left(self._terminos, token)
+            while i < len(self._terminos) and self._terminos[i].startswith(token):
+                termino = self._terminos[i]
+                i += 1
+                if termino == token:
+                    continue
+                for doc_id, peso in self._postings[termino].items():
+                    puntaje = peso * FACTOR_PREFIJO
+                    if puntaje > puntajes.get(doc_id, 0.0):
+                        puntajes[doc_id] = puntaje
+        return puntajes
+
+    def buscar(self, consulta, limite=20):
+        """[(id, puntaje)] de los productos que contienen todas las palabras, mejores primero"""
+        tokens = tokenizar(consulta)
+        if not tokens:
+            return []
+        with self._lock:
+            resultado = None
+            for i, token in enumerate(tokens):
+                puntajes = self._coincidencias(token, ultimo=i == len(tokens) - 1)
+                if resultado is None:
+                    resultado = puntajes
+                else:
+                    resultado = {d: resultado[d] + p for d, p in puntajes.items() if d in resultado}
+                if not resultado:
+                    return []
+            frase = ' '.join(tokens)
+            nombres = {doc_id: self._nombres[doc_id] for doc_id in resultado}
+        ordenados = sorted(
+            resultado.items(),
+            # Desempate: el nombre empieza con la consulta, después el nombre más corto
+            key=lambda item: (-item[1], not nombres[item[0]].startswith(frase), len(nombres[item[0]]), item[0])
+        )
+        return ordenados[:limite]
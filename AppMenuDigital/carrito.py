@@ -0,0 +1,51 @@
+def cantidad_total(cart):
+    """Unidades en el carrito (lo que muestra el ícono 🛒)"""
+    total_qty = 0
+    for entry in cart.values():
+        try:
+            total_qty += int(entry.get('qty', 1))
+        except Exception:
+            total_qty += 1
+    return total_qty
+
+
+def cotizar(cart, buscar, buscar_por_nombre):
+    """Precios de todo el carrito de una vez.
+
+    buscar(clave) y buscar_por_nombre(nombre) devuelven un dict con 'id', 'nombre'
+    y 'precio' (del catálogo en memoria o de una consulta IN) o None.
+    Devuelve (lineas, total). Cada línea lleva la clave del carrito en 'id' y el
+    producto real en 'menu_id', que es None si el producto ya no existe.
+    """
+    lineas = []
+    total = 0.0
+    for clave, entry in cart.items():
+        try:
+            cantidad = int(entry.get('qty', 1))
+        except (TypeError, ValueError):
+            continue
+        if entry.get('temp', False):
+            # Producto temporal: se cobra como el producto del mismo nombre
+            nombre = entry.get('nombre', 'Producto')
+            producto = buscar_por_nombre(nombre)
+            if producto:
+                menu_id, precio = producto['id'], producto['precio']
+            else:
+                menu_id, precio = None, float(entry.get('precio', 0) or 0)
+        else:
+            producto = buscar(clave)
+            if not producto:
+                continue
+            menu_id, nombre, precio = producto['id'], producto['nombre'], producto['precio']
+        subtotal = cantidad * precio
+        total += subtotal
+        lineas.append({
+            'id': clave,
+            'menu_id': menu_id,
+            'nombre': nombre,
+            'precio': precio,
+            'cantidad': cantidad,
+            'subtotal': subtotal,
+            'notas': str(entry.get('notas', '') or '').strip(),
+        })
+    return lineas, total
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Columnas de cada fila de /api/menu
+CAMPOS_EXPORTADOS = ['id', 'nombre', 'precio', 'categoria', 'imagen', 'descripcion']
+
+CATEGORIAS = ['desayunos', 'almuerzos', 'cenas', 'meriendas', 'postres', 'bebidas', 'comida_sin_tac', 'promociones', 'veggie']
+
+
+def _normalizar(row, resolver_imagen):
+    imagen = row[4] or ''
+    if imagen and not imagen.startswith('http://') and not imagen.startswith('https://'):
+        imagen_url = resolver_imagen(imagen)
+    else:
+        imagen_url = imagen
+    return {
+        'id': row[0],
+        'nombre': row[1] or 'Sin nombre',
+        'precio': float(row[2]) if row[2] else 0.0,
+        'categoria': (row[3] or '').lower().strip(),
+        'imagen': imagen,
+        'imagen_url': imagen_url,
+        'descripcion': row[5] or '',
+    }
+
+
+def _fila_exportada(p):
+    return [p['id'], p['nombre'], p['precio'], p['categoria'], p['imagen_url'], p['descripcion']]
+
+
+class _Snapshot:
+    def __init__(self, filas_productos, resolver_imagen, version=0):
+        # Versión del catálogo (catalogo_cambios) leída antes que los productos
+        self.version = version
+        self.productos = {}
+        self.productos_por_nombre = {}
+        self.productos_por_categoria = {c: [] for c in CATEGORIAS}
+        for row in filas_productos:
+            p = _normalizar(row, resolver_imagen)
+            self.productos[p['id']] = p
+            self.productos_por_nombre.setdefault(p['nombre'], p)
+            if p['categoria'] in self.productos_por_categoria:
+                # Misma forma de tupla que consume Index.html
+                self.productos_por_categoria[p['categoria']].append(
+                    (p['id'], p['nombre'], p['precio'], p['categoria'], p['imagen'], p['descripcion'])
+                )
+        self.creado_en = time.monotonic()
+        self._exportado = None
+
+    def exportar(self):
+        """(etag, json) de la carta completa para /api/menu, calculado una vez por snapshot.
+
+        El ETag es la versión más un hash del contenido: es el mismo en todos
+        los procesos que tengan los mismos productos. La versión va también en
+        el JSON, para pedir después /api/menu/cambios?desde=<version>.
+        """
+        if self._exportado is None:
+            filas = [_fila_exportada(p) for p in sorted(self.productos.values(), key=lambda p: p['id'])]
+            contenido = json.dumps(filas, separators=(',', ':'), ensure_ascii=False)
+            huella = hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:16]
+            datos = (
+                f'{{"version":{self.version},"campos":{json.dumps(CAMPOS_EXPORTADOS, separators=(",", ":"))},'
+                f'"productos":{contenido}}}'
+            )
+            self._exportado = (f'{self.version}-{huella}', datos.encode('utf-8'))
+        return self._exportado
+
+
+class Catalogo:
+    """Catálogo de productos en memoria del proceso, reconstruido al invalidarse o al vencer el TTL"""
+
+    def __init__(self, cargar, resolver_imagen=lambda imagen: imagen, ttl=300):
+        # cargar() devuelve (filas_productos, version) con columnas
+        # id, nombre, precio, categoria, imagen, descripcion
+        self._cargar = cargar
+        self._resolver_imagen = resolver_imagen
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._snapshot = None
+        # Sube con cada invalidate(): una recarga que empezó antes no se publica
+        self._generacion = 0
+        self._generacion_lock = threading.Lock()
+        # Funciones llamadas con cada snapshot nuevo (p. ej. el índice de búsqueda)
+        self._suscriptores = []
+
+    def suscribir(self, funcion):
+        self._suscriptores.append(funcion)
+
+    def _vigente(self, snap):
+        return snap is not None and (not self.ttl or time.monotonic() - snap.creado_en < self.ttl)
+
+    def snapshot(self):
+        snap = self._snapshot
+        if self._vigente(snap):
+            return snap
+        with self._lock:
+            while True:
+                # Otro hilo pudo reconstruirlo mientras esperábamos el lock
+                snap = self._snapshot
+                if self._vigente(snap):
+                    return snap
+                generacion = self._generacion
+                filas_productos, version = self._cargar()
+                snap = _Snapshot(filas_productos, self._resolver_imagen, version)
+                for funcion in self._suscriptores:
+                    try:
+                        funcion(snap)
+                    except Exception:
+                        log.exception("Error actualizando un suscriptor del catálogo")
+                with self._generacion_lock:
+                    # Si se invalidó durante la carga, lo leído puede ser anterior
+                    # al cambio: se vuelve a cargar
+                    if generacion == self._generacion:
+                        self._snapshot = snap
+                        return snap
+
+    def invalidate(self):
+        with self._generacion_lock:
+            self._generacion += 1
+            self._snapshot = None
+
+    def exportar_filas(self, filas):
+        """Filas de `productos` leídas de la base en el formato de /api/menu"""
+        return [_fila_exportada(_normalizar(row, self._resolver_imagen)) for row in filas]
+
+    def productos_por_categoria(self):
+        return self.snapshot().productos_por_categoria
+
+    def listado(self):
+        """Todos los productos como tuplas (id, nombre, precio, categoria, imagen, descripcion), los últimos primero"""
+        productos = sorted(self.snapshot().productos.values(), key=lambda p: p['id'], reverse=True)
+        return [(p['id'], p['nombre'], p['precio'], p['categoria'], p['imagen'], p['descripcion']) for p in productos]
+
+    def producto(self, producto_id):
+        """Producto por id, o None"""
+        try:
+            return self.snapshot().productos.get(int(producto_id))
+        except (TypeError, ValueError):
+            return None
+
+    def buscar_por_nombre(self, nombre):
+        return self.snapshot().productos_por_nombre.get(nombre)
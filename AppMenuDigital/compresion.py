@@ -0,0 +1,112 @@
+import gzip
+import re
+import threading
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él se comprime solo con gzip
+    brotli = None
+
+# Compresión y minificado de las respuestas generadas (HTML y JSON).
+# Los archivos de static/ no pasan por acá: ya se sirven precomprimidos.
+
+TIPOS = {'text/html', 'application/json'}
+# Bloques donde los espacios importan y no se tocan
+_CRUDOS_RE = re.compile(r'(<(pre|textarea)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+_INDENTACION_RE = re.compile(r'\n[ \t\r\n]+')
+_FINALES_RE = re.compile(r'[ \t]+\n')
+
+
+def minificar_html(html):
+    """Quita indentación, espacios al final de línea y líneas vacías.
+
+    Conserva los saltos de línea (así los // del JavaScript inline siguen
+    siendo comentarios de una línea) y el contenido de <pre> y <textarea>.
+    """
+    partes = _CRUDOS_RE.split(html)
+    salida = []
+    # split con dos grupos devuelve [texto, bloque, nombre_tag, texto, ...]
+    for i in range(0, len(partes), 3):
+        texto = _FINALES_RE.sub('\n', partes[i])
+        salida.append(_INDENTACION_RE.sub('\n', texto))
+        if i + 1 < len(partes):
+            salida.append(partes[i + 1])
+    return ''.join(salida).strip() + '\n'
+
+
+class Compresion:
+    def __init__(self, app=None, minimo=1024, minificar=True, nivel=6):
+        self.minimo = minimo
+        self.minificar = minificar
+        self.nivel = nivel
+        self._lock = threading.Lock()
+        # endpoint -> [respuestas, bytes sin comprimir, bytes enviados]
+        self._contadores = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.minificar:
+            # Sin las líneas en blanco que dejan {% if %} / {% for %}
+            app.jinja_env.trim_blocks = True
+            app.jinja_env.lstrip_blocks = True
+        app.after_request(self.procesar)
+
+    def _codificacion(self):
+        if brotli is not None and request.accept_encodings['br']:
+            return 'br'
+        if request.accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def _contar(self, original, enviado):
+        endpoint = request.endpoint or 'otros'
+        with self._lock:
+            contador = self._contadores.setdefault(endpoint, [0, 0, 0])
+            contador[0] += 1
+            contador[1] += original
+            contador[2] += enviado
+
+    def procesar(self, response):
+        # Streams (SSE), archivos y respuestas ya codificadas pasan de largo
+        if (response.is_streamed or response.direct_passthrough
+                or response.status_code != 200
+                or response.mimetype not in TIPOS
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        datos = response.get_data()
+        original = len(datos)
+        if self.minificar and response.mimetype == 'text/html':
+            datos = minificar_html(datos.decode('utf-8')).encode('utf-8')
+
+        response.vary.add('Accept-Encoding')
+        codificacion = self._codificacion() if len(datos) >= self.minimo else None
+        if codificacion == 'br':
+            datos = brotli.compress(datos, quality=5)
+        elif codificacion == 'gzip':
+            datos = gzip.compress(datos, compresslevel=self.nivel)
+        if codificacion:
+            response.headers['Content-Encoding'] = codificacion
+            # Un ETag fuerte identifica los bytes: la versión comprimida lleva otro
+            etag, debil = response.get_etag()
+            if etag and not debil:
+                response.set_etag(f"{etag}-{codificacion}")
+        response.set_data(datos)
+        self._contar(original, len(datos))
+        return response
+
+    def estadisticas(self):
+        """Bytes sin comprimir y enviados por endpoint en este proceso"""
+        with self._lock:
+            return {
+                endpoint: {
+                    'respuestas': respuestas,
+                    'bytes_originales': originales,
+                    'bytes_enviados': enviados,
+                    'ahorro': round(1 - enviados / originales, 3) if originales else 0,
+                }
+                for endpoint, (respuestas, originales, enviados) in sorted(self._contadores.items())
+            }
@@ -5,12 +5,77 @@ class Config:
     # Configuración de la aplicación
     SECRET_KEY = secrets.token_hex(32)  # Genera una clave secreta de 64 caracteres hexadecimales
     
+    # Motor de base de datos: 'mysql' (servidor, con pool de conexiones) o 'sqlite'
+    # (un archivo local en modo WAL, sin servidor: tests, benchmarks y tablets sueltas)
+    DB_DRIVER = os.environ.get('DB_DRIVER', 'mysql')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH')  # Por defecto instance/menudigital.sqlite3
+    SQLITE_TIMEOUT = 10  # Segundos de espera si otra conexión está escribiendo
+
     # Configuración de MySQL para XAMPP (por defecto puerto 3306 y password vacía)
     MYSQL_HOST = 'localhost'
     MYSQL_PORT = 3307
     MYSQL_USER = 'root'
     MYSQL_PASSWORD = 'admin123'  # Ajusta aquí si tu password es diferente
-    MYSQL_DB = 'menudigital'  # Nombre de tu base de datos existente
+    MYSQL_DB = os.environ.get('MYSQL_DB', 'menudigital')  # Nombre de tu base de datos existente
+
+    # Pool de conexiones (una conexión por request, devuelta al terminar; también con SQLite)
+    MYSQL_POOL_SIZE = 10  # Máximo de conexiones abiertas por proceso
+    MYSQL_POOL_TIMEOUT = 10  # Segundos de espera por una conexión libre
+    MYSQL_POOL_MAX_IDLE = 300  # Cerrar conexiones ociosas después de N segundos
+    MYSQL_POOL_MAX_LIFETIME = 3600  # Reciclar conexiones después de N segundos
+
+    # Catálogo de productos en memoria (se reconstruye al editar productos)
+    CATALOGO_TTL = 300  # Segundos máximos antes de recargar desde la base
+    CATALOGO_CAMBIOS_MAXIMO = 200  # Más productos cambiados que esto: /api/menu/cambios pide recargar todo
+
+    # Tableros de pedidos (mozo/admin)
+    PEDIDOS_POR_PAGINA = 50
+
+    # Feed en vivo de pedidos (/mozo/stream)
+    EVENTOS_INTERVALO = 1.0  # Segundos entre consultas a pedido_eventos
+    EVENTOS_ESPERA_HUECOS = 3.0  # Segundos que un evento espera a uno de id menor todavía sin confirmar
+
+    # Sesiones del lado del servidor: 'mysql' (tabla sesiones, con cualquier DB_DRIVER),
+    # 'filesystem' o 'cookie' (sesión firmada de Flask)
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'mysql')
+    SESSION_TTL = 12 * 3600  # Segundos sin actividad antes de descartar una sesión
+    SESSION_LRU_SIZE = 1000  # Sesiones cacheadas en memoria por proceso (backend mysql)
+    SESSION_POOL_SIZE = 4  # Conexiones propias del backend mysql, aparte de las de los requests
+    SESSION_DIR = None  # Carpeta del backend filesystem (por defecto instance/sesiones)
+    SESSION_SWEEP_INTERVAL = 600  # Segundos entre barridos de sesiones vencidas
+
+    # Variantes responsive de imágenes (requiere Pillow)
+    IMAGENES_WORKERS = 2  # Hilos que generan miniaturas en segundo plano
+
+    # Archivos estáticos: huellas y versiones .gz/.br en instance/estaticos al arrancar
+    # (si es False se preparan a medida que se piden)
+    ESTATICOS_CONSTRUIR = True
+
+    # Compresión del HTML/JSON generado (desactivada si ya lo hace nginx u otro proxy)
+    COMPRESION_ACTIVA = os.environ.get('COMPRESION_ACTIVA', '0') == '1'
+    COMPRESION_MINIMO = 1024  # Bytes: las respuestas más chicas se envían sin comprimir
+    COMPRESION_MINIFICAR = True  # Quitar indentación y líneas vacías del HTML
+
+    # Logging: JSON a stdout escrito desde un hilo aparte (no bloquea los requests).
+    # Con LOG_LEVEL=DEBUG se ve el detalle de cada pedido/producto y se hacen las
+    # consultas de diagnóstico; en producción dejar INFO o WARNING.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FORMATO = os.environ.get('LOG_FORMATO', 'json')  # 'json' o 'texto'
+    LOG_ARCHIVO = os.environ.get('LOG_ARCHIVO')  # Por defecto stdout
+    LOG_NIVELES = {'werkzeug': 'INFO'}  # Niveles por logger, p. ej. {'AppMenuDigital.sesiones': 'DEBUG'}
+
+    # /metrics: además de los administradores logueados, lo leen quienes envíen
+    # 'Authorization: Bearer <METRICAS_TOKEN>' o vengan de una IP de METRICAS_IPS.
+    # Detrás de un proxy en la misma máquina todos los requests llegan desde
+    # 127.0.0.1: incluirla solo si la app atiende directamente, sin proxy.
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+    METRICAS_IPS = [ip.strip() for ip in os.environ.get('METRICAS_IPS', '').split(',') if ip.strip()]
+
+    # Consultas SQL: las que tardan más de CONSULTAS_LENTA segundos se registran con
+    # los tipos de sus parámetros (nunca los valores); con CONSULTAS_ESTRICTO una vista que supera su presupuesto
+    # (@presupuesto_consultas) responde con error en vez de solo avisar en el log
+    CONSULTAS_LENTA = 0.2
+    CONSULTAS_ESTRICTO = os.environ.get('CONSULTAS_ESTRICTO', '0') == '1'
     
     # Configuración del servidor
    # DEBUG = True
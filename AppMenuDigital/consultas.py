@@ -0,0 +1,126 @@
+import logging
+import threading
+from contextlib import ContextDecorator
+
+from flask import current_app, g, has_request_context, request
+
+# Control de consultas SQL: log de consultas lentas y presupuesto de consultas
+# por vista, para detectar cuando una ruta vuelve a caer en un patrón N+1.
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class PresupuestoExcedido(AssertionError):
+    """Una vista o bloque ejecutó más consultas que las permitidas"""
+
+
+def _resumir(sql, largo=500):
+    return ' '.join(str(sql).split())[:largo]
+
+
+def _detalle(consultas):
+    return '\n'.join(f"  {i}. {_resumir(sql, 200)}" for i, (sql, _) in enumerate(consultas, 1))
+
+
+def _tipos(params):
+    """Cantidad y tipos de los parámetros, sin sus valores: pueden ser contraseñas
+    (crear_usuario) o datos de clientes, que no deben quedar en el log"""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in params.items()) + '}'
+    if isinstance(params, (list, tuple)):
+        if params and all(isinstance(fila, (list, tuple, dict)) for fila in params):
+            # executemany: una fila de parámetros por ejecución
+            return f"{len(params)} filas {_tipos(params[0])}"
+        return '(' + ', '.join(type(v).__name__ for v in params) + ')'
+    return f'({type(params).__name__})'
+
+
+def _pila():
+    if not hasattr(_local, 'pila'):
+        _local.pila = []
+    return _local.pila
+
+
+class assert_max_queries(ContextDecorator):
+    """Falla con PresupuestoExcedido si el bloque ejecuta más de `maximo` consultas.
+
+    Pensado para tests, con el cliente de prueba de Flask:
+
+        with assert_max_queries(3):
+            client.get('/mozo')
+
+    También sirve como decorador de una función de test. Cuenta las consultas
+    del hilo actual hechas con db.connection.
+    """
+
+    def __init__(self, maximo):
+        self.maximo = maximo
+        self.consultas = []
+
+    def __enter__(self):
+        self.consultas = []
+        _pila().append(self)
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        _pila().remove(self)
+        if tipo is None and len(self.consultas) > self.maximo:
+            raise PresupuestoExcedido(
+                f"Se ejecutaron {len(self.consultas)} consultas (máximo {self.maximo}):\n{_detalle(self.consultas)}"
+            )
+        return False
+
+
+def presupuesto_consultas(maximo):
+    """Decorador de vistas: cantidad máxima de consultas SQL por request"""
+    def decorar(vista):
+        vista.max_consultas = maximo
+        return vista
+    return decorar
+
+
+class GuardiaConsultas:
+    def __init__(self, app=None, db=None, lenta=0.2, estricto=False):
+        self.lenta = lenta
+        self.estricto = estricto
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        db.observadores.append(self._consulta)
+        app.before_request(self._inicio)
+        app.after_request(self._fin)
+
+    def _inicio(self):
+        g._consultas = []
+
+    def _consulta(self, sql, params, segundos):
+        for contador in _pila():
+            contador.consultas.append((sql, segundos))
+        if has_request_context() and '_consultas' in g:
+            g._consultas.append((sql, segundos))
+        if self.lenta is not None and segundos >= self.lenta:
+            # La ruta y el endpoint los agrega el filtro de contexto del logging
+            log.warning("Consulta lenta (%.3f s)", segundos, extra={
+                'sql': _resumir(sql),
+                'params': _resumir(_tipos(params)),
+                'segundos': round(segundos, 4),
+            })
+
+    def _fin(self, response):
+        consultas = g.pop('_consultas', None)
+        vista = current_app.view_functions.get(request.endpoint)
+        maximo = getattr(vista, 'max_consultas', None)
+        if consultas is None or maximo is None or len(consultas) <= maximo:
+            return response
+        mensaje = f"{request.endpoint} ejecutó {len(consultas)} consultas (presupuesto {maximo})"
+        # En tests un presupuesto excedido siempre es un error. app.testing se
+        # mira acá y no en init_app: los tests lo activan después de importar la app
+        if self.estricto or current_app.testing:
+            raise PresupuestoExcedido(f"{mensaje}:\n{_detalle(consultas)}")
+        log.warning(mensaje, extra={'consultas': [_resumir(sql, 200) for sql, _ in consultas]})
+        return response
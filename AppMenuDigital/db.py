@@ -0,0 +1,393 @@
+import datetime
+import functools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from decimal import Decimal
+
+import pymysql
+from flask import g, has_app_context
+
+log = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera"""
+
+
+class ConnectionPool:
+    """Pool de conexiones acotado y seguro entre hilos"""
+
+    def __init__(self, factory, max_size=10, timeout=10, max_idle=300, max_lifetime=3600):
+        self._factory = factory
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self._cond = threading.Condition()
+        # Cada entrada: (conexion, creada_en, ultimo_uso)
+        self._idle = deque()
+        self._created_at = {}
+        self._in_use = 0
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'evicted': 0,
+            'broken': 0,
+            'timeouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def _expired(self, created_at, last_used, now):
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return True
+        if self.max_idle and now - last_used > self.max_idle:
+            return True
+        return False
+
+    def _discard(self, conn):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                    if self._expired(created_at, last_used, now):
+                        self._stats['evicted'] += 1
+                        self._discard(conn)
+                        continue
+                    self._in_use += 1
+                    break
+                else:
+                    conn = None
+                if conn is not None:
+                    break
+                if self._in_use < self.max_size:
+                    self._in_use += 1
+                    break
+                remaining = self.timeout - (now - started)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'Pool agotado ({self.max_size} conexiones en uso)')
+                waited = True
+                self._cond.wait(remaining)
+
+            elapsed = time.monotonic() - started
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_total'] += elapsed
+                self._stats['wait_time_max'] = max(self._stats['wait_time_max'], elapsed)
+
+        # El chequeo de salud y la apertura se hacen fuera del lock
+        try:
+            if conn is not None:
+                try:
+                    conn.ping(reconnect=False)
+                    return conn
+                except Exception:
+                    with self._cond:
+                        self._stats['broken'] += 1
+                    self._discard(conn)
+            conn = self._factory()
+            with self._cond:
+                self._stats['created'] += 1
+                self._created_at[id(conn)] = time.monotonic()
+            return conn
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        # Descartar cualquier transacción que la vista haya dejado abierta
+        reusable = bool(getattr(conn, 'open', False))
+        if reusable:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+        with self._cond:
+            self._in_use -= 1
+            now = time.monotonic()
+            created_at = self._created_at.get(id(conn), now)
+            if reusable and not self._expired(created_at, now, now):
+                self._idle.append((conn, created_at, now))
+            else:
+                if not reusable:
+                    self._stats['broken'] += 1
+                else:
+                    self._stats['evicted'] += 1
+                self._discard(conn)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            data = dict(self._stats)
+            data['in_use'] = self._in_use
+            data['idle'] = len(self._idle)
+            data['max_size'] = self.max_size
+        data['wait_time_avg'] = (data['wait_time_total'] / data['waits']) if data['waits'] else 0.0
+        return data
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+
+
+class CursorMedido:
+    """Cursor que avisa a los observadores de cada consulta: observador(sql, params, segundos)"""
+
+    def __init__(self, cursor, observadores):
+        self._cursor = cursor
+        self._observadores = observadores
+
+    def _medir(self, metodo, sql, params):
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, params)
+        finally:
+            duracion = time.perf_counter() - inicio
+            for observador in self._observadores:
+                try:
+                    observador(sql, params, duracion)
+                except Exception:
+                    log.exception("Error en observador de consultas")
+
+    def execute(self, sql, params=None):
+        return self._medir(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, params):
+        return self._medir(self._cursor.executemany, sql, params)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class ConexionMedida:
+    """Envuelve una conexión para que sus cursores sean CursorMedido"""
+
+    def __init__(self, conn, observadores):
+        self._conn = conn
+        self._observadores = observadores
+
+    def cursor(self, *args, **kwargs):
+        return CursorMedido(self._conn.cursor(*args, **kwargs), self._observadores)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+
+class _BaseDatos:
+    """Una conexión del pool por request; las subclases saben abrir conexiones"""
+
+    dialecto = None
+
+    def __init__(self, app=None):
+        self.app = None
+        self.pool = None
+        # Funciones (sql, params, segundos) llamadas después de cada consulta
+        self.observadores = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.pool = self.pool_aparte(app.config.get('MYSQL_POOL_SIZE', 10))
+        app.teardown_appcontext(self.teardown)
+
+    def pool_aparte(self, max_size):
+        """Otro pool a la misma base, para quien no debe competir con los requests.
+
+        Un request ya tiene su conexión de self.pool: si además pidiera otra al
+        mismo pool (p. ej. para guardar la sesión), con todos los requests en
+        ese punto nadie libera ninguna y el pool se agota.
+        """
+        return ConnectionPool(
+            self._connect,
+            max_size=max_size,
+            timeout=self.app.config.get('MYSQL_POOL_TIMEOUT', 10),
+            max_idle=self.app.config.get('MYSQL_POOL_MAX_IDLE', 300),
+            max_lifetime=self.app.config.get('MYSQL_POOL_MAX_LIFETIME', 3600),
+        )
+
+    def _connect(self):
+        raise NotImplementedError
+
+    def _medir(self, conn):
+        return ConexionMedida(conn, self.observadores) if self.observadores else conn
+
+    @property
+    def connection(self):
+        # Fuera de un contexto de aplicación no hay dónde devolverla al pool
+        if not has_app_context():
+            return self._medir(self._connect())
+        conn = g.get('_db_conn')
+        if conn is None or not getattr(conn, 'open', False):
+            if conn is not None:
+                self.pool.release(conn)
+            conn = self.pool.acquire()
+            g._db_conn = conn
+        return self._medir(conn)
+
+    def teardown(self, exception):
+        conn = g.pop('_db_conn', None)
+        if conn is not None:
+            self.pool.release(conn)
+
+
+# Clase MySQL personalizada usando pymysql
+class MySQL(_BaseDatos):
+    dialecto = 'mysql'
+
+    def _connect(self):
+        return pymysql.connect(
+            host=self.app.config['MYSQL_HOST'],
+            port=self.app.config['MYSQL_PORT'],
+            user=self.app.config['MYSQL_USER'],
+            password=self.app.config['MYSQL_PASSWORD'],
+            database=self.app.config['MYSQL_DB'],
+            autocommit=False,
+            charset='utf8mb4',
+            connect_timeout=5
+        )
+
+    def descripcion(self):
+        """Datos del servidor para los logs de diagnóstico"""
+        cur = self.connection.cursor()
+        try:
+            cur.execute("SELECT DATABASE(), VERSION(), CURRENT_USER()")
+            base, version, usuario = cur.fetchone()
+        finally:
+            cur.close()
+        return {'motor': 'mysql', 'base': base, 'version': version, 'usuario': usuario}
+
+
+# SQLite: los mismos valores que devuelve pymysql para DECIMAL y fechas
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(datetime.date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda d: d.isoformat(' '))
+sqlite3.register_converter('TIMESTAMP', lambda v: datetime.datetime.fromisoformat(v.decode()))
+
+
+@functools.lru_cache(maxsize=512)
+def _placeholders(sql):
+    # Placeholders de pymysql (%s, y %% para un % literal) a los de sqlite3
+    return re.sub(r'%([s%])', lambda m: '?' if m.group(1) == 's' else '%', sql)
+
+
+class CursorSQLite:
+    """Cursor sqlite3 que acepta el SQL escrito para pymysql"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=None):
+        if params is None:
+            self._cursor.execute(sql)
+        else:
+            self._cursor.execute(_placeholders(sql), tuple(params))
+        return self._cursor.rowcount
+
+    def executemany(self, sql, params):
+        self._cursor.executemany(_placeholders(sql), [tuple(p) for p in params])
+        return self._cursor.rowcount
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class ConexionSQLite:
+    """Conexión sqlite3 con la interfaz que usan la app y el pool (open, ping)"""
+
+    dialecto = 'sqlite'
+
+    def __init__(self, ruta, timeout=10):
+        # El pool garantiza que la use un solo hilo a la vez
+        self._conn = sqlite3.connect(ruta, timeout=timeout, check_same_thread=False,
+                                     detect_types=sqlite3.PARSE_DECLTYPES)
+        # WAL: las lecturas no bloquean a la escritura (y viceversa)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self.open = True
+
+    def cursor(self):
+        return CursorSQLite(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def ping(self, reconnect=False):
+        if not self.open:
+            raise sqlite3.ProgrammingError('Conexión cerrada')
+
+    def close(self):
+        self.open = False
+        self._conn.close()
+
+
+class SQLite(_BaseDatos):
+    """Base en un archivo local, sin servidor (tests, benchmarks, una sola tablet)"""
+
+    dialecto = 'sqlite'
+
+    def init_app(self, app):
+        self.ruta = app.config.get('SQLITE_PATH') or os.path.join(app.instance_path, 'menudigital.sqlite3')
+        os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+        super().init_app(app)
+
+    def _connect(self):
+        return ConexionSQLite(self.ruta, timeout=self.app.config.get('SQLITE_TIMEOUT', 10))
+
+    def descripcion(self):
+        return {'motor': 'sqlite', 'base': self.ruta, 'version': sqlite3.sqlite_version}
+
+
+DRIVERS = {'mysql': MySQL, 'sqlite': SQLite}
+
+
+def crear_db(app):
+    """Instancia el driver elegido con DB_DRIVER ('mysql' o 'sqlite')"""
+    driver = app.config.get('DB_DRIVER', 'mysql')
+    if driver not in DRIVERS:
+        raise ValueError(f"DB_DRIVER desconocido: {driver!r} (opciones: {', '.join(DRIVERS)})")
+    return DRIVERS[driver](app)
@@ -0,0 +1,173 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se generan los .gz
+    brotli = None
+
+# Archivos estáticos con huella de contenido.
+# url_for('static', filename=...) agrega ?v=<hash>; cuando el hash del request
+# coincide con el del archivo se sirve con caché inmutable de un año. Los
+# archivos de texto se copian procesados a una carpeta de build junto con sus
+# versiones .gz/.br, y se elige la variante según Accept-Encoding.
+
+UN_ANIO = 31536000
+TEXTO = {'.css', '.js', '.svg', '.html', '.json', '.txt', '.xml', '.map'}
+_URL_CSS_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+_COMPRESORES = [('.gz', 'gzip', lambda datos: gzip.compress(datos, compresslevel=9, mtime=0))]
+if brotli is not None:
+    _COMPRESORES.insert(0, ('.br', 'br', lambda datos: brotli.compress(datos, quality=11)))
+
+
+def _hash(datos):
+    return hashlib.sha256(datos).hexdigest()[:12]
+
+
+def _escribir(ruta, datos):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as fh:
+        fh.write(datos)
+    os.replace(tmp, ruta)
+
+
+class Estaticos:
+    def __init__(self, app=None, build_dir=None, rechequeo=5):
+        self.build_dir = build_dir
+        self.rechequeo = rechequeo
+        self._lock = threading.RLock()
+        # filename -> {'firma', 'version', 'texto', 'deps', 'chequeado'}
+        self._entradas = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.static_folder
+        if self.build_dir is None:
+            self.build_dir = os.path.join(app.instance_path, 'estaticos')
+        app.url_defaults(self._agregar_version)
+        app.view_functions['static'] = self.servir
+
+    def _firma(self, ruta):
+        st = os.stat(ruta)
+        return st.st_mtime_ns, st.st_size
+
+    def _procesar_css(self, filename, datos):
+        """Agrega ?v=<hash> a los url(...) que apuntan a archivos de static"""
+        deps = {}
+        carpeta = posixpath.dirname(filename)
+
+        def reemplazar(match):
+            comilla, ref = match.group(1), match.group(2).strip()
+            if ref.startswith(('data:', 'http:', 'https:', '//', '/', '#')) or '?' in ref or '#' in ref:
+                return match.group(0)
+            destino = posixpath.normpath(posixpath.join(carpeta, ref))
+            version = self.version(destino)
+            if not version:
+                return match.group(0)
+            deps[destino] = version
+            return f"url({comilla}{ref}?v={version}{comilla})"
+
+        texto = _URL_CSS_RE.sub(reemplazar, datos.decode('utf-8'))
+        return texto.encode('utf-8'), deps
+
+    def _construir(self, filename, ruta, firma):
+        with open(ruta, 'rb') as fh:
+            datos = fh.read()
+        ext = os.path.splitext(filename)[1].lower()
+        entrada = {'firma': firma, 'texto': ext in TEXTO, 'deps': {}, 'chequeado': time.monotonic()}
+        if entrada['texto']:
+            if ext == '.css':
+                datos, entrada['deps'] = self._procesar_css(filename, datos)
+            destino = os.path.join(self.build_dir, filename)
+            _escribir(destino, datos)
+            for sufijo, _, comprimir in _COMPRESORES:
+                comprimido = comprimir(datos)
+                if len(comprimido) < len(datos):
+                    _escribir(destino + sufijo, comprimido)
+                else:
+                    try:
+                        os.remove(destino + sufijo)
+                    except FileNotFoundError:
+                        pass
+        entrada['version'] = _hash(datos)
+        return entrada
+
+    def _entrada(self, filename):
+        ruta = safe_join(self.folder, filename)
+        if ruta is None or not os.path.isfile(ruta):
+            return None
+        with self._lock:
+            entrada = self._entradas.get(filename)
+            ahora = time.monotonic()
+            if entrada is not None and ahora - entrada['chequeado'] < self.rechequeo:
+                return entrada
+            firma = self._firma(ruta)
+            vigente = (
+                entrada is not None
+                and entrada['firma'] == firma
+                and all(self.version(dep) == v for dep, v in entrada['deps'].items())
+            )
+            if vigente:
+                entrada['chequeado'] = ahora
+            else:
+                entrada = self._construir(filename, ruta, firma)
+                self._entradas[filename] = entrada
+            return entrada
+
+    def version(self, filename):
+        entrada = self._entrada(filename)
+        return entrada['version'] if entrada else None
+
+    def _agregar_version(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') and 'v' not in values:
+            version = self.version(values['filename'])
+            if version:
+                values['v'] = version
+
+    def construir(self):
+        """Procesa y comprime todos los archivos de static (paso de build/arranque)"""
+        construidos = []
+        for raiz, _, archivos in os.walk(self.folder):
+            for nombre in archivos:
+                filename = os.path.relpath(os.path.join(raiz, nombre), self.folder).replace(os.sep, '/')
+                entrada = self._entrada(filename)
+                if entrada:
+                    construidos.append((filename, entrada['version']))
+        return sorted(construidos)
+
+    def servir(self, filename):
+        entrada = self._entrada(filename)
+        if entrada is None:
+            abort(404)
+        ruta = safe_join(self.folder, filename)
+        encoding = None
+        if entrada['texto']:
+            ruta = os.path.join(self.build_dir, filename)
+            for sufijo, nombre, _ in _COMPRESORES:
+                if request.accept_encodings[nombre] and os.path.isfile(ruta + sufijo):
+                    ruta, encoding = ruta + sufijo, nombre
+                    break
+
+        inmutable = request.args.get('v') == entrada['version']
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        max_age = UN_ANIO if inmutable else current_app.get_send_file_max_age(filename)
+        response = send_file(ruta, mimetype=mimetype, max_age=max_age, conditional=True)
+        if inmutable:
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entrada['texto']:
+            response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,150 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+
+def publicar(cur, tipo, pedido_id, datos):
+    """Registra un evento de pedido usando el cursor (y la transacción) del llamador.
+
+    La tabla pedido_eventos hace de secuencia compartida entre procesos: cada
+    worker la consulta y reparte los eventos nuevos a sus clientes SSE.
+    """
+    cur.execute(
+        "INSERT INTO pedido_eventos (tipo, pedido_id, datos) VALUES (%s, %s, %s)",
+        (tipo, pedido_id, json.dumps(datos, separators=(',', ':'), default=str))
+    )
+
+
+def leer_eventos(cur, desde_id, limite=200):
+    """Eventos (id, tipo, datos_json) con id > desde_id, en orden"""
+    cur.execute(
+        "SELECT id, tipo, datos FROM pedido_eventos WHERE id > %s ORDER BY id LIMIT %s",
+        (desde_id, limite)
+    )
+    return cur.fetchall()
+
+
+def ultimo_evento(cur):
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM pedido_eventos")
+    return cur.fetchone()[0]
+
+
+def purgar_eventos(cur, antes_de):
+    """Borra los eventos creados antes de `antes_de` (datetime)"""
+    cur.execute("DELETE FROM pedido_eventos WHERE creado_en < %s", (antes_de,))
+    return cur.rowcount
+
+
+def formatear_sse(evento):
+    event_id, tipo, datos = evento
+    return f"id: {event_id}\nevent: {tipo}\ndata: {datos}\n\n"
+
+
+class EventBus:
+    """Reparte en el proceso los eventos leídos de pedido_eventos.
+
+    Un único hilo por proceso consulta la tabla mientras haya suscriptores,
+    así la carga sobre la base no crece con la cantidad de tablets conectadas.
+    """
+
+    def __init__(self, cargar, ultimo_id, purgar=None, intervalo=1.0, capacidad=500, purgar_cada=600,
+                 espera_huecos=3.0):
+        # cargar(desde_id) -> [(id, tipo, datos_json)] con id > desde_id, ordenados
+        # ultimo_id() -> id del último evento registrado (0 si no hay)
+        # purgar() -> borra eventos viejos de la tabla
+        self._cargar = cargar
+        self._ultimo_id = ultimo_id
+        self._purgar = purgar
+        self.purgar_cada = purgar_cada
+        self._ultima_purga = time.monotonic()
+        self.intervalo = intervalo
+        self.capacidad = capacidad
+        # Los AUTO_INCREMENT se asignan al insertar pero se ven al confirmar: el
+        # 11 puede aparecer antes que el 10. Un evento que sigue a un id faltante
+        # espera hasta `espera_huecos` segundos a que aparezca; si no aparece
+        # (transacción deshecha), se lo da por perdido y se sigue.
+        self.espera_huecos = espera_huecos
+        self._cond = threading.Condition()
+        self._buffer = deque()
+        self._base = None  # Todo evento con id > _base está en el buffer
+        self._ultimo = None  # Ids <= _ultimo: repartidos o dados por perdidos
+        self._pendientes = {}  # id -> (evento, llegada) de eventos detrás de un hueco
+        self._suscriptores = 0
+        self._hilo = None
+
+    def _iniciar(self):
+        if self._hilo is None:
+            self._ultimo = self._base = self._ultimo_id()
+            self._hilo = threading.Thread(target=self._loop, name='pedido-eventos', daemon=True)
+            self._hilo.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.intervalo)
+            if self._purgar and time.monotonic() - self._ultima_purga > self.purgar_cada:
+                self._ultima_purga = time.monotonic()
+                try:
+                    self._purgar()
+                except Exception:
+                    log.exception("Error purgando eventos")
+            with self._cond:
+                if not self._suscriptores:
+                    continue
+                desde = self._ultimo
+            try:
+                nuevos = self._cargar(desde)
+            except Exception:
+                log.exception("Error consultando eventos")
+                continue
+            with self._cond:
+                llegada = time.monotonic()
+                for evento in nuevos:
+                    if evento[0] > self._ultimo and evento[0] not in self._pendientes:
+                        self._pendientes[evento[0]] = (evento, llegada)
+                if self._repartir(llegada):
+                    while len(self._buffer) > self.capacidad:
+                        self._base = self._buffer.popleft()[0]
+                    self._cond.notify_all()
+
+    def _repartir(self, ahora):
+        """Pasa al buffer, en orden de id, los pendientes que ya no esperan un hueco"""
+        repartidos = False
+        while self._pendientes:
+            siguiente = min(self._pendientes)
+            evento, llegada = self._pendientes[siguiente]
+            if siguiente != self._ultimo + 1:
+                if ahora - llegada < self.espera_huecos:
+                    break
+                log.debug("Eventos %s a %s sin confirmar, se saltean", self._ultimo + 1, siguiente - 1)
+            del self._pendientes[siguiente]
+            self._buffer.append(evento)
+            self._ultimo = siguiente
+            repartidos = True
+        return repartidos
+
+    def suscribir(self):
+        """Registra un cliente y devuelve el id del último evento conocido"""
+        with self._cond:
+            self._iniciar()
+            self._suscriptores += 1
+            return self._ultimo
+
+    def desuscribir(self):
+        with self._cond:
+            self._suscriptores -= 1
+
+    def esperar(self, desde_id, timeout):
+        """Eventos con id > desde_id; bloquea hasta timeout si todavía no hay"""
+        with self._cond:
+            if desde_id >= self._base:
+                if desde_id >= self._ultimo:
+                    self._cond.wait(timeout)
+                return [e for e in self._buffer if e[0] > desde_id]
+            ultimo = self._ultimo
+        # El cliente viene de más atrás que el buffer (p. ej. un Last-Event-ID
+        # viejo): hasta _ultimo, lo de más adelante todavía puede tener huecos
+        return [e for e in self._cargar(desde_id) if e[0] <= ultimo]
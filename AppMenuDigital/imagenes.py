@@ -0,0 +1,271 @@
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import posixpath
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from markupsafe import Markup, escape
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+except ImportError:  # Pillow es opcional: sin él se sirven las imágenes originales
+    Image = None
+
+log = logging.getLogger(__name__)
+
+# Variantes responsive de las imágenes subidas.
+# Para images/foto.png se generan images/variantes/foto-<ancho>.webp/.jpg y un
+# manifiesto images/variantes/foto.json con los anchos disponibles y un
+# placeholder borroso en base64.
+
+ANCHOS = (320, 640, 1280)
+CARPETA = 'variantes'
+SIZES = '(max-width: 479px) 100vw, (max-width: 1023px) 50vw, 400px'
+_FORMATOS = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+# Los GIF pueden ser animados y los AVIF necesitan un plugin: se sirven tal cual
+_EXTS_PROCESABLES = {'.jpg', '.jpeg', '.png', '.webp'}
+
+
+# Imágenes direccionadas por contenido: images/<sha256[:32]>.<ext>
+_DIRECCIONADA_RE = re.compile(r'^images/[0-9a-f]{32}\.\w+$')
+_CHUNK = 64 * 1024
+
+
+def es_direccionada(imagen):
+    return bool(imagen) and bool(_DIRECCIONADA_RE.match(imagen))
+
+
+def guardar_subida(archivo, carpeta, ext):
+    """Guarda un upload con el hash de su contenido como nombre.
+
+    Se lee en bloques mientras se calcula el hash, sin cargar el archivo entero
+    en memoria. Si ya existía un archivo con el mismo contenido se reutiliza.
+    Devuelve (ruta relativa a static, nueva).
+    """
+    ext = '.jpg' if ext.lower() == '.jpeg' else ext.lower()
+    os.makedirs(carpeta, exist_ok=True)
+    digest = hashlib.sha256()
+    tmp = os.path.join(carpeta, f".subida.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, 'wb') as fh:
+            while True:
+                bloque = archivo.stream.read(_CHUNK)
+                if not bloque:
+                    break
+                digest.update(bloque)
+                fh.write(bloque)
+        nombre = digest.hexdigest()[:32] + ext
+        destino = os.path.join(carpeta, nombre)
+        if os.path.exists(destino):
+            # Duplicado: refrescar mtime para que el GC no lo borre mientras se guarda el producto
+            os.utime(destino)
+            return f"images/{nombre}", False
+        os.replace(tmp, destino)
+        return f"images/{nombre}", True
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def recolectar(cur, static_folder, candidatas, variantes=None, gracia=600):
+    """Borra las imágenes candidatas que ya no usa ningún producto.
+
+    Las referencias salen de productos.imagen, en una sola consulta. Solo se
+    borran archivos direccionados por contenido (nunca las imágenes de las
+    plantillas ni las subidas con el esquema viejo) y que no se hayan tocado
+    en los últimos `gracia` segundos.
+    Devuelve la lista de imágenes borradas.
+    """
+    candidatas = sorted({c for c in candidatas if es_direccionada(c)})
+    if not candidatas:
+        return []
+    placeholders = ', '.join(['%s'] * len(candidatas))
+    cur.execute(
+        f"""
+        SELECT imagen FROM productos WHERE imagen IN ({placeholders})
+        """,
+        tuple(candidatas)
+    )
+    referenciadas = {row[0] for row in cur.fetchall()}
+    borradas = []
+    ahora = time.time()
+    for imagen in candidatas:
+        if imagen in referenciadas:
+            continue
+        ruta = os.path.join(static_folder, imagen)
+        try:
+            if ahora - os.path.getmtime(ruta) < gracia:
+                continue
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        if variantes is not None:
+            variantes.eliminar(imagen)
+        borradas.append(imagen)
+    return borradas
+
+
+def _es_externa(imagen):
+    return imagen.startswith('http://') or imagen.startswith('https://')
+
+
+def _base(imagen):
+    """'images/foto.png' -> 'images/variantes/foto'"""
+    carpeta, nombre = posixpath.split(imagen)
+    return posixpath.join(carpeta, CARPETA, os.path.splitext(nombre)[0])
+
+
+def _guardar_atomico(ruta, escribir):
+    tmp = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as fh:
+        escribir(fh)
+    os.replace(tmp, ruta)
+
+
+def generar_variantes(static_folder, imagen):
+    """Genera las variantes de una imagen (ruta relativa a static) y devuelve el manifiesto"""
+    base = _base(imagen)
+    os.makedirs(os.path.join(static_folder, os.path.dirname(base)), exist_ok=True)
+
+    with Image.open(os.path.join(static_folder, imagen)) as original:
+        original = ImageOps.exif_transpose(original)
+        ancho, alto = original.size
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+        # JPEG no tiene transparencia: componer sobre blanco
+        if original.mode == 'RGBA':
+            opaca = Image.new('RGB', original.size, (255, 255, 255))
+            opaca.paste(original, mask=original.split()[3])
+        else:
+            opaca = original
+
+        variantes = {ext: [] for ext, _, _ in _FORMATOS}
+        # Sin agrandar: solo anchos menores al original (o el original si es chico)
+        for w in [a for a in ANCHOS if a < ancho] or [ancho]:
+            h = max(1, round(alto * w / ancho))
+            for ext, formato, opciones in _FORMATOS:
+                fuente = original if ext == 'webp' else opaca
+                reducida = fuente.resize((w, h), Image.LANCZOS)
+                ruta = f"{base}-{w}.{ext}"
+                _guardar_atomico(os.path.join(static_folder, ruta),
+                                 lambda fh: reducida.save(fh, formato, **opciones))
+                variantes[ext].append([w, ruta])
+
+        # Placeholder de ~16px, borroso, embebido en el HTML
+        mini = opaca.resize((16, max(1, round(alto * 16 / ancho))), Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+        buffer = io.BytesIO()
+        mini.save(buffer, 'JPEG', quality=40)
+        placeholder = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    manifiesto = {'ancho': ancho, 'alto': alto, 'variantes': variantes, 'placeholder': placeholder}
+    _guardar_atomico(os.path.join(static_folder, base + '.json'),
+                     lambda fh: fh.write(json.dumps(manifiesto).encode('utf-8')))
+    return manifiesto
+
+
+class Variantes:
+    """Genera variantes en segundo plano y arma el HTML responsive de cada imagen"""
+
+    def __init__(self, static_folder, resolver_url, max_workers=2, ttl_faltante=30):
+        # resolver_url('images/x.jpg') -> URL pública del archivo estático
+        self.static_folder = static_folder
+        self._resolver_url = resolver_url
+        self.ttl_faltante = ttl_faltante
+        # Hilos y no procesos: Pillow libera el GIL al redimensionar y codificar
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='imagenes') if Image else None
+        self._lock = threading.Lock()
+        self._manifiestos = {}  # imagen -> (manifiesto o None, leido_en)
+
+    @property
+    def disponible(self):
+        return Image is not None
+
+    def procesable(self, imagen):
+        return bool(imagen) and not _es_externa(imagen) and os.path.splitext(imagen)[1].lower() in _EXTS_PROCESABLES
+
+    def encolar(self, imagen):
+        """Programa la generación de variantes; no bloquea el request"""
+        if not self.disponible or not self.procesable(imagen):
+            return None
+        # Una imagen duplicada ya tiene sus variantes
+        if self.manifiesto(imagen) is not None:
+            return None
+        return self._executor.submit(self.generar, imagen)
+
+    def generar(self, imagen):
+        try:
+            manifiesto = generar_variantes(self.static_folder, imagen)
+        except Exception:
+            log.exception("No se pudieron generar variantes de %s", imagen)
+            return None
+        with self._lock:
+            self._manifiestos[imagen] = (manifiesto, time.monotonic())
+        return manifiesto
+
+    def manifiesto(self, imagen):
+        if not self.procesable(imagen):
+            return None
+        with self._lock:
+            cacheado = self._manifiestos.get(imagen)
+        # Los faltantes se vuelven a buscar cada tanto: otro worker pudo generarlos
+        if cacheado and (cacheado[0] is not None or time.monotonic() - cacheado[1] < self.ttl_faltante):
+            return cacheado[0]
+        try:
+            with open(os.path.join(self.static_folder, _base(imagen) + '.json'), encoding='utf-8') as fh:
+                manifiesto = json.load(fh)
+        except (OSError, ValueError):
+            manifiesto = None
+        with self._lock:
+            self._manifiestos[imagen] = (manifiesto, time.monotonic())
+        return manifiesto
+
+    def eliminar(self, imagen):
+        """Borra las variantes y el manifiesto de una imagen"""
+        manifiesto = self.manifiesto(imagen)
+        rutas = [_base(imagen) + '.json']
+        if manifiesto:
+            rutas += [ruta for lista in manifiesto['variantes'].values() for _, ruta in lista]
+        for ruta in rutas:
+            try:
+                os.remove(os.path.join(self.static_folder, ruta))
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._manifiestos.pop(imagen, None)
+
+    def html(self, imagen, alt='', sizes=SIZES, fallback=None):
+        """<picture> con srcset WebP/JPEG y placeholder, o un <img> simple si no hay variantes"""
+        onerror = ''
+        if fallback:
+            # Dentro de <picture> también hay que descartar los srcset para que tome el src
+            onerror = (' onerror="this.onerror=null; this.srcset=\'\';'
+                       ' if (this.parentNode.tagName === \'PICTURE\') this.parentNode.querySelectorAll(\'source\').forEach(function(s) { s.remove(); });'
+                       f' this.src=\'{escape(self._resolver_url(fallback))}\';"')
+        src = imagen if _es_externa(imagen) else self._resolver_url(imagen)
+        manifiesto = self.manifiesto(imagen)
+        if not manifiesto:
+            return Markup(f'<img src="{escape(src)}" alt="{escape(alt)}" loading="lazy"{onerror}>')
+
+        def srcset(ext):
+            return ', '.join(f"{self._resolver_url(ruta)} {w}w" for w, ruta in manifiesto['variantes'][ext])
+
+        jpgs = manifiesto['variantes']['jpg']
+        # src para navegadores sin srcset: la variante mediana
+        src_jpg = jpgs[min(1, len(jpgs) - 1)][1]
+        return Markup(
+            '<picture>'
+            f'<source type="image/webp" srcset="{escape(srcset("webp"))}" sizes="{escape(sizes)}">'
+            f'<img src="{escape(self._resolver_url(src_jpg))}" srcset="{escape(srcset("jpg"))}" sizes="{escape(sizes)}"'
+            f' width="{manifiesto["ancho"]}" height="{manifiesto["alto"]}" alt="{escape(alt)}" loading="lazy" decoding="async"'
+            f' style="background: url({manifiesto["placeholder"]}) center / cover no-repeat;"{onerror}>'
+            '</picture>'
+        )
@@ -0,0 +1,151 @@
+import bisect
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+# Métricas en formato de exposición de Prometheus (texto).
+# Los valores son de este proceso: con varios workers, Prometheus suma las
+# series de cada uno (o se scrapea cada worker por separado).
+
+DURACION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONSULTAS_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ''
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in etiquetas) + '}'
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        return repr(valor) if valor != int(valor) else f"{valor:.1f}"
+    return str(valor)
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect.bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def lineas(self, nombre, etiquetas):
+        acumulado = 0
+        for limite, conteo in zip(self.buckets, self.conteos):
+            acumulado += conteo
+            yield f"{nombre}_bucket{_etiquetas(etiquetas + (('le', _numero(float(limite))),))} {acumulado}"
+        yield f"{nombre}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {self.total}"
+        yield f"{nombre}_sum{_etiquetas(etiquetas)} {_numero(float(self.suma))}"
+        yield f"{nombre}_count{_etiquetas(etiquetas)} {self.total}"
+
+
+class Metricas:
+    def __init__(self, app=None, db=None, prefijo='menudigital'):
+        self.prefijo = prefijo
+        self._lock = threading.Lock()
+        # nombre -> (tipo, ayuda)
+        self._ayuda = {}
+        # nombre -> {etiquetas: valor o Histograma}
+        self._series = {}
+        # Gauges calculados al momento del scrape: nombre -> función que devuelve [(etiquetas, valor)]
+        self._gauges = {}
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        self.describir('http_requests_total', 'counter', 'Requests atendidos por endpoint, método y código')
+        self.describir('http_request_duration_seconds', 'histogram', 'Tiempo hasta generar la respuesta')
+        self.describir('db_queries_total', 'counter', 'Consultas SQL por endpoint')
+        self.describir('db_query_duration_seconds_total', 'counter', 'Tiempo total en consultas SQL por endpoint')
+        self.describir('db_queries_per_request', 'histogram', 'Consultas SQL por request')
+        app.before_request(self._inicio)
+        app.after_request(self._fin)
+        if db is not None:
+            db.observadores.append(self._consulta)
+
+    def describir(self, nombre, tipo, ayuda):
+        self._ayuda[nombre] = (tipo, ayuda)
+
+    def incrementar(self, nombre, valor=1, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            serie = self._series.setdefault(nombre, {})
+            serie[clave] = serie.get(clave, 0) + valor
+
+    def observar(self, nombre, valor, buckets=DURACION_BUCKETS, **etiquetas):
+        clave = tuple(sorted(etiquetas.items()))
+        with self._lock:
+            serie = self._series.setdefault(nombre, {})
+            if clave not in serie:
+                serie[clave] = Histograma(buckets)
+            serie[clave].observar(valor)
+
+    def gauge(self, nombre, ayuda, funcion):
+        """Registra un gauge que se calcula en cada scrape; funcion() -> [(dict etiquetas, valor)]"""
+        self.describir(nombre, 'gauge', ayuda)
+        self._gauges[nombre] = funcion
+
+    # Hooks del request
+
+    def _inicio(self):
+        g._metricas_inicio = time.perf_counter()
+        g._metricas_db = [0, 0.0]
+
+    def _consulta(self, sql, params, segundos):
+        if has_request_context() and '_metricas_db' in g:
+            g._metricas_db[0] += 1
+            g._metricas_db[1] += segundos
+
+    def _fin(self, response):
+        inicio = g.pop('_metricas_inicio', None)
+        if inicio is None:
+            return response
+        endpoint = request.endpoint or 'sin_endpoint'
+        consultas, tiempo_db = g.pop('_metricas_db', (0, 0.0))
+        self.incrementar('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        self.observar('http_request_duration_seconds', time.perf_counter() - inicio, endpoint=endpoint)
+        self.observar('db_queries_per_request', consultas, buckets=CONSULTAS_BUCKETS, endpoint=endpoint)
+        if consultas:
+            self.incrementar('db_queries_total', consultas, endpoint=endpoint)
+            self.incrementar('db_query_duration_seconds_total', tiempo_db, endpoint=endpoint)
+        return response
+
+    # Exposición
+
+    def _bloque(self, nombre, valores):
+        completo = f"{self.prefijo}_{nombre}"
+        tipo, ayuda = self._ayuda.get(nombre, ('untyped', ''))
+        lineas = [f"# HELP {completo} {ayuda}", f"# TYPE {completo} {tipo}"]
+        for etiquetas, valor in sorted(valores, key=lambda item: item[0]):
+            if isinstance(valor, Histograma):
+                lineas.extend(valor.lineas(completo, etiquetas))
+            else:
+                lineas.append(f"{completo}{_etiquetas(etiquetas)} {_numero(valor)}")
+        return lineas
+
+    def exponer(self):
+        """Texto en formato de exposición de Prometheus 0.0.4"""
+        bloques = {}
+        with self._lock:
+            for nombre, valores in self._series.items():
+                bloques[nombre] = self._bloque(nombre, valores.items())
+        # Los gauges pueden consultar la base: fuera del lock
+        for nombre, funcion in self._gauges.items():
+            try:
+                valores = [(tuple(sorted(etiquetas.items())), valor) for etiquetas, valor in funcion()]
+            except Exception as e:
+                bloques[nombre] = [f"# {self.prefijo}_{nombre} no disponible: {e}".replace('\n', ' ')]
+                continue
+            bloques[nombre] = self._bloque(nombre, valores)
+        return '\n'.join(linea for nombre in sorted(bloques) for linea in bloques[nombre]) + '\n'
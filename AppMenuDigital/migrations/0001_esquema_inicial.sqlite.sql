@@ -0,0 +1,65 @@
+-- Esquema base para SQLite: mismas tablas y columnas que 0001_esquema_inicial.sql.
+-- Los importes son REAL y las fechas se guardan en hora local, como en MySQL.
+
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    email VARCHAR(100) NOT NULL UNIQUE,
+    password VARCHAR(255) NOT NULL,
+    fecha_registro TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS categorias (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL UNIQUE,
+    descripcion VARCHAR(255) NULL
+);
+
+CREATE TABLE IF NOT EXISTS menu (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    Nombre_Menu VARCHAR(150) NOT NULL,
+    Precio REAL NOT NULL,
+    Categoria VARCHAR(50) NULL,
+    Imagen VARCHAR(255) NULL,
+    Descripcion TEXT NULL
+);
+
+CREATE TABLE IF NOT EXISTS mozos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(100) NOT NULL,
+    email VARCHAR(120) NULL UNIQUE,
+    telefono VARCHAR(30) NULL,
+    activo INTEGER DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS productos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre VARCHAR(150) NOT NULL,
+    descripcion TEXT NULL,
+    precio REAL NOT NULL,
+    imagen VARCHAR(255) NULL,
+    categoria VARCHAR(50) NULL
+);
+CREATE INDEX IF NOT EXISTS idx_categoria ON productos (categoria);
+
+CREATE TABLE IF NOT EXISTS pedidos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id INTEGER NULL REFERENCES usuarios(id),
+    estado VARCHAR(20) DEFAULT 'pendiente',
+    mesa VARCHAR(50) NULL,
+    creado_en TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+    nombre_cliente VARCHAR(100) NULL
+);
+CREATE INDEX IF NOT EXISTS usuario_id ON pedidos (usuario_id);
+
+-- menu_id puede apuntar a `productos` o a `menu`, por eso no tiene foreign key
+CREATE TABLE IF NOT EXISTS pedido_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pedido_id INTEGER NOT NULL REFERENCES pedidos(id) ON DELETE CASCADE,
+    menu_id INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL DEFAULT 1,
+    precio_unitario REAL NOT NULL,
+    notas TEXT NULL
+);
+CREATE INDEX IF NOT EXISTS pedido_id ON pedido_items (pedido_id);
+CREATE INDEX IF NOT EXISTS menu_id ON pedido_items (menu_id);
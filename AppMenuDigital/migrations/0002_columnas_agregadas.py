@@ -0,0 +1,24 @@
+# Columnas que Main.py agregaba con ALTER TABLE en cada request, para bases
+# creadas con versiones anteriores del esquema.
+
+COLUMNAS = [
+    ('menu', 'Imagen', 'VARCHAR(255) NULL'),
+    ('menu', 'Categoria', 'VARCHAR(50) NULL'),
+    ('menu', 'Descripcion', 'TEXT NULL'),
+    ('pedidos', 'mesa', 'VARCHAR(50) NULL'),
+    ('pedidos', 'nombre_cliente', 'VARCHAR(100) NULL'),
+    ('pedido_items', 'notas', 'TEXT NULL'),
+]
+
+
+def upgrade(cur):
+    for tabla, columna, definicion in COLUMNAS:
+        cur.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+            """,
+            (tabla, columna)
+        )
+        if cur.fetchone()[0] == 0:
+            cur.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
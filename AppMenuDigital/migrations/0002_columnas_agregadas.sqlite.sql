@@ -0,0 +1,2 @@
+-- Sin cambios en SQLite: 0001_esquema_inicial.sqlite.sql ya crea estas columnas
+-- (la migración de MySQL es para bases creadas con versiones viejas del esquema).
@@ -0,0 +1,16 @@
+# pedido_items.menu_id puede referenciar `productos`, así que se elimina la
+# foreign key restrictiva hacia `menu` si una instalación vieja la tiene.
+
+
+def upgrade(cur):
+    cur.execute(
+        """
+        SELECT CONSTRAINT_NAME
+        FROM information_schema.KEY_COLUMN_USAGE
+        WHERE TABLE_NAME = 'pedido_items'
+        AND TABLE_SCHEMA = DATABASE()
+        AND REFERENCED_TABLE_NAME = 'menu'
+        """
+    )
+    for (fk_name,) in cur.fetchall():
+        cur.execute(f"ALTER TABLE pedido_items DROP FOREIGN KEY `{fk_name}`")
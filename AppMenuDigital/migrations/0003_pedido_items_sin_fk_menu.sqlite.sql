@@ -0,0 +1 @@
+-- Sin cambios en SQLite: pedido_items nunca tuvo foreign key a menu.
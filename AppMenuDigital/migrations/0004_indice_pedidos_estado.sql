@@ -0,0 +1,2 @@
+-- Índice compuesto para listar pedidos por estado paginando por id (keyset)
+CREATE INDEX idx_pedidos_estado_id ON pedidos (estado, id);
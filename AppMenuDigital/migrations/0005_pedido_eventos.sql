@@ -0,0 +1,10 @@
+-- Secuencia de eventos de pedidos para el feed SSE del panel de mozos.
+-- Cada worker lee los eventos con id mayor al último que vio.
+CREATE TABLE IF NOT EXISTS pedido_eventos (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo VARCHAR(20) NOT NULL,
+    pedido_id INT NOT NULL,
+    datos TEXT NOT NULL,
+    creado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_pedido_eventos_creado (creado_en)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
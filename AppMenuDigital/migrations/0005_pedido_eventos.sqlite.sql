@@ -0,0 +1,10 @@
+-- Secuencia de eventos de pedidos para el feed SSE del panel de mozos.
+-- Cada worker lee los eventos con id mayor al último que vio.
+CREATE TABLE IF NOT EXISTS pedido_eventos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo VARCHAR(20) NOT NULL,
+    pedido_id INTEGER NOT NULL,
+    datos TEXT NOT NULL,
+    creado_en TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX IF NOT EXISTS idx_pedido_eventos_creado ON pedido_eventos (creado_en);
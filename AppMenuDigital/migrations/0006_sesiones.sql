@@ -0,0 +1,9 @@
+-- Sesiones del lado del servidor (carrito, usuario logueado, mensajes flash).
+-- expira es un timestamp Unix; el barrido borra las filas vencidas.
+CREATE TABLE IF NOT EXISTS sesiones (
+    id VARCHAR(64) PRIMARY KEY,
+    datos MEDIUMTEXT NOT NULL,
+    version INT NOT NULL DEFAULT 0,
+    expira BIGINT NOT NULL,
+    INDEX idx_sesiones_expira (expira)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
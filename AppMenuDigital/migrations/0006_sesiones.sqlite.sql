@@ -0,0 +1,9 @@
+-- Sesiones del lado del servidor (carrito, usuario logueado, mensajes flash).
+-- expira es un timestamp Unix; el barrido borra las filas vencidas.
+CREATE TABLE IF NOT EXISTS sesiones (
+    id VARCHAR(64) PRIMARY KEY,
+    datos TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    expira INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sesiones_expira ON sesiones (expira);
@@ -0,0 +1,10 @@
+-- Registro de cambios del catálogo: cada alta, edición o baja de productos,
+-- menu o categorías agrega una fila. El id es la versión del catálogo y las
+-- tablets piden solo lo que cambió desde la versión que tienen.
+CREATE TABLE IF NOT EXISTS catalogo_cambios (
+    version BIGINT AUTO_INCREMENT PRIMARY KEY,
+    entidad VARCHAR(20) NOT NULL,
+    entidad_id INT NOT NULL,
+    operacion VARCHAR(10) NOT NULL,
+    creado_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
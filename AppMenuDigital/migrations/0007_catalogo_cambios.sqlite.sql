@@ -0,0 +1,10 @@
+-- Registro de cambios del catálogo: cada alta, edición o baja de productos,
+-- menu o categorías agrega una fila. El id es la versión del catálogo y las
+-- tablets piden solo lo que cambió desde la versión que tienen.
+CREATE TABLE IF NOT EXISTS catalogo_cambios (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    entidad VARCHAR(20) NOT NULL,
+    entidad_id INTEGER NOT NULL,
+    operacion VARCHAR(10) NOT NULL,
+    creado_en TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
@@ -0,0 +1,50 @@
+-- Una sola tabla de catálogo: los items de `menu` (esquema viejo, los que
+-- cargaba el admin) pasan a `productos` y `menu` queda como vista con los
+-- nombres de columna viejos. SQL común a MySQL y SQLite.
+--
+-- Los items de menu conservan su id salvo que ya lo use un producto; esos
+-- reciben id = viejo + MAX(id). pedido_items.menu_id de un id repetido se
+-- resolvía siempre al producto, así que solo se reasigna al item de menu si
+-- el precio cobrado coincide con el del item de menu y no con el del producto.
+--
+-- En MySQL cada CREATE/DROP TABLE/VIEW hace commit implícito: si la migración
+-- falla a mitad de camino la unión queda aplicada a medias y schema_version no
+-- la registra. Antes de volver a correr db-upgrade hay que recuperar a mano
+-- (restaurar el backup, o terminar/deshacer los pasos que faltan).
+
+CREATE TABLE menu_ids_repetidos (
+    viejo INT PRIMARY KEY,
+    nuevo INT NULL
+);
+
+INSERT INTO menu_ids_repetidos (viejo)
+SELECT m.id FROM menu m JOIN productos p ON p.id = m.id;
+
+INSERT INTO productos (id, nombre, descripcion, precio, imagen, categoria)
+SELECT id, Nombre_Menu, Descripcion, Precio, Imagen, Categoria
+FROM menu
+WHERE id NOT IN (SELECT viejo FROM menu_ids_repetidos);
+
+UPDATE menu_ids_repetidos SET nuevo = viejo + (SELECT MAX(id) FROM productos);
+
+INSERT INTO productos (id, nombre, descripcion, precio, imagen, categoria)
+SELECT r.nuevo, m.Nombre_Menu, m.Descripcion, m.Precio, m.Imagen, m.Categoria
+FROM menu m JOIN menu_ids_repetidos r ON r.viejo = m.id;
+
+UPDATE pedido_items
+SET menu_id = (SELECT nuevo FROM menu_ids_repetidos WHERE viejo = pedido_items.menu_id)
+WHERE menu_id IN (SELECT viejo FROM menu_ids_repetidos)
+AND precio_unitario = (SELECT Precio FROM menu WHERE id = pedido_items.menu_id)
+AND precio_unitario <> (SELECT precio FROM productos WHERE id = pedido_items.menu_id);
+
+DROP TABLE menu_ids_repetidos;
+
+DROP TABLE menu;
+
+CREATE VIEW menu AS
+SELECT id, nombre AS Nombre_Menu, precio AS Precio, categoria AS Categoria,
+       imagen AS Imagen, descripcion AS Descripcion
+FROM productos;
+
+-- Los ids de la carta cambiaron: las tablets tienen que volver a bajarla
+INSERT INTO catalogo_cambios (entidad, entidad_id, operacion) VALUES ('catalogo', 0, 'resync');
@@ -0,0 +1,4 @@
+-- Búsqueda de productos por nombre: items temporales del carrito al hacer el
+-- pedido, control de nombre repetido al crear productos y la vista `menu`
+-- (Nombre_Menu). Sin este índice cada una recorría la tabla completa.
+CREATE INDEX idx_productos_nombre ON productos (nombre);
@@ -0,0 +1,15 @@
+-- La versión del catálogo pasa a un contador de una sola fila. Con el
+-- AUTO_INCREMENT de catalogo_cambios la versión se asignaba al insertar pero
+-- se veía al confirmar: la 11 podía confirmarse antes que la 10, y una tablet
+-- que ya había pedido cambios desde la 11 nunca recibía la 10. El UPDATE del
+-- contador deja la fila bloqueada hasta el commit, así las versiones quedan en
+-- el orden en que se confirman las transacciones.
+CREATE TABLE IF NOT EXISTS catalogo_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO catalogo_version (id, version)
+SELECT 1, COALESCE(MAX(version), 0) FROM catalogo_cambios;
+
+ALTER TABLE catalogo_cambios MODIFY version BIGINT NOT NULL;
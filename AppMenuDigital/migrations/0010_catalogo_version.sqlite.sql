@@ -0,0 +1,11 @@
+-- La versión del catálogo pasa a un contador de una sola fila, incrementado en
+-- la misma transacción que anota el cambio (ver 0010_catalogo_version.sql).
+-- catalogo_cambios.version conserva el AUTOINCREMENT, pero ahora se inserta
+-- siempre con la versión del contador.
+CREATE TABLE IF NOT EXISTS catalogo_version (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+INSERT INTO catalogo_version (id, version)
+SELECT 1, COALESCE(MAX(version), 0) FROM catalogo_cambios;
@@ -0,0 +1,145 @@
+import importlib.util
+import os
+import re
+
+# Migraciones de esquema versionadas.
+# Cada archivo NNNN_nombre.sql (sentencias separadas por ';') o NNNN_nombre.py
+# (con una función upgrade(cur)) se aplica una sola vez, en orden, y queda
+# registrado en la tabla schema_version. Se ejecutan con `flask db-upgrade`.
+# Una variante NNNN_nombre.<dialecto>.sql (p. ej. .sqlite.sql) reemplaza a la
+# migración de esa versión cuando la base es de ese motor.
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+_FILENAME_RE = re.compile(r'^(\d{4})_(\w+)\.(sql|py)$')
+_VARIANTE_RE = re.compile(r'^(\d{4})_(\w+)\.(\w+)\.sql$')
+_LOCK_NAME = 'menudigital_schema_version'
+
+_VERSION_TABLE = {
+    'mysql': """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            nombre VARCHAR(150) NOT NULL,
+            aplicada_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """,
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            nombre VARCHAR(150) NOT NULL,
+            aplicada_en TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+        )
+        """,
+}
+
+
+def dialecto_de(conn):
+    """'mysql' para conexiones pymysql, o el dialecto que declare la conexión"""
+    return getattr(conn, 'dialecto', 'mysql')
+
+
+def discover(dialecto='mysql'):
+    """Lista ordenada de migraciones disponibles: (version, nombre, ruta)"""
+    found = {}
+    variantes = {}
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = _FILENAME_RE.match(filename)
+        if match:
+            version = int(match.group(1))
+            if version in found:
+                raise RuntimeError('Hay migraciones con el mismo número de versión')
+            found[version] = (version, match.group(2), os.path.join(MIGRATIONS_DIR, filename))
+            continue
+        match = _VARIANTE_RE.match(filename)
+        if match and match.group(3) == dialecto:
+            version = int(match.group(1))
+            variantes[version] = (version, match.group(2), os.path.join(MIGRATIONS_DIR, filename))
+    found.update(variantes)
+    found = sorted(found.values())
+    if dialecto != 'mysql':
+        # Las migraciones .py usan information_schema: necesitan su variante
+        sin_variante = [f"{v:04d}_{n}" for v, n, ruta in found if ruta.endswith('.py')]
+        if sin_variante:
+            raise RuntimeError(f"Migraciones sin variante {dialecto}: {', '.join(sin_variante)}")
+    versions = [m[0] for m in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError('Hay migraciones con el mismo número de versión')
+    return found
+
+
+def _split_sql(script):
+    # Quitar comentarios de línea y separar por ';' al final de línea
+    lines = [l for l in script.splitlines() if not l.strip().startswith('--')]
+    statements = re.split(r';\s*(?:\n|$)', '\n'.join(lines))
+    return [s.strip() for s in statements if s.strip()]
+
+
+def _run_python(path, cur):
+    spec = importlib.util.spec_from_file_location(f'_migracion_{os.path.basename(path)[:-3]}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(cur)
+
+
+def ensure_version_table(cur, dialecto='mysql'):
+    cur.execute(_VERSION_TABLE[dialecto])
+
+
+def applied_versions(cur):
+    cur.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cur.fetchall()}
+
+
+def pending(conn):
+    """Migraciones todavía no aplicadas en la base de datos"""
+    dialecto = dialecto_de(conn)
+    cur = conn.cursor()
+    try:
+        ensure_version_table(cur, dialecto)
+        done = applied_versions(cur)
+    finally:
+        cur.close()
+    return [m for m in discover(dialecto) if m[0] not in done]
+
+
+def upgrade(conn, log=print):
+    """Aplica en orden las migraciones pendientes. Devuelve las versiones aplicadas."""
+    dialecto = dialecto_de(conn)
+    # En MySQL, evitar que dos procesos migren a la vez (p. ej. dos deploys
+    # simultáneos); una base SQLite es de un solo servidor
+    bloquear = dialecto == 'mysql'
+    cur = conn.cursor()
+    applied = []
+    try:
+        if bloquear:
+            cur.execute("SELECT GET_LOCK(%s, 60)", (_LOCK_NAME,))
+            if not cur.fetchone()[0]:
+                raise RuntimeError('No se pudo obtener el lock de migraciones')
+        try:
+            ensure_version_table(cur, dialecto)
+            done = applied_versions(cur)
+            for version, nombre, path in discover(dialecto):
+                if version in done:
+                    continue
+                log(f"[db-upgrade] Aplicando {version:04d}_{nombre}")
+                if path.endswith('.sql'):
+                    with open(path, encoding='utf-8') as fh:
+                        for statement in _split_sql(fh.read()):
+                            cur.execute(statement)
+                else:
+                    _run_python(path, cur)
+                cur.execute(
+                    "INSERT INTO schema_version (version, nombre) VALUES (%s, %s)",
+                    (version, nombre)
+                )
+                conn.commit()
+                applied.append(version)
+        finally:
+            if bloquear:
+                cur.execute("SELECT RELEASE_LOCK(%s)", (_LOCK_NAME,))
+                cur.fetchone()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return applied
@@ -0,0 +1,222 @@
+import datetime
+import logging
+
+try:
+    from .carrito import cotizar
+except ImportError:
+    from carrito import cotizar
+
+log = logging.getLogger(__name__)
+
+ESTADOS = ['pendiente', 'en_preparacion', 'listo', 'entregado', 'cancelado']
+# Estados que se muestran por defecto en los tableros de pedidos
+ESTADOS_ACTIVOS = ['pendiente', 'en_preparacion', 'listo']
+
+# Transiciones permitidas: pendiente → en_preparacion → listo → entregado,
+# y cancelado desde cualquier estado no final
+TRANSICIONES = {
+    'pendiente': ('en_preparacion', 'cancelado'),
+    'en_preparacion': ('listo', 'cancelado'),
+    'listo': ('entregado', 'cancelado'),
+    'entregado': (),
+    'cancelado': (),
+}
+
+CLIENTE_MOZO = "COALESCE(p.nombre_cliente, u.nombre, 'Cliente')"
+CLIENTE_ADMIN = "COALESCE(u.nombre, '')"
+
+
+def listar_pedidos(cur, estados=None, desde=None, hasta=None, antes_de=None, limite=50, cliente_sql=CLIENTE_MOZO):
+    """Página de pedidos filtrada por estado y fecha, paginada por id (keyset).
+
+    desde y hasta son fechas (date) inclusivas.
+    Devuelve (filas, siguiente) donde filas son (id, mesa, cliente, estado, creado_en)
+    y siguiente es el id a pasar como antes_de para la próxima página, o None.
+    Usa el índice compuesto pedidos(estado, id).
+    """
+    estados = list(estados or ESTADOS_ACTIVOS)
+    condiciones = [f"p.estado IN ({', '.join(['%s'] * len(estados))})"]
+    params = list(estados)
+    if desde is not None:
+        condiciones.append("p.creado_en >= %s")
+        params.append(desde)
+    if hasta is not None:
+        condiciones.append("p.creado_en < %s")
+        params.append(hasta + datetime.timedelta(days=1))
+    if antes_de is not None:
+        condiciones.append("p.id < %s")
+        params.append(antes_de)
+    params.append(limite + 1)
+    cur.execute(
+        f"""
+        SELECT p.id, COALESCE(p.mesa, '') AS mesa, {cliente_sql} AS cliente,
+               p.estado, p.creado_en
+        FROM pedidos p
+        LEFT JOIN usuarios u ON p.usuario_id = u.id
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY p.id DESC
+        LIMIT %s
+        """,
+        tuple(params)
+    )
+    filas = cur.fetchall()
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = filas[-1][0]
+    return filas, siguiente
+
+
+def transicion_valida(anterior, nuevo):
+    return nuevo in TRANSICIONES.get(anterior, ())
+
+
+def cambiar_estado(cur, pedido_id, anterior, nuevo):
+    """Cambia el estado solo si el pedido sigue en `anterior` (concurrencia optimista).
+
+    Devuelve None si se aplicó; si no, el estado actual del pedido, o '' si no existe.
+    """
+    cur.execute(
+        "UPDATE pedidos SET estado=%s WHERE id=%s AND estado=%s",
+        (nuevo, pedido_id, anterior)
+    )
+    if cur.rowcount:
+        return None
+    # Solo en el camino de conflicto: averiguar por qué no se actualizó
+    cur.execute("SELECT estado FROM pedidos WHERE id=%s", (pedido_id,))
+    row = cur.fetchone()
+    return row[0] if row else ''
+
+
+def datos_pedido(cur, pedido_id):
+    """(estado, nombre_cliente, mesa) del pedido, o None si no existe"""
+    cur.execute("SELECT estado, nombre_cliente, mesa FROM pedidos WHERE id = %s", (pedido_id,))
+    return cur.fetchone()
+
+
+def eliminar_pedido(cur, pedido_id):
+    """Borra el pedido y sus items. Devuelve las filas de pedidos borradas."""
+    # Los items primero, por si la base no tiene ON DELETE CASCADE
+    cur.execute("DELETE FROM pedido_items WHERE pedido_id = %s", (pedido_id,))
+    cur.execute("DELETE FROM pedidos WHERE id = %s", (pedido_id,))
+    return cur.rowcount
+
+
+def contar_por_estado(cur):
+    """{estado: cantidad} de todos los pedidos"""
+    cur.execute("SELECT estado, COUNT(*) FROM pedidos GROUP BY estado")
+    return dict(cur.fetchall())
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _en(columna, valores, params):
+    params.extend(valores)
+    return f"{columna} IN ({', '.join(['%s'] * len(valores))})"
+
+
+def resolver_productos(cur, ids, nombres):
+    """Precios vigentes de los productos del carrito, en una sola consulta.
+
+    Devuelve (por_id, por_nombre) con dicts {'id', 'nombre', 'precio'}; si hay
+    nombres repetidos gana el producto más nuevo, igual que en el catálogo.
+    """
+    por_id, por_nombre = {}, {}
+    if not ids and not nombres:
+        return por_id, por_nombre
+    buscados_id, buscados_nombre = set(ids), set(nombres)
+    params = []
+    condiciones = []
+    if ids:
+        condiciones.append(_en('id', ids, params))
+    if nombres:
+        condiciones.append(_en('nombre', nombres, params))
+    cur.execute(
+        f"SELECT id, nombre, precio FROM productos WHERE {' OR '.join(condiciones)} ORDER BY id DESC",
+        tuple(params)
+    )
+    for row in cur.fetchall():
+        producto = {'id': row[0], 'nombre': row[1] or 'Sin nombre', 'precio': float(row[2]) if row[2] else 0.0}
+        if row[0] in buscados_id:
+            por_id.setdefault(row[0], producto)
+        if row[1] in buscados_nombre:
+            por_nombre.setdefault(row[1], producto)
+    return por_id, por_nombre
+
+
+def items_del_carrito(cur, cart):
+    """Convierte el carrito de la sesión en items de pedido con precios de la base.
+
+    Usa la misma cotización que la vista del carrito, pero con precios leídos en
+    bloque de MySQL; las entradas que no corresponden a ningún producto se descartan.
+    """
+    ids, nombres = set(), set()
+    for clave, entry in cart.items():
+        if entry.get('temp'):
+            nombres.add(entry.get('nombre', 'Producto'))
+        elif _entero(clave) is not None:
+            ids.add(_entero(clave))
+    por_id, por_nombre = resolver_productos(cur, sorted(ids), sorted(nombres))
+    lineas, _ = cotizar(cart, lambda clave: por_id.get(_entero(clave)), por_nombre.get)
+    items = []
+    for linea in lineas:
+        if linea['menu_id'] is None:
+            log.warning("Producto %s no encontrado - se omite", linea['id'])
+            continue
+        items.append(linea)
+    return items
+
+
+def crear_pedido(cur, usuario_id, mesa, nombre_cliente, items):
+    """Inserta el pedido y todos sus items sin hacer commit. Devuelve el id del pedido."""
+    cur.execute(
+        "INSERT INTO pedidos (usuario_id, estado, mesa, nombre_cliente) VALUES (%s, %s, %s, %s)",
+        (usuario_id, 'pendiente', mesa, nombre_cliente)
+    )
+    pedido_id = cur.lastrowid
+    cur.executemany(
+        "INSERT INTO pedido_items (pedido_id, menu_id, cantidad, precio_unitario, notas) VALUES (%s, %s, %s, %s, %s)",
+        [(pedido_id, it['menu_id'], it['cantidad'], it['precio'], it['notas']) for it in items]
+    )
+    return pedido_id
+
+
+def cargar_items(cur, pedido_ids):
+    """Items de varios pedidos en una sola consulta, agrupados por pedido_id"""
+    items_por_pedido = {pid: [] for pid in pedido_ids}
+    if not pedido_ids:
+        return items_por_pedido
+    placeholders = ', '.join(['%s'] * len(pedido_ids))
+    cur.execute(
+        f"""
+        SELECT pi.pedido_id, pi.cantidad, pi.precio_unitario,
+               pr.nombre AS nombre_producto,
+               COALESCE(pi.notas, '') AS notas, pi.menu_id
+        FROM pedido_items pi
+        LEFT JOIN productos pr ON pi.menu_id = pr.id
+        WHERE pi.pedido_id IN ({placeholders})
+        ORDER BY pi.pedido_id, pi.id
+        """,
+        tuple(pedido_ids)
+    )
+    for pedido_id, cantidad, precio, nombre, notas, menu_id in cur.fetchall():
+        # Misma forma que consumen los templates: (cantidad, precio_unitario, nombre, notas)
+        items_por_pedido[pedido_id].append((cantidad, precio, nombre or f"Producto ID:{menu_id}", notas))
+    return items_por_pedido
+
+
+def armar_tablero(cur, base_rows):
+    """Recibe filas (id, mesa, cliente, estado, creado_en) y devuelve
+    (id, mesa, cliente, estado, creado_en, items, total) para cada pedido"""
+    items_por_pedido = cargar_items(cur, [row[0] for row in base_rows])
+    pedidos = []
+    for row in base_rows:
+        items = items_por_pedido.get(row[0], [])
+        total = sum((float(it[0]) * float(it[1]) for it in items), 0.0)
+        pedidos.append((row[0], row[1], row[2], row[3], row[4], items, total))
+    return pedidos
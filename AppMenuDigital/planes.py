@@ -0,0 +1,145 @@
+import datetime
+
+try:
+    from . import repositorio
+    from .eventos import leer_eventos, ultimo_evento, purgar_eventos
+    from .pedidos import (ESTADOS, listar_pedidos, cambiar_estado, datos_pedido,
+                          eliminar_pedido, contar_por_estado, resolver_productos, cargar_items)
+    from .sesiones import MySQLSessionStore
+except ImportError:
+    import repositorio
+    from eventos import leer_eventos, ultimo_evento, purgar_eventos
+    from pedidos import (ESTADOS, listar_pedidos, cambiar_estado, datos_pedido,
+                         eliminar_pedido, contar_por_estado, resolver_productos, cargar_items)
+    from sesiones import MySQLSessionStore
+
+# Planes de ejecución de las consultas de los requests (flask db-explain).
+# Cada consulta se obtiene llamando a la función real del repositorio con un
+# cursor que antes de ejecutar cada SELECT/UPDATE/DELETE pide su EXPLAIN; todo
+# corre en una transacción que se descarta, y las modificaciones usan el id 0,
+# que no existe. Falla si alguna recorre una tabla completa.
+#
+# Quedan afuera a propósito las que leen toda la tabla: la recarga del
+# catálogo (listar_productos) y los contadores del panel de admin.
+
+CONSULTAS = [
+    ('login: usuario por email', lambda cur: repositorio.usuario_por_email(cur, 'nadie@menudigital.local')),
+    ('login: mozo por email', lambda cur: repositorio.mozo_por_email(cur, 'nadie@menudigital.local')),
+    ('perfil: usuario por id', lambda cur: repositorio.usuario_por_id(cur, 0)),
+    ('producto por id', lambda cur: repositorio.producto(cur, 0)),
+    ('productos por id', lambda cur: repositorio.productos_por_id(cur, [0, 1, 2])),
+    ('producto por nombre', lambda cur: repositorio.producto_por_nombre(cur, 'Sin nombre')),
+    ('imagen del producto', lambda cur: repositorio.imagen_producto(cur, 0)),
+    ('editar producto', lambda cur: repositorio.actualizar_producto(cur, 0, 'x', '', 1, '', '')),
+    ('borrar producto', lambda cur: repositorio.eliminar_producto(cur, 0)),
+    ('precios del carrito', lambda cur: resolver_productos(cur, [0, 1], ['Sin nombre'])),
+    ('versión del catálogo', lambda cur: repositorio.version_catalogo(cur)),
+    ('cambios del catálogo', lambda cur: repositorio.cambios_desde(cur, 0)),
+    ('pedidos activos', lambda cur: listar_pedidos(cur)),
+    ('pedidos por fecha', lambda cur: listar_pedidos(cur, estados=ESTADOS, desde=datetime.date.today(), hasta=datetime.date.today())),
+    ('pedidos, página siguiente', lambda cur: listar_pedidos(cur, antes_de=1000)),
+    ('items de pedidos', lambda cur: cargar_items(cur, [0, 1, 2])),
+    ('datos del pedido', lambda cur: datos_pedido(cur, 0)),
+    ('cambiar estado', lambda cur: cambiar_estado(cur, 0, 'pendiente', 'en_preparacion')),
+    ('borrar pedido', lambda cur: eliminar_pedido(cur, 0)),
+    ('pedidos por estado', lambda cur: contar_por_estado(cur)),
+    ('feed: eventos nuevos', lambda cur: leer_eventos(cur, 0)),
+    ('feed: último evento', lambda cur: ultimo_evento(cur)),
+    ('feed: purga de eventos', lambda cur: purgar_eventos(cur, datetime.datetime(2000, 1, 1))),
+]
+
+# Las sesiones usan conexiones propias del pool: se les presta la de la revisión
+CONSULTAS_SESIONES = [
+    ('sesión: cargar', lambda store: store.cargar('0')),
+    ('sesión: borrar', lambda store: store.borrar('0')),
+    ('sesión: barrido', lambda store: store.purgar()),
+]
+
+_EXPLICABLES = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def recorridos_completos(plan, dialecto):
+    """Tablas que el plan recorre completas (sin índice)"""
+    if dialecto == 'sqlite':
+        # Filas de EXPLAIN QUERY PLAN: (id, parent, notused, detail). Un
+        # 'SCAN t USING COVERING INDEX i' recorre el índice, no la tabla, y
+        # 'SCAN CONSTANT ROW' es un SELECT sin FROM. Hasta SQLite 3.36 decía 'SCAN TABLE t'.
+        tablas = []
+        for fila in plan:
+            detalle = fila[-1]
+            if detalle.startswith('SCAN ') and ' USING ' not in detalle and detalle != 'SCAN CONSTANT ROW':
+                palabras = detalle.split()
+                tablas.append(palabras[2] if palabras[1] == 'TABLE' else palabras[1])
+        return tablas
+    # MySQL/MariaDB: type = ALL es un full table scan
+    return [fila['table'] for fila in plan if fila.get('type') == 'ALL']
+
+
+class _CursorExplicado:
+    """Cursor que registra el plan de cada consulta antes de ejecutarla"""
+
+    def __init__(self, cursor, dialecto, registro):
+        self._cursor = cursor
+        self._dialecto = dialecto
+        self._registro = registro
+
+    def _explicar(self, sql, params):
+        if self._dialecto == 'sqlite':
+            self._cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [tuple(fila) for fila in self._cursor.fetchall()]
+        self._cursor.execute(f"EXPLAIN {sql}", params)
+        columnas = [d[0].lower() for d in self._cursor.description]
+        return [dict(zip(columnas, fila)) for fila in self._cursor.fetchall()]
+
+    def execute(self, sql, params=None):
+        if sql.lstrip().upper().startswith(_EXPLICABLES):
+            self._registro.append((' '.join(sql.split()), self._explicar(sql, params)))
+        return self._cursor.execute(sql, params)
+
+    def close(self):
+        # El cursor es de revisar(), que lo cierra al final
+        pass
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class _PoolPrestado:
+    """Pool de una sola conexión para el store de sesiones; commit no hace nada"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def acquire(self):
+        return self
+
+    def release(self, conn):
+        pass
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        pass
+
+
+def revisar(conn, dialecto):
+    """[(nombre, sql, plan, tablas_recorridas)] de cada consulta de CONSULTAS y CONSULTAS_SESIONES"""
+    resultados = []
+    cur = conn.cursor()
+
+    def registrar(nombre, llamar, envolver=lambda cursor: cursor):
+        registro = []
+        llamar(envolver(_CursorExplicado(cur, dialecto, registro)))
+        for sql, plan in registro:
+            resultados.append((nombre, sql, plan, recorridos_completos(plan, dialecto)))
+
+    try:
+        for nombre, llamar in CONSULTAS:
+            registrar(nombre, llamar)
+        for nombre, llamar in CONSULTAS_SESIONES:
+            registrar(nombre, llamar, lambda cursor: MySQLSessionStore(_PoolPrestado(cursor), dialecto))
+    finally:
+        conn.rollback()
+        cur.close()
+    return resultados
@@ -0,0 +1,101 @@
+import atexit
+import copy
+import datetime
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import has_request_context, request
+
+# Logging de la aplicación.
+# Los registros se encolan en el hilo del request y un hilo aparte (QueueListener)
+# los formatea y escribe, así una salida lenta (journal, disco) no frena los requests.
+
+# Atributos estándar de LogRecord; el resto son campos pasados con extra={...}
+_ESTANDAR = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class _ContextoRequest(logging.Filter):
+    """Agrega método, ruta y endpoint del request (se ejecuta en el hilo del request)"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.metodo = request.method
+            record.ruta = request.path
+            record.endpoint = request.endpoint
+        return True
+
+
+class _ColaHandler(QueueHandler):
+    def prepare(self, record):
+        # Igual que QueueHandler.prepare pero sin mezclar el traceback con el mensaje
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+
+class FormatoJSON(logging.Formatter):
+    """Un objeto JSON por línea"""
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ESTANDAR and not clave.startswith('_'):
+                datos[clave] = valor
+        if record.exc_text:
+            datos['excepcion'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def configurar_logging(nivel='INFO', formato='json', archivo=None, niveles=None):
+    """Configura el logger raíz con una cola y un hilo escritor.
+
+    `niveles` permite ajustar loggers puntuales, p. ej. {'werkzeug': 'WARNING'}.
+    Se puede llamar más de una vez: reemplaza la configuración anterior.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    salida = logging.FileHandler(archivo, encoding='utf-8') if archivo else logging.StreamHandler(sys.stdout)
+    if formato == 'json':
+        salida.setFormatter(FormatoJSON())
+    else:
+        salida.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    cola = queue.SimpleQueue()
+    handler = _ColaHandler(cola)
+    handler.addFilter(_ContextoRequest())
+
+    raiz = logging.getLogger()
+    for anterior in [h for h in raiz.handlers if isinstance(h, _ColaHandler)]:
+        raiz.removeHandler(anterior)
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+    for nombre, nivel_logger in (niveles or {}).items():
+        logging.getLogger(nombre).setLevel(nivel_logger)
+
+    _listener = QueueListener(cola, salida)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def _detener():
+    # Vacía la cola antes de salir para no perder los últimos registros
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,221 @@
+# Acceso a datos de usuarios, mozos, productos y categorías.
+# Cada función recibe el cursor del llamador (y con él su transacción), igual
+# que pedidos.py y eventos.py. El SQL es el común a MySQL y SQLite, con
+# placeholders %s: los drivers de db.py lo adaptan a cada motor.
+#
+# Toda modificación de productos o categorías queda además en catalogo_cambios,
+# en la misma transacción, con la versión del catálogo que asigna el contador
+# catalogo_version.
+
+# Filas del registro de cambios que se conservan; un cliente más atrasado
+# que eso tiene que volver a bajar la carta completa
+CAMBIOS_CONSERVADOS = 1000
+
+
+# ===== Registro de cambios del catálogo =====
+
+def registrar_cambio(cur, entidad, entidad_id, operacion):
+    """Anota un 'upsert' o 'delete' de una entidad ('producto' o 'categoria')"""
+    # El UPDATE bloquea la fila del contador hasta el commit: otra transacción
+    # recibe la versión siguiente recién cuando esta se confirmó
+    cur.execute("UPDATE catalogo_version SET version = version + 1 WHERE id = 1")
+    cur.execute("SELECT version FROM catalogo_version WHERE id = 1")
+    version = cur.fetchone()[0]
+    cur.execute(
+        "INSERT INTO catalogo_cambios (version, entidad, entidad_id, operacion) VALUES (%s, %s, %s, %s)",
+        (version, entidad, entidad_id, operacion)
+    )
+    if version > CAMBIOS_CONSERVADOS:
+        cur.execute("DELETE FROM catalogo_cambios WHERE version <= %s", (version - CAMBIOS_CONSERVADOS,))
+    return version
+
+
+def version_catalogo(cur):
+    """Versión actual del catálogo (0 si nunca cambió)"""
+    cur.execute("SELECT version FROM catalogo_version WHERE id = 1")
+    return cur.fetchone()[0]
+
+
+def cambios_desde(cur, desde):
+    """(version_actual, completo, cambios) donde cambios es {(entidad, id): operacion}
+    con la última operación de cada entidad posterior a `desde`.
+
+    completo es False si el registro ya no tiene todos los cambios desde esa
+    versión (se purgaron, o la base es otra): el cliente debe recargar todo.
+    """
+    # La versión mínima que queda en el registro y la actual del contador
+    cur.execute("SELECT (SELECT MIN(version) FROM catalogo_cambios), (SELECT version FROM catalogo_version WHERE id = 1)")
+    minima, maxima = cur.fetchone()
+    if desde > maxima or (minima is not None and desde < minima - 1):
+        return maxima, False, {}
+    cambios = {}
+    if desde < maxima:
+        cur.execute(
+            "SELECT entidad, entidad_id, operacion FROM catalogo_cambios WHERE version > %s ORDER BY version",
+            (desde,)
+        )
+        for entidad, entidad_id, operacion in cur.fetchall():
+            cambios[(entidad, entidad_id)] = operacion
+    return maxima, True, cambios
+
+
+# ===== Usuarios =====
+
+def usuario_por_email(cur, email):
+    """(id, nombre, email, password) o None"""
+    cur.execute("SELECT id, nombre, email, password FROM usuarios WHERE email = %s LIMIT 1", (email,))
+    return cur.fetchone()
+
+
+def usuario_por_id(cur, usuario_id):
+    """(id, nombre, email, password, fecha_registro) o None"""
+    cur.execute(
+        "SELECT id, nombre, email, password, fecha_registro FROM usuarios WHERE id = %s",
+        (usuario_id,)
+    )
+    return cur.fetchone()
+
+
+def crear_usuario(cur, nombre, email, password):
+    cur.execute("INSERT INTO usuarios (nombre, email, password) VALUES (%s, %s, %s)", (nombre, email, password))
+    return cur.lastrowid
+
+
+# ===== Mozos =====
+
+def mozo_por_email(cur, email):
+    """(id, activo) o None"""
+    cur.execute("SELECT id, activo FROM mozos WHERE email = %s", (email,))
+    return cur.fetchone()
+
+
+def crear_mozo(cur, nombre, email, telefono=None, activo=1):
+    cur.execute(
+        "INSERT INTO mozos (nombre, email, telefono, activo) VALUES (%s, %s, %s, %s)",
+        (nombre, email, telefono, activo)
+    )
+    return cur.lastrowid
+
+
+def actualizar_mozo(cur, mozo_id, nombre, email, telefono, activo):
+    cur.execute(
+        "UPDATE mozos SET nombre=%s, email=%s, telefono=%s, activo=%s WHERE id=%s",
+        (nombre, email, telefono, activo, mozo_id)
+    )
+    return cur.rowcount
+
+
+def eliminar_mozo(cur, mozo_id):
+    cur.execute("DELETE FROM mozos WHERE id=%s", (mozo_id,))
+    return cur.rowcount
+
+
+# ===== Productos =====
+# `productos` es la única tabla del catálogo; `menu` es una vista de solo
+# lectura con los nombres de columna viejos (migración 0008).
+
+def listar_productos(cur):
+    """(id, nombre, precio, categoria, imagen, descripcion) con '' en lugar de NULL, los más nuevos primero"""
+    cur.execute(
+        """
+        SELECT id, nombre, precio, COALESCE(categoria, ''), COALESCE(imagen, ''), COALESCE(descripcion, '')
+        FROM productos ORDER BY id DESC
+        """
+    )
+    return cur.fetchall()
+
+
+def contar_productos(cur):
+    cur.execute("SELECT COUNT(*) FROM productos")
+    return cur.fetchone()[0] or 0
+
+
+def producto(cur, producto_id):
+    """(id, nombre, precio, categoria, imagen, descripcion) o None"""
+    cur.execute(
+        "SELECT id, nombre, precio, categoria, imagen, descripcion FROM productos WHERE id = %s",
+        (producto_id,)
+    )
+    return cur.fetchone()
+
+
+def productos_por_id(cur, ids):
+    """Filas (id, nombre, precio, categoria, imagen, descripcion) de los ids dados"""
+    if not ids:
+        return []
+    cur.execute(
+        f"SELECT id, nombre, precio, categoria, imagen, descripcion FROM productos WHERE id IN ({', '.join(['%s'] * len(ids))})",
+        tuple(ids)
+    )
+    return cur.fetchall()
+
+
+def producto_por_nombre(cur, nombre):
+    cur.execute("SELECT id FROM productos WHERE nombre = %s", (nombre,))
+    return cur.fetchone()
+
+
+def imagen_producto(cur, producto_id):
+    """Imagen del producto, o None si no existe"""
+    cur.execute("SELECT imagen FROM productos WHERE id = %s", (producto_id,))
+    fila = cur.fetchone()
+    return fila if fila is None else fila[0]
+
+
+def crear_producto(cur, nombre, descripcion, precio, imagen, categoria):
+    cur.execute(
+        "INSERT INTO productos (nombre, descripcion, precio, imagen, categoria) VALUES (%s, %s, %s, %s, %s)",
+        (nombre, descripcion, precio, imagen, categoria)
+    )
+    producto_id = cur.lastrowid
+    registrar_cambio(cur, 'producto', producto_id, 'upsert')
+    return producto_id
+
+
+def actualizar_producto(cur, producto_id, nombre, descripcion, precio, imagen, categoria):
+    cur.execute(
+        """
+        UPDATE productos
+        SET nombre = %s, descripcion = %s, precio = %s, imagen = %s, categoria = %s
+        WHERE id = %s
+        """,
+        (nombre, descripcion, precio, imagen, categoria, producto_id)
+    )
+    filas = cur.rowcount
+    if filas:
+        registrar_cambio(cur, 'producto', producto_id, 'upsert')
+    return filas
+
+
+def eliminar_producto(cur, producto_id):
+    cur.execute("DELETE FROM productos WHERE id = %s", (producto_id,))
+    filas = cur.rowcount
+    if filas:
+        registrar_cambio(cur, 'producto', producto_id, 'delete')
+    return filas
+
+
+# ===== Categorías =====
+
+def crear_categoria(cur, nombre, orden):
+    # Esquema actual: columnas `Nombre`, `orden`
+    cur.execute("INSERT INTO categorias (Nombre, orden) VALUES (%s, %s)", (nombre, orden or ''))
+    categoria_id = cur.lastrowid
+    registrar_cambio(cur, 'categoria', categoria_id, 'upsert')
+    return categoria_id
+
+
+def actualizar_categoria(cur, categoria_id, nombre, orden):
+    cur.execute("UPDATE categorias SET Nombre=%s, orden=%s WHERE id=%s", (nombre, orden or '', categoria_id))
+    filas = cur.rowcount
+    if filas:
+        registrar_cambio(cur, 'categoria', categoria_id, 'upsert')
+    return filas
+
+
+def eliminar_categoria(cur, categoria_id):
+    cur.execute("DELETE FROM categorias WHERE id=%s", (categoria_id,))
+    filas = cur.rowcount
+    if filas:
+        registrar_cambio(cur, 'categoria', categoria_id, 'delete')
+    return filas
@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+# Sesiones del lado del servidor: la cookie solo lleva "<sid>.<version>" y los
+# datos (carrito, usuario, mensajes flash) viven en la base de datos o en disco.
+#
+# La versión se incrementa en cada guardado y viaja en la cookie, así la caché
+# local sabe sin consultar la base si su copia sigue siendo la última.
+
+log = logging.getLogger(__name__)
+
+_SID_RE = re.compile(r'^[A-Za-z0-9_-]{32,64}$')
+
+
+class SesionServidor(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, version=0, expira=None, nueva=False):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.version = version
+        self.expira = expira
+        self.new = nueva
+        self.modified = False
+        self.accessed = False
+        self.sid_anterior = None
+
+    # Leer la sesión también cuenta como acceso: la respuesta depende de la cookie
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+    def rotar(self):
+        """Pasa los datos a un sid nuevo; el anterior se borra al guardar"""
+        if not self.new and self.sid_anterior is None:
+            self.sid_anterior = self.sid
+        self.sid = secrets.token_urlsafe(24)
+        self.version = 0
+        self.expira = None
+        self.modified = True
+        self.accessed = True
+
+
+def rotar_sid(sesion):
+    """Nuevo id de sesión al cambiar de usuario (login/logout), contra la fijación de sesión.
+
+    Con el backend `cookie` no hay id que rotar.
+    """
+    if isinstance(sesion, SesionServidor):
+        sesion.rotar()
+
+
+_UPSERT = {
+    'mysql': """
+        INSERT INTO sesiones (id, datos, version, expira) VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE datos = VALUES(datos), version = VALUES(version), expira = VALUES(expira)
+        """,
+    'sqlite': """
+        INSERT INTO sesiones (id, datos, version, expira) VALUES (%s, %s, %s, %s)
+        ON CONFLICT (id) DO UPDATE SET datos = excluded.datos, version = excluded.version, expira = excluded.expira
+        """,
+}
+
+
+class MySQLSessionStore:
+    """Sesiones en la tabla `sesiones` (MySQL o SQLite), con un pool de conexiones propio"""
+
+    def __init__(self, pool, dialecto='mysql'):
+        self.pool = pool
+        self._upsert = _UPSERT[dialecto]
+
+    def _ejecutar(self, sql, params, commit=False):
+        conn = self.pool.acquire()
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, params)
+            fila = None if commit else cur.fetchone()
+            if commit:
+                conn.commit()
+            cur.close()
+            return fila
+        finally:
+            self.pool.release(conn)
+
+    def cargar(self, sid, version=None):
+        """(datos, version, expira) o None"""
+        return self._ejecutar("SELECT datos, version, expira FROM sesiones WHERE id = %s", (sid,))
+
+    def guardar(self, sid, datos, version, expira):
+        self._ejecutar(self._upsert, (sid, datos, version, expira), commit=True)
+
+    def borrar(self, sid):
+        self._ejecutar("DELETE FROM sesiones WHERE id = %s", (sid,), commit=True)
+
+    def purgar(self):
+        self._ejecutar("DELETE FROM sesiones WHERE expira < %s", (int(time.time()),), commit=True)
+
+
+class FileSessionStore:
+    """Un archivo JSON por sesión, para instalaciones de un solo servidor"""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, sid):
+        return os.path.join(self.directorio, sid)
+
+    def cargar(self, sid, version=None):
+        try:
+            with open(self._ruta(sid), encoding='utf-8') as fh:
+                registro = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        return registro['datos'], registro['version'], registro['expira']
+
+    def guardar(self, sid, datos, version, expira):
+        # Escribir a un temporal y reemplazar, para no dejar archivos a medias
+        tmp = f"{self._ruta(sid)}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({'datos': datos, 'version': version, 'expira': expira}, fh)
+        os.replace(tmp, self._ruta(sid))
+
+    def borrar(self, sid):
+        try:
+            os.remove(self._ruta(sid))
+        except FileNotFoundError:
+            pass
+
+    def purgar(self):
+        ahora = time.time()
+        for nombre in os.listdir(self.directorio):
+            if not _SID_RE.match(nombre):
+                continue
+            registro = self.cargar(nombre)
+            if registro is None or registro[2] < ahora:
+                self.borrar(nombre)
+
+
+class CacheLocal:
+    """LRU en memoria del proceso delante de otro almacén de sesiones"""
+
+    def __init__(self, store, tamano=1000):
+        self.store = store
+        self.tamano = tamano
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+
+    def _poner(self, sid, registro):
+        with self._lock:
+            self._lru[sid] = registro
+            self._lru.move_to_end(sid)
+            while len(self._lru) > self.tamano:
+                self._lru.popitem(last=False)
+
+    def cargar(self, sid, version=None):
+        with self._lock:
+            registro = self._lru.get(sid)
+            # Solo sirve si es la versión que el navegador dice tener
+            if registro is not None and version is not None and registro[1] == version:
+                self._lru.move_to_end(sid)
+                return registro
+        registro = self.store.cargar(sid, version)
+        if registro is not None:
+            self._poner(sid, registro)
+        return registro
+
+    def guardar(self, sid, datos, version, expira):
+        self.store.guardar(sid, datos, version, expira)
+        self._poner(sid, (datos, version, expira))
+
+    def borrar(self, sid):
+        self.store.borrar(sid)
+        with self._lock:
+            self._lru.pop(sid, None)
+
+    def purgar(self):
+        self.store.purgar()
+        ahora = time.time()
+        with self._lock:
+            for sid in [sid for sid, registro in self._lru.items() if registro[2] < ahora]:
+                del self._lru[sid]
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, ttl=43200, barrido_cada=600):
+        self.store = store
+        self.ttl = ttl
+        self.barrido_cada = barrido_cada
+        self._barrido = None
+        self._barrido_lock = threading.Lock()
+
+    def _iniciar_barrido(self):
+        # Se inicia con el primer request, así cada worker tiene su propio hilo
+        if self._barrido is not None or not self.barrido_cada:
+            return
+        with self._barrido_lock:
+            if self._barrido is None:
+                self._barrido = threading.Thread(target=self._barrer, name='sesiones-barrido', daemon=True)
+                self._barrido.start()
+
+    def _barrer(self):
+        while True:
+            time.sleep(self.barrido_cada)
+            try:
+                self.store.purgar()
+            except Exception:
+                log.exception("Error purgando sesiones vencidas")
+
+    @staticmethod
+    def _leer_cookie(valor):
+        sid, _, version = (valor or '').partition('.')
+        if not _SID_RE.match(sid):
+            return None, None
+        try:
+            return sid, int(version)
+        except ValueError:
+            return sid, None
+
+    def open_session(self, app, request):
+        self._iniciar_barrido()
+        sid, version = self._leer_cookie(request.cookies.get(self.get_cookie_name(app)))
+        if sid:
+            try:
+                registro = self.store.cargar(sid, version)
+            except Exception:
+                log.exception("Error cargando sesión")
+                registro = None
+            if registro is not None and registro[2] > time.time():
+                datos, version, expira = registro
+                try:
+                    return SesionServidor(self.serializer.loads(datos), sid=sid, version=version, expira=expira)
+                except ValueError:
+                    pass
+        return SesionServidor(sid=secrets.token_urlsafe(24), nueva=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.sid_anterior is not None:
+            try:
+                self.store.borrar(session.sid_anterior)
+            except Exception:
+                log.exception("Error borrando sesión rotada")
+
+        if not session:
+            # Sesión vaciada (p. ej. logout): borrarla del almacén y la cookie
+            if session.modified and not session.new:
+                try:
+                    self.store.borrar(session.sid)
+                except Exception:
+                    log.exception("Error borrando sesión")
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        ahora = time.time()
+        # Sin cambios solo se reescribe cuando pasó la mitad del TTL
+        renovar = session.expira is not None and session.expira - ahora < self.ttl / 2
+        if not (session.modified or renovar):
+            return
+
+        version = session.version + 1
+        try:
+            self.store.guardar(session.sid, self.serializer.dumps(dict(session)), version, int(ahora + self.ttl))
+        except Exception:
+            log.exception("Error guardando sesión")
+            return
+        response.set_cookie(
+            name,
+            f"{session.sid}.{version}",
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
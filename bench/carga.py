@@ -0,0 +1,290 @@
+"""Prueba de carga con tráfico de restobar: tablets de clientes y mozos en simultáneo.
+
+Contra un servidor levantado (con la base de bench/semilla.py):
+
+    python bench/carga.py --url http://localhost:5000 --duracion 60 --tablets 30 --mozos 3
+
+O dentro del proceso, sin servidor HTTP, con el cliente de prueba de Flask
+(usa la base configurada en config.py / variables de entorno):
+
+    python bench/carga.py --en-proceso --duracion 30
+
+Cada tablet recorre el menú (/), abre productos (/api/producto/<id>), agrega al
+carrito y cada tanto confirma el pedido; cada mozo consulta /mozo y avanza el
+estado de algún pedido. Al final imprime un JSON con throughput, latencias
+p50/p95/p99 y tasa de errores por ruta; con --comparar se agrega la diferencia
+contra un resultado anterior.
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+try:
+    from .semilla import MOZO_PASSWORD, mozo_email
+except ImportError:
+    from semilla import MOZO_PASSWORD, mozo_email
+
+SIGUIENTE = {'pendiente': 'en_preparacion', 'en_preparacion': 'listo', 'listo': 'entregado'}
+_PRODUCTO_RE = re.compile(r'data-product-id="(\d+)"')
+_PEDIDO_RE = re.compile(r'data-pedido-id="(\d+)" data-estado="(\w+)"')
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    # Se mide cada request por separado: un POST que redirige no sigue al GET
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHTTP:
+    """Un navegador: cookies propias, sin seguir redirecciones"""
+
+    def __init__(self, base):
+        self.base = base.rstrip('/')
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _SinRedirecciones())
+
+    def pedir(self, metodo, ruta, form=None, json_body=None):
+        datos, headers = None, {}
+        if form is not None:
+            datos = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        elif json_body is not None:
+            datos = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base + ruta, data=datos, headers=headers, method=metodo)
+        try:
+            with self._opener.open(req, timeout=30) as resp:
+                return resp.status, resp.read(), resp.headers.get('Location')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), e.headers.get('Location')
+
+
+class ClienteLocal:
+    """Lo mismo con el test client de Flask, sin red ni servidor"""
+
+    def __init__(self, app):
+        self._cliente = app.test_client()
+
+    def pedir(self, metodo, ruta, form=None, json_body=None):
+        resp = self._cliente.open(ruta, method=metodo, data=form, json=json_body)
+        return resp.status_code, resp.get_data(), resp.headers.get('Location')
+
+
+class Resultados:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rutas = {}  # nombre -> {'latencias': [...], 'errores': n, 'conflictos': n}
+
+    def registrar(self, nombre, segundos, estado):
+        with self._lock:
+            ruta = self.rutas.setdefault(nombre, {'latencias': [], 'errores': 0, 'conflictos': 0})
+            ruta['latencias'].append(segundos)
+            if estado == 409:
+                ruta['conflictos'] += 1
+            elif estado is None or estado >= 400:
+                ruta['errores'] += 1
+
+    def resumen(self, duracion):
+        rutas = {}
+        total = errores = 0
+        for nombre, datos in sorted(self.rutas.items()):
+            lat = sorted(datos['latencias'])
+            n = len(lat)
+            total += n
+            errores += datos['errores']
+            rutas[nombre] = {
+                'requests': n,
+                'rps': round(n / duracion, 2),
+                'errores': datos['errores'],
+                'tasa_error': round(datos['errores'] / n, 4) if n else 0,
+                'conflictos': datos['conflictos'],
+                'media_ms': round(sum(lat) / n * 1000, 2) if n else 0,
+                'p50_ms': _percentil(lat, 50),
+                'p95_ms': _percentil(lat, 95),
+                'p99_ms': _percentil(lat, 99),
+                'max_ms': round(lat[-1] * 1000, 2) if n else 0,
+            }
+        return {
+            'duracion_s': round(duracion, 2),
+            'requests': total,
+            'rps': round(total / duracion, 2),
+            'errores': errores,
+            'tasa_error': round(errores / total, 4) if total else 0,
+            'rutas': rutas,
+        }
+
+
+def _percentil(ordenadas, p):
+    """Percentil por rango más cercano, en milisegundos"""
+    if not ordenadas:
+        return 0
+    indice = max(0, min(len(ordenadas) - 1, math.ceil(p / 100 * len(ordenadas)) - 1))
+    return round(ordenadas[indice] * 1000, 2)
+
+
+def _medir(resultados, cliente, nombre, metodo, ruta, redirige_si_falla=None, **kwargs):
+    # Los formularios redirigen también cuando fallan (con un flash): se cuenta
+    # como error si la redirección va a `redirige_si_falla`
+    inicio = time.perf_counter()
+    try:
+        estado, cuerpo, ubicacion = cliente.pedir(metodo, ruta, **kwargs)
+    except Exception:
+        estado, cuerpo, ubicacion = None, b'', None
+    duracion = time.perf_counter() - inicio
+    if redirige_si_falla and ubicacion and urllib.parse.urlsplit(ubicacion).path == redirige_si_falla:
+        estado = 500
+    resultados.registrar(nombre, duracion, estado)
+    return estado, cuerpo
+
+
+def tablet(nuevo_cliente, productos, mezcla, pausa, hasta, resultados, azar):
+    acciones, pesos = zip(*mezcla.items())
+    while time.monotonic() < hasta:
+        # Una mesa nueva: sesión y carrito vacíos
+        cliente = nuevo_cliente()
+        _medir(resultados, cliente, 'index', 'GET', '/')
+        en_carrito = 0
+        for _ in range(azar.randint(3, 15)):
+            if time.monotonic() >= hasta:
+                return
+            time.sleep(azar.expovariate(1 / pausa) if pausa else 0)
+            accion = azar.choices(acciones, pesos)[0]
+            if accion == 'checkout' and not en_carrito:
+                accion = 'agregar'
+            if accion == 'index':
+                _medir(resultados, cliente, 'index', 'GET', '/')
+            elif accion == 'producto':
+                _medir(resultados, cliente, 'api_producto', 'GET', f"/api/producto/{azar.choice(productos)}")
+            elif accion == 'agregar':
+                estado, _ = _medir(resultados, cliente, 'cart_add', 'POST', f"/cart/add/{azar.choice(productos)}",
+                                   form={'qty': azar.randint(1, 3)})
+                en_carrito += estado is not None and estado < 400
+            elif accion == 'carrito':
+                _medir(resultados, cliente, 'cart_view', 'GET', '/cart')
+            elif accion == 'checkout':
+                _medir(resultados, cliente, 'cart_checkout', 'POST', '/cart/checkout', redirige_si_falla='/cart',
+                       form={'nombre_cliente': f"Bench {azar.randint(1, 999)}", 'mesa': str(azar.randint(1, 30))})
+                break
+
+
+def mozo(cliente, numero, sondeo, hasta, resultados, azar):
+    estado, _ = _medir(resultados, cliente, 'login', 'POST', '/login',
+                       form={'email': mozo_email(numero), 'password': MOZO_PASSWORD})
+    if estado != 302:
+        print(f"[carga] {mozo_email(numero)} no pudo iniciar sesión; ¿se corrió bench/semilla.py?", file=sys.stderr)
+        return
+    while time.monotonic() < hasta:
+        estado, cuerpo = _medir(resultados, cliente, 'mozo_dashboard', 'GET', '/mozo')
+        activos = [(int(i), e) for i, e in _PEDIDO_RE.findall(cuerpo.decode('utf-8', 'replace')) if e in SIGUIENTE]
+        for pedido_id, actual in azar.sample(activos, min(len(activos), azar.randint(1, 3))):
+            _medir(resultados, cliente, 'api_pedido_estado', 'PATCH', f"/api/pedidos/{pedido_id}/estado",
+                   json_body={'estado': SIGUIENTE[actual], 'anterior': actual})
+        time.sleep(sondeo)
+
+
+def _mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(','):
+        nombre, _, peso = parte.partition('=')
+        mezcla[nombre.strip()] = float(peso)
+    desconocidas = set(mezcla) - {'index', 'producto', 'agregar', 'carrito', 'checkout'}
+    if desconocidas:
+        raise argparse.ArgumentTypeError(f"Acciones desconocidas: {', '.join(sorted(desconocidas))}")
+    return mezcla
+
+
+def _comparar(actual, anterior):
+    """Diferencia porcentual de rps y p95 por ruta contra un resultado anterior"""
+    cambios = {}
+    for nombre, ruta in actual['rutas'].items():
+        previa = anterior.get('rutas', {}).get(nombre)
+        if not previa:
+            continue
+        cambios[nombre] = {
+            clave: round((ruta[clave] - previa[clave]) / previa[clave] * 100, 1) if previa[clave] else None
+            for clave in ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'tasa_error')
+        }
+    return cambios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--url', help='Servidor a probar, p. ej. http://localhost:5000')
+    destino.add_argument('--en-proceso', action='store_true', help='Usar la app en este proceso (test client)')
+    parser.add_argument('--duracion', type=float, default=30, help='Segundos de carga')
+    parser.add_argument('--tablets', type=int, default=20, help='Tablets de clientes simultáneas')
+    parser.add_argument('--mozos', type=int, default=3, help='Mozos simultáneos (los de la semilla)')
+    parser.add_argument('--pausa', type=float, default=0.5, help='Pausa media entre acciones de una tablet (s)')
+    parser.add_argument('--sondeo', type=float, default=2.0, help='Cada cuánto un mozo refresca /mozo (s)')
+    parser.add_argument('--mezcla', type=_mezcla, default=_mezcla('index=15,producto=45,agregar=25,carrito=10,checkout=5'),
+                        help='Pesos de las acciones de las tablets')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--salida', help='Guardar el JSON de resultados en este archivo')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior para comparar')
+    args = parser.parse_args()
+
+    if args.en_proceso:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        from AppMenuDigital.Main import app
+        nuevo_cliente = lambda: ClienteLocal(app)  # noqa: E731
+    else:
+        nuevo_cliente = lambda: ClienteHTTP(args.url)  # noqa: E731
+
+    estado, cuerpo, _ = nuevo_cliente().pedir('GET', '/')
+    productos = sorted({int(i) for i in _PRODUCTO_RE.findall(cuerpo.decode('utf-8', 'replace'))})
+    if estado != 200 or not productos:
+        sys.exit(f"No se encontraron productos en / (estado {estado}); ¿se corrió bench/semilla.py?")
+
+    resultados = Resultados()
+    azar = random.Random(args.seed)
+    inicio = time.monotonic()
+    hasta = inicio + args.duracion
+    hilos = [
+        threading.Thread(target=tablet, name=f"tablet-{n}", daemon=True,
+                         args=(nuevo_cliente, productos, args.mezcla, args.pausa, hasta, resultados,
+                               random.Random(azar.random())))
+        for n in range(args.tablets)
+    ] + [
+        threading.Thread(target=mozo, name=f"mozo-{n}", daemon=True,
+                         args=(nuevo_cliente(), n, args.sondeo, hasta, resultados, random.Random(azar.random())))
+        for n in range(1, args.mozos + 1)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    reporte = resultados.resumen(time.monotonic() - inicio)
+    reporte['config'] = {
+        'destino': 'en-proceso' if args.en_proceso else args.url,
+        'tablets': args.tablets,
+        'mozos': args.mozos,
+        'pausa': args.pausa,
+        'sondeo': args.sondeo,
+        'mezcla': args.mezcla,
+        'productos': len(productos),
+    }
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as fh:
+            reporte['comparacion'] = _comparar(reporte, json.load(fh))
+
+    salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as fh:
+            fh.write(salida + '\n')
+    print(salida)
+
+
+if __name__ == '__main__':
+    main()
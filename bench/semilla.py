@@ -0,0 +1,127 @@
+"""Carga datos realistas en una base descartable para el benchmark.
+
+    python bench/semilla.py --db menudigital_bench --productos 200 --pedidos 2000
+    python bench/semilla.py --sqlite /tmp/bench.sqlite3 --pedidos 2000
+
+Aplica las migraciones y agrega productos en todas las categorías, mozos con
+usuario para entrar al panel y un historial de pedidos en todos los estados.
+Se niega a usar una base que ya tenga pedidos salvo con --reset, que vacía las
+tablas de datos (nunca usar contra la base de producción).
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+
+import pymysql
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from AppMenuDigital import migrations  # noqa: E402
+from AppMenuDigital.catalogo import CATEGORIAS  # noqa: E402
+from AppMenuDigital.config import Config  # noqa: E402
+from AppMenuDigital.db import ConexionSQLite  # noqa: E402
+
+PLATOS = ['Milanesa', 'Ravioles', 'Ensalada', 'Tostado', 'Medialunas', 'Lomito', 'Pizza',
+          'Empanadas', 'Flan', 'Licuado', 'Café', 'Limonada', 'Wok', 'Hamburguesa', 'Tarta']
+VARIANTES = ['clásico', 'especial', 'de la casa', 'completo', 'veggie', 'doble', 'chico', 'grande']
+ESTADOS = [('pendiente', 10), ('en_preparacion', 10), ('listo', 5), ('entregado', 60), ('cancelado', 15)]
+TABLAS = ['catalogo_cambios', 'pedido_eventos', 'pedido_items', 'pedidos', 'productos', 'mozos', 'sesiones', 'usuarios']
+
+MOZO_PASSWORD = 'bench'
+
+
+def mozo_email(n):
+    return f"mozo{n}@bench.local"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=Config.MYSQL_HOST)
+    parser.add_argument('--port', type=int, default=Config.MYSQL_PORT)
+    parser.add_argument('--user', default=Config.MYSQL_USER)
+    parser.add_argument('--password', default=Config.MYSQL_PASSWORD)
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--db', help='Base MySQL descartable (se crea si no existe)')
+    destino.add_argument('--sqlite', help='Archivo SQLite descartable (se crea si no existe)')
+    parser.add_argument('--productos', type=int, default=200)
+    parser.add_argument('--mozos', type=int, default=5)
+    parser.add_argument('--pedidos', type=int, default=2000)
+    parser.add_argument('--reset', action='store_true', help='Vaciar las tablas de datos antes de cargar')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    azar = random.Random(args.seed)
+
+    if args.sqlite:
+        conn = ConexionSQLite(args.sqlite)
+    else:
+        servidor = pymysql.connect(host=args.host, port=args.port, user=args.user, password=args.password, charset='utf8mb4')
+        with servidor.cursor() as cur:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS `{args.db}` CHARACTER SET utf8mb4")
+        servidor.close()
+        conn = pymysql.connect(host=args.host, port=args.port, user=args.user, password=args.password,
+                               database=args.db, charset='utf8mb4', autocommit=False)
+    base = args.sqlite or args.db
+    migrations.upgrade(conn)
+    cur = conn.cursor()
+
+    cur.execute("SELECT COUNT(*) FROM pedidos")
+    if cur.fetchone()[0] and not args.reset:
+        sys.exit(f"La base {base} ya tiene pedidos; usar --reset para vaciarla")
+    if args.reset:
+        if args.sqlite:
+            # TABLAS ya está en orden de dependencias (hijas primero)
+            for tabla in TABLAS:
+                cur.execute(f"DELETE FROM {tabla}")
+        else:
+            cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for tabla in TABLAS:
+                cur.execute(f"TRUNCATE TABLE {tabla}")
+            cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+    # Productos en todas las categorías
+    productos = []
+    for i in range(args.productos):
+        nombre = f"{azar.choice(PLATOS)} {azar.choice(VARIANTES)} {i + 1}"
+        productos.append((nombre, f"Descripción de {nombre.lower()}", round(azar.uniform(800, 15000), 2),
+                          'images/default-food.png', CATEGORIAS[i % len(CATEGORIAS)]))
+    cur.executemany(
+        "INSERT INTO productos (nombre, descripcion, precio, imagen, categoria) VALUES (%s, %s, %s, %s, %s)",
+        productos
+    )
+
+    # Admin (id 1) y mozos con usuario
+    cur.execute("INSERT INTO usuarios (nombre, email, password) VALUES (%s, %s, %s)",
+                ('Admin bench', 'admin@bench.local', MOZO_PASSWORD))
+    for n in range(1, args.mozos + 1):
+        cur.execute("INSERT INTO usuarios (nombre, email, password) VALUES (%s, %s, %s)",
+                    (f"Mozo {n}", mozo_email(n), MOZO_PASSWORD))
+        cur.execute("INSERT INTO mozos (nombre, email, activo) VALUES (%s, %s, 1)", (f"Mozo {n}", mozo_email(n)))
+
+    # Historial de pedidos con 1 a 5 items
+    cur.execute("SELECT id, precio FROM productos")
+    precios = cur.fetchall()
+    estados, pesos = zip(*ESTADOS)
+    ahora = datetime.datetime.now().replace(microsecond=0)
+    for _ in range(args.pedidos):
+        cur.execute(
+            "INSERT INTO pedidos (usuario_id, estado, mesa, nombre_cliente, creado_en) VALUES (NULL, %s, %s, %s, %s)",
+            (azar.choices(estados, pesos)[0], str(azar.randint(1, 30)), f"Cliente {azar.randint(1, 500)}",
+             ahora - datetime.timedelta(minutes=azar.randint(0, 60 * 24 * 30)))
+        )
+        pedido_id = cur.lastrowid
+        cur.executemany(
+            "INSERT INTO pedido_items (pedido_id, menu_id, cantidad, precio_unitario, notas) VALUES (%s, %s, %s, %s, '')",
+            [(pedido_id, pid, azar.randint(1, 3), precio) for pid, precio in azar.sample(precios, azar.randint(1, 5))]
+        )
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    print(f"[semilla] {base}: {args.productos} productos, {args.mozos} mozos, {args.pedidos} pedidos")
+    print(f"[semilla] Mozos: {mozo_email(1)} ... {mozo_email(args.mozos)} / contraseña '{MOZO_PASSWORD}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -18,5 +18,6 @@ if (Test-Path .\requirements.txt) {
 
 # Configurar FLASK_APP y ejecutar
 $env:FLASK_APP = "AppMenuDigital.Main:app"
+flask db-upgrade
 flask run
 
@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Los tests usan el driver SQLite (DB_DRIVER=sqlite) sobre una base temporal:
+# tiene que quedar configurado antes de importar Main, que lee Config al cargarse
+_BASE = os.path.join(tempfile.mkdtemp(prefix='menudigital-tests-'), 'menudigital.sqlite3')
+os.environ['DB_DRIVER'] = 'sqlite'
+os.environ['SQLITE_PATH'] = _BASE
+os.environ['SESSION_BACKEND'] = 'mysql'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AppMenuDigital import Main, migrations, repositorio  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    Main.app.testing = True
+    with Main.app.app_context():
+        migrations.upgrade(Main.db.connection, log=lambda mensaje: None)
+    return Main.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def producto(app):
+    """Id de un producto nuevo en la carta"""
+    with app.app_context():
+        cur = Main.db.connection.cursor()
+        producto_id = repositorio.crear_producto(cur, 'Milanesa de test', 'Con papas', 4500, '', 'almuerzos')
+        Main.db.connection.commit()
+        cur.close()
+    Main.catalogo.invalidate()
+    return producto_id
+
+
+@pytest.fixture
+def usuario(app):
+    """(email, password) de un usuario registrado"""
+    email = f'cliente{len(_usuarios) + 1}@test.local'
+    with app.app_context():
+        cur = Main.db.connection.cursor()
+        repositorio.crear_usuario(cur, 'Cliente test', email, 'secreta')
+        Main.db.connection.commit()
+        cur.close()
+    _usuarios.append(email)
+    return email, 'secreta'
+
+
+_usuarios = []
+
+
+def sid_de(client):
+    """Id de sesión de la cookie del cliente"""
+    cookie = client.get_cookie(Main.app.config['SESSION_COOKIE_NAME'])
+    return cookie.value.partition('.')[0] if cookie else None
+
+
+def entrar_como_mozo(client, mozo_id=1):
+    with client.session_transaction() as sesion:
+        sesion.update(user_id=2, nombre='Mozo test', email='mozo@test.local', rol='mozo', mozo_id=mozo_id)
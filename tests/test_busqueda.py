@@ -0,0 +1,80 @@
+from AppMenuDigital.busqueda import IndiceBusqueda, normalizar, tokenizar
+from AppMenuDigital.catalogo import Catalogo
+
+
+def _indice(*productos):
+    indice = IndiceBusqueda()
+    for doc_id, nombre, categoria, descripcion in productos:
+        indice.actualizar(doc_id, nombre, categoria, descripcion)
+    return indice
+
+
+def _ids(resultados):
+    return [doc_id for doc_id, _ in resultados]
+
+
+def test_normalizar_quita_tildes_y_enie():
+    assert normalizar('Ñoquis') == 'noquis'
+    assert normalizar('Pingüino CAFÉ') == 'pinguino cafe'
+    assert tokenizar('Tarta de Jamón y Queso') == ['tarta', 'jamon', 'queso']
+    assert tokenizar('comida_sin_tac') == ['comida', 'sin', 'tac']
+
+
+def test_con_y_sin_tildes_encuentran_lo_mismo():
+    indice = _indice((1, 'Ñoquis caseros', 'almuerzos', ''), (2, 'Café con leche', 'desayunos', ''))
+    assert _ids(indice.buscar('noquis')) == [1]
+    assert _ids(indice.buscar('ÑOQUIS')) == [1]
+    assert _ids(indice.buscar('cafe')) == [2]
+
+
+def test_la_ultima_palabra_vale_como_prefijo():
+    indice = _indice((1, 'Milanesa napolitana', 'almuerzos', ''), (2, 'Milhojas', 'postres', ''))
+    assert sorted(_ids(indice.buscar('mil'))) == [1, 2]
+    assert _ids(indice.buscar('milanesa napo')) == [1]
+    # Solo la última: una palabra anterior tiene que estar completa
+    assert indice.buscar('mila napolitana') == []
+    # Palabra completa pesa más que prefijo
+    indice.actualizar(3, 'Mil', 'bebidas', '')
+    assert _ids(indice.buscar('mil'))[0] == 3
+
+
+def test_ranking_por_campo():
+    indice = _indice(
+        (1, 'Ensalada', 'veggie', 'con pollo grillado'),
+        (2, 'Pollo al horno', 'cenas', ''),
+        (3, 'Wok', 'pollo', ''),
+    )
+    # nombre (3) > categoría (2) > descripción (1)
+    assert _ids(indice.buscar('pollo')) == [2, 3, 1]
+
+
+def test_todas_las_palabras_tienen_que_estar():
+    indice = _indice((1, 'Pizza muzzarella', 'cenas', ''), (2, 'Pizza fugazza', 'cenas', ''))
+    assert _ids(indice.buscar('pizza fugazza')) == [2]
+    assert indice.buscar('pizza sushi') == []
+    assert indice.buscar('de la') == []
+
+
+def test_sincroniza_solo_lo_que_cambio_en_el_catalogo():
+    filas = [
+        (1, 'Flan casero', 1000, 'postres', '', ''),
+        (2, 'Licuado', 1500, 'bebidas', '', 'de banana'),
+    ]
+    indice = IndiceBusqueda()
+    catalogo = Catalogo(lambda: (list(filas), 1))
+    sincronizados = []
+    catalogo.suscribir(lambda snap: sincronizados.append(indice.sincronizar(snap.productos)))
+    catalogo.snapshot()
+    assert sincronizados == [(2, 0)]
+    assert len(indice) == 2
+    assert _ids(indice.buscar('banana')) == [2]
+
+    # Editar uno, borrar otro y crear uno nuevo; el precio no toca el índice
+    filas[:] = [(2, 'Licuado', 1800, 'bebidas', '', 'de frutilla'), (3, 'Budín', 900, 'postres', '', '')]
+    catalogo.invalidate()
+    catalogo.snapshot()
+    assert sincronizados[-1] == (2, 1)  # Licuado y Budín reindexados, Flan quitado
+    assert indice.buscar('banana') == []
+    assert _ids(indice.buscar('frutilla')) == [2]
+    assert _ids(indice.buscar('budin')) == [3]
+    assert indice.buscar('flan') == []
@@ -0,0 +1,4 @@
+def test_carrito_en_json_para_el_contador(client, producto):
+    client.post(f'/cart/add/{producto}', data={'qty': '3'})
+    respuesta = client.get('/cart', headers={'Accept': 'application/json'})
+    assert respuesta.get_json()['cart_count'] == 3
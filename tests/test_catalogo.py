@@ -0,0 +1,91 @@
+from AppMenuDigital import Main, repositorio
+from AppMenuDigital.catalogo import Catalogo
+
+
+def _ejecutar(app, funcion, *args):
+    with app.app_context():
+        cur = Main.db.connection.cursor()
+        resultado = funcion(cur, *args)
+        Main.db.connection.commit()
+        cur.close()
+    return resultado
+
+
+def test_cada_cambio_avanza_una_version(app, client, producto):
+    version = client.get('/api/menu/cambios?desde=0').get_json()['version']
+    nuevo = _ejecutar(app, repositorio.crear_producto, 'Flan de test', '', 1200, '', 'postres')
+    _ejecutar(app, repositorio.eliminar_producto, producto)
+    assert _ejecutar(app, repositorio.version_catalogo) == version + 2
+
+    cambios = client.get(f'/api/menu/cambios?desde={version}').get_json()
+    assert cambios['version'] == version + 2
+    assert [fila[0] for fila in cambios['productos']] == [nuevo]
+    assert cambios['borrados'] == [producto]
+
+    cambios = client.get(f'/api/menu/cambios?desde={version + 1}').get_json()
+    assert cambios['productos'] == [] and cambios['borrados'] == [producto]
+
+
+def test_invalidar_durante_una_recarga_no_publica_datos_viejos():
+    precios = [100]
+    cargas = []
+
+    def cargar():
+        filas = [(1, 'Café', precios[0], 'bebidas', '', '')]
+        cargas.append(filas)
+        if len(cargas) == 1:
+            # Otro request edita el producto e invalida mientras esta carga sigue en curso
+            precios[0] = 150
+            catalogo.invalidate()
+        return filas, len(cargas)
+
+    catalogo = Catalogo(cargar)
+    assert catalogo.producto(1)['precio'] == 150
+    assert len(cargas) == 2
+
+
+def _editar_precio(app, producto_id, precio):
+    _ejecutar(app, repositorio.actualizar_producto, producto_id, 'Milanesa de test', 'Con papas', precio, '', 'almuerzos')
+    Main.catalogo.invalidate()
+
+
+def test_api_menu_responde_304_con_el_mismo_etag(client, producto):
+    respuesta = client.get('/api/menu')
+    etag = respuesta.headers['ETag']
+    assert respuesta.status_code == 200 and respuesta.headers['Cache-Control'] == 'no-cache'
+
+    respuesta = client.get('/api/menu', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 304
+    assert respuesta.data == b''
+    assert respuesta.headers['ETag'] == etag
+
+    # El ETag de la versión comprimida también vale
+    comprimido = etag[:-1] + '-gzip"'
+    respuesta = client.get('/api/menu', headers={'If-None-Match': comprimido})
+    assert respuesta.status_code == 304 and respuesta.headers['ETag'] == comprimido
+
+
+def test_api_menu_cambia_de_etag_al_editar_un_producto(app, client, producto):
+    etag = client.get('/api/menu').headers['ETag']
+    _editar_precio(app, producto, 9999)
+    respuesta = client.get('/api/menu', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
+    datos = respuesta.get_json()
+    precio = datos['campos'].index('precio')
+    assert [fila[precio] for fila in datos['productos'] if fila[0] == producto] == [9999]
+
+
+def test_api_productos_etag_por_ids_y_version(app, client, producto):
+    url = f'/api/productos?ids={producto}'
+    respuesta = client.get(url)
+    etag = respuesta.headers['ETag']
+    assert [p['id'] for p in respuesta.get_json()['productos']] == [producto]
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    # Otros ids, otro ETag
+    assert client.get(f'{url},0').headers['ETag'] != etag
+
+    _editar_precio(app, producto, 7777)
+    respuesta = client.get(url, headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()['productos'][0]['precio'] == 7777
@@ -0,0 +1,58 @@
+import pytest
+
+from AppMenuDigital import Main, repositorio
+from AppMenuDigital.consultas import GuardiaConsultas, PresupuestoExcedido, assert_max_queries
+
+from conftest import entrar_como_mozo
+
+
+@pytest.fixture
+def con_pedidos(client, producto):
+    """Cliente con un producto en el carrito y dos pedidos hechos"""
+    for _ in range(2):
+        client.post(f'/cart/add/{producto}', data={'qty': '2', 'mesa': '3', 'nombre_cliente': 'Ana'})
+        client.post('/cart/checkout', data={'mesa': '3', 'nombre_cliente': 'Ana'})
+    client.post(f'/cart/add/{producto}', data={'qty': '1'})
+    return client
+
+
+@pytest.mark.parametrize('ruta', ['/', '/cart'])
+def test_presupuesto_con_catalogo_frio(con_pedidos, ruta):
+    Main.catalogo.invalidate()
+    with assert_max_queries(3):
+        respuesta = con_pedidos.get(ruta)
+    assert respuesta.status_code == 200
+
+
+def test_presupuesto_panel_mozo(con_pedidos):
+    entrar_como_mozo(con_pedidos)
+    Main.catalogo.invalidate()
+    with assert_max_queries(4):
+        respuesta = con_pedidos.get('/mozo')
+    assert b'Milanesa de test' in respuesta.data
+    # Con el catálogo cargado quedan los pedidos y sus items
+    with assert_max_queries(2):
+        con_pedidos.get('/mozo')
+    assert respuesta.status_code == 200
+
+
+def test_presupuesto_excedido_falla_en_tests(client, monkeypatch):
+    # app.testing se activa después de crear la GuardiaConsultas
+    monkeypatch.setattr(Main.app.view_functions['index'], 'max_consultas', 0)
+    Main.catalogo.invalidate()
+    with pytest.raises(PresupuestoExcedido):
+        client.get('/')
+
+
+def test_consulta_lenta_no_registra_valores(app, monkeypatch, caplog):
+    guardia = next(o.__self__ for o in Main.db.observadores if isinstance(getattr(o, '__self__', None), GuardiaConsultas))
+    monkeypatch.setattr(guardia, 'lenta', 0)
+    with app.app_context(), caplog.at_level('WARNING', logger='AppMenuDigital.consultas'):
+        cur = Main.db.connection.cursor()
+        repositorio.crear_usuario(cur, 'Lenta', 'lenta@test.local', 'clave-secreta')
+        Main.db.connection.rollback()
+        cur.close()
+    registros = [r for r in caplog.records if 'INSERT INTO usuarios' in getattr(r, 'sql', '')]
+    assert registros
+    assert registros[0].params == '(str, str, str)'
+    assert all('clave-secreta' not in str(r.__dict__) for r in caplog.records)
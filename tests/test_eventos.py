@@ -0,0 +1,77 @@
+import threading
+import time
+
+from AppMenuDigital.eventos import EventBus
+
+
+class TablaEventos:
+    """pedido_eventos en memoria: solo se ven los ids ya confirmados"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.confirmados = {}
+
+    def confirmar(self, event_id):
+        with self._lock:
+            self.confirmados[event_id] = (event_id, 'estado', '{}')
+
+    def cargar(self, desde_id, limite=200):
+        with self._lock:
+            return [self.confirmados[i] for i in sorted(self.confirmados) if i > desde_id][:limite]
+
+    def ultimo_id(self):
+        with self._lock:
+            return max(self.confirmados, default=0)
+
+
+def _recibir(bus, desde, hasta, timeout=3):
+    """Ids que recibe un cliente desde `desde` hasta ver `hasta`"""
+    recibidos = []
+    limite = time.monotonic() + timeout
+    while (not recibidos or recibidos[-1] < hasta) and time.monotonic() < limite:
+        for evento in bus.esperar(desde, 0.05):
+            recibidos.append(evento[0])
+            desde = evento[0]
+    return recibidos
+
+
+def test_evento_confirmado_fuera_de_orden_no_se_pierde():
+    tabla = TablaEventos()
+    tabla.confirmar(9)
+    bus = EventBus(tabla.cargar, tabla.ultimo_id, intervalo=0.01, espera_huecos=1.0)
+    desde = bus.suscribir()
+    # El 11 se confirma antes que el 10
+    tabla.confirmar(11)
+    time.sleep(0.1)
+    tabla.confirmar(10)
+    assert _recibir(bus, desde, 11) == [10, 11]
+    bus.desuscribir()
+
+
+def test_hueco_que_nunca_se_confirma_se_saltea():
+    tabla = TablaEventos()
+    tabla.confirmar(9)
+    bus = EventBus(tabla.cargar, tabla.ultimo_id, intervalo=0.01, espera_huecos=0.2)
+    desde = bus.suscribir()
+    # El 10 fue una transacción deshecha
+    tabla.confirmar(11)
+    assert _recibir(bus, desde, 11) == [11]
+    tabla.confirmar(12)
+    assert _recibir(bus, 11, 12) == [12]
+    bus.desuscribir()
+
+
+def test_reanudar_con_last_event_id_viejo_no_pasa_un_hueco():
+    tabla = TablaEventos()
+    for i in range(1, 6):
+        tabla.confirmar(i)
+    bus = EventBus(tabla.cargar, tabla.ultimo_id, intervalo=0.01, capacidad=2, espera_huecos=1.0)
+    bus.suscribir()
+    for i in (6, 7, 9):
+        tabla.confirmar(i)
+    time.sleep(0.2)
+    # Un cliente que vuelve desde el 2 (antes del buffer) no recibe el 9 todavía
+    assert [e[0] for e in bus.esperar(2, 0)] == [3, 4, 5, 6, 7]
+    tabla.confirmar(8)
+    assert _recibir(bus, 7, 9) == [8, 9]
+    bus.desuscribir()
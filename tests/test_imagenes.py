@@ -0,0 +1,64 @@
+import io
+import os
+import time
+
+from werkzeug.datastructures import FileStorage
+
+from AppMenuDigital import Main, repositorio
+from AppMenuDigital.imagenes import es_direccionada, guardar_subida, recolectar
+
+
+def _subida(contenido):
+    return FileStorage(stream=io.BytesIO(contenido), filename='foto.png')
+
+
+def _envejecer(static, imagen, segundos=3600):
+    ruta = os.path.join(static, imagen)
+    viejo = time.time() - segundos
+    os.utime(ruta, (viejo, viejo))
+
+
+def test_el_mismo_contenido_se_guarda_una_vez(tmp_path):
+    carpeta = tmp_path / 'images'
+    imagen, nueva = guardar_subida(_subida(b'png' * 50000), str(carpeta), '.PNG')
+    assert nueva and es_direccionada(imagen) and imagen.endswith('.png')
+    repetida, nueva = guardar_subida(_subida(b'png' * 50000), str(carpeta), '.png')
+    assert repetida == imagen and not nueva
+    otra, nueva = guardar_subida(_subida(b'otra foto'), str(carpeta), '.jpeg')
+    assert nueva and otra != imagen and otra.endswith('.jpg')
+    # Sin temporales a medio escribir
+    assert sorted(os.listdir(carpeta)) == sorted(os.path.basename(i) for i in (imagen, otra))
+
+
+def test_subida_duplicada_renueva_la_gracia(tmp_path):
+    carpeta = tmp_path / 'images'
+    imagen, _ = guardar_subida(_subida(b'foto'), str(carpeta), '.png')
+    _envejecer(str(tmp_path), imagen)
+    guardar_subida(_subida(b'foto'), str(carpeta), '.png')
+    assert time.time() - os.path.getmtime(tmp_path / imagen) < 60
+
+
+def test_recolectar_respeta_referencias_gracia_y_archivos_viejos(app, tmp_path):
+    static = str(tmp_path)
+    carpeta = os.path.join(static, 'images')
+    usada, _ = guardar_subida(_subida(b'usada'), carpeta, '.png')
+    huerfana, _ = guardar_subida(_subida(b'huerfana'), carpeta, '.png')
+    reciente, _ = guardar_subida(_subida(b'reciente'), carpeta, '.png')
+    # Subida con el esquema viejo (nombre original): nunca la borra el GC
+    legado = 'images/milanesa.png'
+    with open(os.path.join(static, legado), 'wb') as fh:
+        fh.write(b'legado')
+    for imagen in (usada, huerfana, legado):
+        _envejecer(static, imagen)
+
+    with app.app_context():
+        cur = Main.db.connection.cursor()
+        repositorio.crear_producto(cur, 'Con foto', '', 100, usada, 'cenas')
+        borradas = recolectar(cur, static, [usada, huerfana, reciente, legado], gracia=600)
+        Main.db.connection.rollback()
+        cur.close()
+
+    assert borradas == [huerfana]
+    assert not os.path.exists(os.path.join(static, huerfana))
+    for imagen in (usada, reciente, legado):
+        assert os.path.exists(os.path.join(static, imagen))
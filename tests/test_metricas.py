@@ -0,0 +1,26 @@
+from AppMenuDigital import Main
+
+
+def test_localhost_no_alcanza(client):
+    # El cliente de prueba llega desde 127.0.0.1, como todo request detrás de un proxy local
+    assert client.get('/metrics').status_code == 403
+
+
+def test_token(client, monkeypatch):
+    monkeypatch.setitem(Main.app.config, 'METRICAS_TOKEN', 's3creto')
+    assert client.get('/metrics', headers={'Authorization': 'Bearer otro'}).status_code == 403
+    respuesta = client.get('/metrics', headers={'Authorization': 'Bearer s3creto'})
+    assert respuesta.status_code == 200
+    assert respuesta.content_type.startswith('text/plain')
+
+
+def test_ip_permitida(client, monkeypatch):
+    monkeypatch.setitem(Main.app.config, 'METRICAS_IPS', ['10.0.0.5'])
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.6'}).status_code == 403
+
+
+def test_admin(client):
+    with client.session_transaction() as sesion:
+        sesion.update(user_id=1, is_admin=True, rol='admin')
+    assert client.get('/metrics').status_code == 200
@@ -0,0 +1,70 @@
+from AppMenuDigital import migrations
+from AppMenuDigital.db import ConexionSQLite
+
+
+def _migrar(conn, monkeypatch, hasta=None):
+    """Aplica las migraciones pendientes, hasta la versión `hasta` inclusive"""
+    todas = migrations.discover
+    if hasta is not None:
+        monkeypatch.setattr(migrations, 'discover', lambda dialecto='mysql': [m for m in todas(dialecto) if m[0] <= hasta])
+    try:
+        return migrations.upgrade(conn, log=lambda mensaje: None)
+    finally:
+        monkeypatch.setattr(migrations, 'discover', todas)
+
+
+def _filas(conn, sql):
+    cur = conn.cursor()
+    cur.execute(sql)
+    filas = [tuple(fila) for fila in cur.fetchall()]
+    cur.close()
+    return filas
+
+
+def test_0008_une_menu_en_productos(tmp_path, monkeypatch):
+    conn = ConexionSQLite(str(tmp_path / 'vieja.sqlite3'))
+    assert _migrar(conn, monkeypatch, hasta=7)[-1] == 7
+
+    cur = conn.cursor()
+    cur.executemany("INSERT INTO productos (id, nombre, descripcion, precio, imagen, categoria) VALUES (%s, %s, %s, %s, %s, %s)", [
+        (1, 'Café', '', 500, 'images/cafe.png', 'bebidas'),
+        (2, 'Tostado', 'Jamón y queso', 1200, '', 'desayunos'),
+    ])
+    # El 2 está repetido entre las dos tablas; el 5 no
+    cur.executemany("INSERT INTO menu (id, Nombre_Menu, Precio, Categoria, Imagen, Descripcion) VALUES (%s, %s, %s, %s, %s, %s)", [
+        (2, 'Medialuna', 300, 'desayunos', '', 'De manteca'),
+        (5, 'Flan', 900, 'postres', '', ''),
+    ])
+    cur.execute("INSERT INTO pedidos (id, estado, mesa) VALUES (1, 'entregado', '4')")
+    cur.executemany("INSERT INTO pedido_items (pedido_id, menu_id, cantidad, precio_unitario) VALUES (%s, %s, %s, %s)", [
+        (1, 2, 1, 300),   # Se cobró la medialuna (item de menu)
+        (1, 2, 1, 1200),  # Se cobró el tostado (producto)
+        (1, 5, 2, 900),
+    ])
+    conn.commit()
+    cur.close()
+
+    assert 8 in _migrar(conn, monkeypatch)
+
+    # Los ids de menu se conservan salvo el repetido, que pasa a 2 + MAX(id) = 7
+    assert _filas(conn, "SELECT id, nombre, precio, categoria, descripcion FROM productos ORDER BY id") == [
+        (1, 'Café', 500, 'bebidas', ''),
+        (2, 'Tostado', 1200, 'desayunos', 'Jamón y queso'),
+        (5, 'Flan', 900, 'postres', ''),
+        (7, 'Medialuna', 300, 'desayunos', 'De manteca'),
+    ]
+    # Solo el item cobrado al precio de menu se reasigna al id nuevo
+    assert _filas(conn, "SELECT menu_id, precio_unitario FROM pedido_items ORDER BY id") == [(7, 300), (2, 1200), (5, 900)]
+
+    # `menu` queda como vista de productos con los nombres de columna viejos
+    cur = conn.cursor()
+    cur.execute("SELECT * FROM menu ORDER BY id")
+    assert [d[0] for d in cur.description] == ['id', 'Nombre_Menu', 'Precio', 'Categoria', 'Imagen', 'Descripcion']
+    assert [tuple(fila) for fila in cur.fetchall()][-1] == (7, 'Medialuna', 300, 'desayunos', '', 'De manteca')
+    cur.close()
+    assert _filas(conn, "SELECT type FROM sqlite_master WHERE name = 'menu'") == [('view',)]
+    assert _filas(conn, "SELECT COUNT(*) FROM sqlite_master WHERE name = 'menu_ids_repetidos'") == [(0,)]
+
+    # Las tablets tienen que volver a bajar la carta
+    assert ('catalogo', 0, 'resync') in _filas(conn, "SELECT entidad, entidad_id, operacion FROM catalogo_cambios")
+    conn.close()
@@ -0,0 +1,77 @@
+import re
+
+from AppMenuDigital import Main
+from AppMenuDigital.pedidos import datos_pedido
+
+from conftest import entrar_como_mozo
+
+
+def _opciones_del_pedido(html, pedido_id):
+    """Estados del select de cambio de estado de la card del pedido"""
+    card = html.split(f'data-pedido-id="{pedido_id}"', 1)[1].split('data-pedido-id=', 1)[0]
+    select = re.search(r'<select name="estado".*?</select>', card, re.S)
+    return re.findall(r'<option value="(\w+)"', select.group(0)) if select else []
+
+
+def test_el_select_solo_ofrece_transiciones_permitidas(client, producto):
+    client.post(f'/cart/add/{producto}', data={'qty': '1', 'mesa': '7', 'nombre_cliente': 'Eva'})
+    client.post('/cart/checkout', data={'mesa': '7', 'nombre_cliente': 'Eva'})
+    entrar_como_mozo(client)
+    html = client.get('/mozo').get_data(as_text=True)
+    pedido_id = max(int(i) for i in re.findall(r'data-pedido-id="(\d+)"', html))
+    assert _opciones_del_pedido(html, pedido_id) == ['pendiente', 'en_preparacion', 'cancelado']
+
+    respuesta = client.patch(f'/api/pedidos/{pedido_id}/estado', json={'estado': 'cancelado', 'anterior': 'pendiente'})
+    assert respuesta.status_code == 200
+    html = client.get('/mozo?estado=cancelado').get_data(as_text=True)
+    # Un pedido cancelado ya no tiene a qué estado pasar
+    assert _opciones_del_pedido(html, pedido_id) == []
+
+
+def _pedido_nuevo(client, producto):
+    """Id de un pedido recién hecho (pendiente)"""
+    client.post(f'/cart/add/{producto}', data={'qty': '1', 'mesa': '2', 'nombre_cliente': 'Leo'})
+    client.post('/cart/checkout', data={'mesa': '2', 'nombre_cliente': 'Leo'})
+    with Main.app.app_context():
+        cur = Main.db.connection.cursor()
+        cur.execute("SELECT MAX(id) FROM pedidos")
+        pedido_id = cur.fetchone()[0]
+        cur.close()
+    return pedido_id
+
+
+def _estado(pedido_id):
+    with Main.app.app_context():
+        cur = Main.db.connection.cursor()
+        estado = datos_pedido(cur, pedido_id)[0]
+        cur.close()
+    return estado
+
+
+def test_formulario_del_mozo_respeta_las_transiciones(client, producto):
+    pedido_id = _pedido_nuevo(client, producto)
+    entrar_como_mozo(client)
+    url = f'/mozo/pedidos-cliente/{pedido_id}/estado'
+    for estado in ('en_preparacion', 'listo', 'entregado'):
+        client.post(url, data={'estado': estado})
+    assert _estado(pedido_id) == 'entregado'
+    # Un pedido entregado no vuelve atrás
+    client.post(url, data={'estado': 'pendiente'})
+    assert _estado(pedido_id) == 'entregado'
+
+
+def test_formulario_del_admin_rechaza_estados_invalidos(client, producto):
+    pedido_id = _pedido_nuevo(client, producto)
+    with client.session_transaction() as sesion:
+        sesion.update(user_id=1, is_admin=True, rol='admin')
+    url = f'/admin/pedidos/{pedido_id}/estado'
+    client.post(url, data={'estado': 'cualquiera'})
+    client.post(url, data={})
+    client.post(url, data={'estado': 'entregado'})  # Salta en_preparacion y listo
+    assert _estado(pedido_id) == 'pendiente'
+    client.post(url, data={'estado': 'cancelado'})
+    assert _estado(pedido_id) == 'cancelado'
+    # Cancelado es final: sin formulario de estado, pero se puede eliminar
+    html = client.get('/admin/pedidos-nuevo?estado=cancelado').get_data(as_text=True)
+    assert url not in html
+    assert f'/admin/pedidos/{pedido_id}/eliminar' in html
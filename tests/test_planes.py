@@ -0,0 +1,10 @@
+from AppMenuDigital import Main, planes
+
+
+def test_consultas_de_los_requests_usan_indices(app):
+    # Lo mismo que `flask db-explain`: falla si una consulta recorre una tabla completa
+    with app.app_context():
+        resultados = planes.revisar(Main.db.connection, 'sqlite')
+    assert resultados
+    recorridos = [(nombre, sql, tablas) for nombre, sql, plan, tablas in resultados if tablas]
+    assert recorridos == []
@@ -0,0 +1,106 @@
+import threading
+
+from AppMenuDigital import Main
+
+from conftest import sid_de
+
+
+def _contar_pedidos(app):
+    with app.app_context():
+        cur = Main.db.connection.cursor()
+        cur.execute("SELECT COUNT(*) FROM pedidos")
+        total = cur.fetchone()[0]
+        cur.close()
+    return total
+
+
+def test_checkouts_concurrentes_no_agotan_el_pool(app, producto, monkeypatch):
+    # Tantos checkouts a la vez como conexiones tiene el pool de requests
+    n = 2
+    monkeypatch.setattr(Main.db.pool, 'max_size', n)
+    monkeypatch.setattr(Main.db.pool, 'timeout', 2)
+    timeouts_antes = Main.db.pool.stats()['timeouts']
+    pedidos_antes = _contar_pedidos(app)
+
+    # Todos los requests llegan a guardar la sesión con su conexión tomada
+    barrera = threading.Barrier(n, timeout=5)
+    store = Main._sesiones_store.store
+    guardar = store.guardar
+
+    def guardar_juntos(*args):
+        try:
+            barrera.wait()
+        except threading.BrokenBarrierError:
+            pass
+        guardar(*args)
+
+    clientes = [app.test_client() for _ in range(n)]
+    for cliente in clientes:
+        cliente.post(f'/cart/add/{producto}', data={'qty': '1', 'mesa': '4', 'nombre_cliente': 'Ana'})
+    monkeypatch.setattr(store, 'guardar', guardar_juntos)
+
+    respuestas = [None] * n
+
+    def checkout(i):
+        respuestas[i] = clientes[i].post('/cart/checkout', data={'mesa': '4', 'nombre_cliente': 'Ana'})
+
+    hilos = [threading.Thread(target=checkout, args=(i,)) for i in range(n)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(30)
+
+    assert Main.db.pool.stats()['timeouts'] == timeouts_antes
+    assert store.pool.stats()['timeouts'] == 0
+    assert _contar_pedidos(app) == pedidos_antes + n
+    for cliente, respuesta in zip(clientes, respuestas):
+        assert respuesta.status_code == 302
+        # La sesión se guardó: nueva cookie y carrito vacío
+        assert 'Set-Cookie' in respuesta.headers
+        with cliente.session_transaction() as sesion:
+            assert not sesion.get('cart')
+
+
+def _guardado(sid):
+    return Main._sesiones_store.store.cargar(sid) is not None
+
+
+def test_sid_desconocido_recibe_uno_nuevo(client, producto):
+    sid_inventado = 'a' * 32
+    client.set_cookie(Main.app.config['SESSION_COOKIE_NAME'], f'{sid_inventado}.1')
+    client.post(f'/cart/add/{producto}', data={'qty': '1'})
+    assert sid_de(client) not in (None, sid_inventado)
+    assert not _guardado(sid_inventado)
+
+
+def test_login_rota_el_sid_y_conserva_el_carrito(client, producto, usuario):
+    email, password = usuario
+    client.post(f'/cart/add/{producto}', data={'qty': '2'})
+    sid_antes = sid_de(client)
+    respuesta = client.post('/login', data={'email': email, 'password': password})
+    assert respuesta.status_code == 302
+    assert sid_de(client) != sid_antes
+    assert not _guardado(sid_antes)
+    with client.session_transaction() as sesion:
+        assert sesion['email'] == email
+        assert sesion['cart']
+
+
+def test_logout_rota_el_sid(client, usuario):
+    email, password = usuario
+    client.post('/login', data={'email': email, 'password': password})
+    sid_logueado = sid_de(client)
+    client.get('/logout')
+    assert sid_de(client) != sid_logueado
+    assert not _guardado(sid_logueado)
+    with client.session_transaction() as sesion:
+        assert 'user_id' not in sesion
+
+
+def test_vary_cookie_si_solo_se_lee_la_sesion(client, usuario):
+    email, password = usuario
+    client.post('/login', data={'email': email, 'password': password})
+    client.get('/')  # consume el flash del login
+    respuesta = client.get('/')
+    assert 'Set-Cookie' not in respuesta.headers
+    assert 'Cookie' in respuesta.vary